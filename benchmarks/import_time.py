@@ -0,0 +1,117 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This script measures how long it takes to import each entry point of
+# the src package. Each module is imported in a fresh Python process several
+# times and the fastest time is kept. The script fails if a module takes longer
+# than its budget or if it imports a heavy dependency (statsmodels, matplotlib,
+# seaborn, ydata_profiling, pyarrow, or scikit-learn) at load time.
+#
+# Usage: python benchmarks/import_time.py [--repeat N] [--scale X]
+#################################################################################
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# The import time budget (in seconds) for each entry point
+# Most modules import pandas, which sets the floor for their budgets
+BUDGETS = {"data.make_dataset": 1.0,
+           "data.cache_dataset": 1.0,
+           "data.sample_data": 1.0,
+           "features.build_features": 1.0,
+           "features.pipeline": 1.0,
+           "features.account_store": 1.0,
+           "features.transaction_graph": 1.0,
+           "models.train_model": 1.0,
+           "models.metrics": 1.0,
+           "models.predict_model": 1.0,
+           "models.score_model": 1.0,
+           "models.tune_model": 1.0,
+           "models.feature_importance": 1.0,
+           "models.model_bundle": 1.5,
+           "models.numpy_scorer": 0.3,
+           "models.online_scaler": 0.3,
+           "models.online_model": 1.5,
+           "visualization.visualize": 1.0,
+           "parallel": 0.3}
+
+# Dependencies that must only be imported by the functions that use them
+# Anything that pandas itself imports (e.g. pyarrow with newer versions of pandas) is allowed
+HEAVY_MODULES = ["statsmodels", "matplotlib", "seaborn", "ydata_profiling", "pyarrow", "sklearn"]
+
+# Time the import in the child process and report which heavy modules were loaded
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy}))
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+def time_import(module: str, repeat: int) -> dict:
+    # This function imports a module in fresh processes and keeps the fastest time
+    # :param module: the module to import (relative to src)
+    # :type module: str
+    # :param repeat: the number of processes
+    # :type repeat: int
+    # :returns: the fastest import time and the heavy modules that were loaded
+    # :rtype: dict
+
+    env = dict(os.environ, PYTHONPATH = SRC_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    runs = []
+
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module = module, heavy = HEAVY_MODULES)],
+                                env = env, capture_output = True, text = True, check = True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {"seconds": min(run["seconds"] for run in runs), "heavy": runs[0]["heavy"]}
+
+def pandas_imports() -> list:
+    # This function returns the heavy modules that importing pandas loads on its own
+    # :returns: the heavy modules
+    # :rtype: list
+
+    return time_import("pandas", 1)["heavy"]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Check the import time of the src entry points.")
+    parser.add_argument("--repeat", type = int, default = 5, help = "the number of imports per module")
+    parser.add_argument("--scale", type = float, default = 1.0, help = "multiply every budget (for slow machines)")
+    args = parser.parse_args()
+
+    failures = []
+    allowed = pandas_imports()
+
+    for module, budget in BUDGETS.items():
+        result = time_import(module, args.repeat)
+        heavy = [name for name in result["heavy"] if name not in allowed]
+        budget *= args.scale
+        status = "ok"
+
+        if heavy:
+            status = "FAIL (imports {})".format(", ".join(heavy))
+        elif result["seconds"] > budget:
+            status = "FAIL (over budget)"
+
+        if status != "ok":
+            failures.append(module)
+
+        print("{:<28} {:>7.3f}s  budget {:>5.2f}s  {}".format(module, result["seconds"], budget, status))
+
+    if failures:
+        print("{} entry point(s) failed the startup benchmark.".format(len(failures)))
+        return 1
+
+    print(">>> All entry points are within their startup budgets!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This script times and memory-profiles each stage of the pipeline
+# (loading, cleaning, feature engineering, visualization, sampling, scaling,
+# training, and prediction) at several data sizes. The data is a synthetic
+# transaction file with the PaySim schema (or a bootstrap sample of a real
+# file) written to a temporary project directory, so the stages run unchanged
+# and nothing in ./data or ./reports is touched. The results are saved as JSON
+# (with the git commit) so that runs from different commits can be compared,
+# and the time and peak memory of each stage are plotted against the data size.
+#
+# Usage: python benchmarks/pipeline_stages.py [--sizes 1e4 1e5 1e6 1e7] [--skip STAGE ...]
+#                                             [--source FILE] [--compare OLD.json] [--output FILE]
+#################################################################################
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from data.make_dataset import CleanData, TRANSACTION_TYPES
+from features.build_features import BuildFeatures, DummyEncoder
+from features.account_store import AccountStore
+from features.transaction_graph import TransactionGraph
+from models.train_model import TrainModels
+from models.predict_model import PredictModels
+from visualization.visualize import Visualize
+from visualization.correlation_data import StreamCorrelation
+
+# The share of each transaction type in the PaySim data
+TYPE_SHARES = {"CASH_IN": 0.2199, "CASH_OUT": 0.3517, "DEBIT": 0.0065, "PAYMENT": 0.3381, "TRANSFER": 0.0838}
+
+# The columns used by the stages (the same as run_model.py)
+NUMERIC_COLS = ["step", "amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest",
+                "isFraud", "isFlaggedFraud"]
+FEATURES = ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour", "CASH_OUT", "DEBIT", "PAYMENT",
+            "CASH_IN", "TRANSFER"]
+SCALABLE_FEATURES = ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour"]
+LOGISTIC_FEATURES = ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour", "TRANSFER"]
+BOXPLOT_COLS = ["amount", "oldbalanceOrig", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"]
+
+def make_transactions(rows: int, start: int = 0, total: int = None, fraud_rate: float = 0.0013,
+                      random_state: int = 42) -> pd.DataFrame:
+    # This function creates synthetic transactions with the PaySim schema
+    # The steps are spread evenly over a month, and fraudulent transactions (TRANSFERs and CASH_OUTs)
+    # empty the originating account, as in PaySim
+    # :param rows: the number of transactions
+    # :type rows: int
+    # :param start: the position of the first transaction in the whole file (for files written in chunks)
+    # :type start: int
+    # :param total: the number of transactions in the whole file (defaults to rows)
+    # :type total: int
+    # :param fraud_rate: the share of fraudulent transactions
+    # :type fraud_rate: float
+    # :param random_state: the seed
+    # :type random_state: int
+    # :returns: the transactions
+    # :rtype: pd.DataFrame
+
+    total = total if total is not None else rows
+    rng = np.random.default_rng([random_state, start])
+    shares = np.array(list(TYPE_SHARES.values()))
+    types = rng.choice(list(TYPE_SHARES), rows, p = shares / shares.sum())
+
+    amount = np.round(rng.lognormal(11.0, 1.4, rows), 2)
+    old_orig = np.round(np.where(rng.random(rows) < 0.33, 0.0, rng.lognormal(10.5, 2.0, rows)), 2)
+    inflow = types == "CASH_IN"
+    new_orig = np.where(inflow, old_orig + amount, np.maximum(old_orig - amount, 0.0))
+
+    # Merchants (the destinations of payments) have no balances in PaySim
+    merchant = types == "PAYMENT"
+    old_dest = np.where(merchant, 0.0, np.round(rng.lognormal(12.0, 2.0, rows), 2))
+    new_dest = np.where(merchant, 0.0, np.where(inflow, np.maximum(old_dest - amount, 0.0), old_dest + amount))
+
+    fraud = np.isin(types, ["TRANSFER", "CASH_OUT"]) & (rng.random(rows) < fraud_rate / 0.4355)
+    amount = np.where(fraud & (old_orig > 0), old_orig, amount)
+    new_orig = np.where(fraud, 0.0, new_orig)
+    new_dest = np.where(fraud & (rng.random(rows) < 0.5), old_dest, new_dest)
+
+    # A smaller pool of destination accounts, so that accounts receive from many senders
+    orig_ids = pd.Series(rng.integers(0, max(total, 1), rows)).astype(str)
+    dest_ids = pd.Series(rng.integers(0, max(total // 4, 1), rows)).astype(str)
+
+    return pd.DataFrame({"step": 1 + (np.arange(start, start + rows) * 743) // max(total, 1),
+                         "type": types, "amount": amount, "nameOrig": "C" + orig_ids, "oldbalanceOrg": old_orig,
+                         "newbalanceOrig": new_orig, "nameDest": np.where(merchant, "M", "C") + dest_ids,
+                         "oldbalanceDest": old_dest, "newbalanceDest": new_dest, "isFraud": fraud.astype(int),
+                         "isFlaggedFraud": 0})
+
+def write_transactions(file: str, rows: int, source: pd.DataFrame = None, chunk_size: int = 1000000,
+                       random_state: int = 42) -> None:
+    # This function writes a transaction file of the given size
+    # :param file: the path of the CSV file
+    # :type file: str
+    # :param rows: the number of transactions
+    # :type rows: int
+    # :param source: real transactions to sample from with replacement (if None, synthetic data is written)
+    # :type source: pd.DataFrame
+    # :param chunk_size: the number of transactions created at once
+    # :type chunk_size: int
+    # :param random_state: the seed
+    # :type random_state: int
+    # :returns: nothing is returned
+    # :rtype: None
+
+    if source is not None:
+        rng = np.random.default_rng(random_state)
+        sample = source.iloc[np.sort(rng.integers(0, len(source), rows))]
+        sample.to_csv(file, index = False)
+
+        return None
+
+    for start in range(0, rows, chunk_size):
+        chunk = make_transactions(min(chunk_size, rows - start), start, rows, random_state = random_state)
+        chunk.to_csv(file, index = False, mode = "w" if start == 0 else "a", header = start == 0)
+
+    return None
+
+class StageTimer:
+    def __init__(self, rows: int, memory: bool = False, skip: list = None):
+        # Runs the stages of one data size and records either their time or their peak memory
+        # Tracing the memory slows Python code down by up to 20x, so the two are measured in separate passes
+        # :param rows: the data size
+        # :type rows: int
+        # :param memory: whether to record the peak memory (with tracemalloc) instead of the time
+        # :type memory: bool
+        # :param skip: the stages that are not run (nor any stage that needs their results)
+        # :type skip: list
+
+        self.rows = rows
+        self.memory = memory
+        self.skip = set(skip or [])
+        self.results = []
+
+    def run(self, stage: str, func, *needs, input_rows: int = None):
+        # Run a stage and return its result (None if it was skipped or failed)
+        # The stage is skipped if it is in the skip list or if any of the results it needs is missing
+        if stage in self.skip or any(need is None for need in needs):
+            return None
+
+        gc.collect()
+        error = None
+        result = None
+
+        if self.memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start_time = time.perf_counter()
+
+        # The stages print summaries (e.g. the logistic regression), which are hidden
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = func()
+        except Exception as exception:
+            error = "{}: {}".format(type(exception).__name__, exception)
+
+        seconds = time.perf_counter() - start_time
+        peak_mb = None
+
+        # The peak is measured from the memory in use when the stage started (as in FeaturePipeline)
+        if self.memory:
+            peak_mb = (tracemalloc.get_traced_memory()[1] - start_memory) / 2**20
+
+        self.results.append({"stage": stage, "rows": self.rows,
+                             "input_rows": input_rows if input_rows is not None else self.rows,
+                             "seconds": None if self.memory else seconds, "peak_mb": peak_mb, "error": error})
+
+        measure = "{:>9.1f} MB".format(peak_mb) if self.memory else "{:>9.3f}s ".format(seconds)
+        print("{:>10,} rows  {:<24} {}".format(self.rows, stage, measure) + ("  " + error if error else ""))
+
+        return None if error else result
+
+def run_stages(file: str, rows: int, memory: bool = False, skip: list = None) -> list:
+    # This function runs every stage of the pipeline on a transaction file, in the order of run_model.py
+    # :param file: the name of the file in ../fraud_detection/data/external
+    # :type file: str
+    # :param rows: the number of transactions in the file
+    # :type rows: int
+    # :param memory: whether to record the peak memory of each stage instead of the time
+    # :type memory: bool
+    # :param skip: the stages that are not run
+    # :type skip: list
+    # :returns: the time (or peak memory) of each stage
+    # :rtype: list
+
+    from sklearn.model_selection import train_test_split
+    import matplotlib.pyplot as plt
+
+    timer = StageTimer(rows, memory, skip)
+
+    # Cleaning and feature engineering
+    # Each step modifies the data in place (as in run_model.py), so a skipped step leaves the data as it was
+    data = timer.run("load_data", lambda: CleanData.load_data(file))
+    timer.run("convert_to_numeric", lambda: CleanData.convert_to_numeric(data, NUMERIC_COLS, inplace = True), data)
+    timer.run("rename_col", lambda: CleanData.rename_col(data, "oldbalanceOrg", "oldbalanceOrig", inplace = True),
+              data)
+    timer.run("orig_account_features", lambda: AccountStore("nameOrig", "orig", balance_cols = (
+        "oldbalanceOrig", "newbalanceOrig")).transform(data, inplace = True), data)
+    timer.run("dest_account_features", lambda: AccountStore("nameDest", "dest").transform(data, inplace = True),
+              data)
+    timer.run("graph_features", lambda: TransactionGraph(window = 24).transform(data, inplace = True), data)
+    timer.run("balance_features", lambda: BuildFeatures.balance_features(data, inplace = True), data)
+    timer.run("convert_to_date", lambda: BuildFeatures.convert_to_date(data, "step", inplace = True), data)
+    timer.run("convert_to_dummy", lambda: BuildFeatures.convert_to_dummy(
+        data, inplace = True, encoder = DummyEncoder(categories = TRANSACTION_TYPES)), data)
+
+    # Visualization
+    stats = timer.run("boxplot_stats", lambda: Visualize.boxplot_stats(data, BOXPLOT_COLS, by = "isFraud"), data)
+    timer.run("transaction_boxplots", lambda: Visualize.transaction_boxplots(
+        stats["amount", 0], stats["amount", 1], "Transaction Amounts by Fraud Type", "Transaction Amount",
+        "Non-Fraudulent", "Fraudulent", file_name = "amount_fraud_comparison.png"), stats)
+    profile_cols = data.columns.drop(["nameOrig", "nameDest"], errors = "ignore")
+    timer.run("stream_profile", lambda: Visualize.stream_profile(
+        data.iloc[start:start + 500000][profile_cols] for start in range(0, len(data), 500000)), data)
+
+    def correlation_matrix():
+        correlation = StreamCorrelation()
+
+        for start in range(0, len(data), 500000):
+            correlation.update(data.iloc[start:start + 500000])
+
+        Visualize.correlation_matrix(correlation, file_name = "corr_matrix.png")
+        plt.close("all")
+
+    timer.run("correlation_matrix", correlation_matrix, data)
+    timer.run("data_profile", lambda: Visualize.data_profile(data, sample_size = 10000), data)
+
+    # Sampling, scaling, and training
+    sample = timer.run("downsample", lambda: TrainModels.downsample(data, "isFraud"), data)
+    X_train = X_test = None
+
+    # The split is stratified, so it needs a few transactions of each class
+    if sample is not None and sample["isFraud"].nunique() == 2 and sample["isFraud"].value_counts().min() >= 5:
+        X_train, X_test, y_train, y_test = train_test_split(sample[FEATURES], sample["isFraud"], test_size = 0.2,
+                                                            random_state = 42, stratify = sample["isFraud"])
+
+    scaled = timer.run("scale_data", lambda: TrainModels.scale_data(X_train, SCALABLE_FEATURES), X_train,
+                       input_rows = len(X_train) if X_train is not None else 0)
+    X_train_scaled, X_test_scaled = None, None
+
+    if scaled is not None:
+        X_train_scaled = scaled[1]
+        X_test_scaled = TrainModels.scale_data(X_test, SCALABLE_FEATURES, scaled[0])[1]
+
+    train_rows = len(X_train) if X_train is not None else 0
+    test_rows = len(X_test) if X_test is not None else 0
+
+    logistic = timer.run("logistic_model", lambda: TrainModels.logistic_model(X_train_scaled[LOGISTIC_FEATURES],
+                                                                              y_train), X_train_scaled,
+                         input_rows = train_rows)
+    svm = timer.run("svm_model", lambda: TrainModels.svm_model(X_train_scaled, y_train), X_train_scaled,
+                    input_rows = train_rows)
+    boosting = timer.run("boosting_model", lambda: TrainModels.boosting_model(data[FEATURES], data["isFraud"]),
+                         data)
+
+    # Prediction (on the held-out part of the sample, as in run_model.py)
+    timer.run("logistic_predict", lambda: PredictModels.logistic_predict(X_test_scaled[LOGISTIC_FEATURES], y_test,
+                                                                         logistic, plot = False),
+              X_test_scaled, logistic, input_rows = test_rows)
+    timer.run("svm_predict", lambda: PredictModels.svm_predict(X_test_scaled, y_test, svm, plot = False),
+              X_test_scaled, svm, input_rows = test_rows)
+    timer.run("boosting_predict", lambda: PredictModels.boosting_predict(X_test, y_test, boosting, plot = False),
+              X_test, boosting, input_rows = test_rows)
+
+    return timer.results
+
+def git_commit() -> str:
+    # This function returns the current git commit (or None outside of a git checkout)
+    # :returns: the short commit hash
+    # :rtype: str
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = ROOT_DIR, capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def plot_scaling(file: str, results: list, title: str) -> None:
+    # This function plots the time and peak memory of each stage against the data size (on log scales)
+    # :param file: the path of the PNG file
+    # :type file: str
+    # :param results: the results (from run_stages)
+    # :type results: list
+    # :param title: the title of the figure
+    # :type title: str
+    # :returns: nothing is returned
+    # :rtype: None
+
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    results = pd.DataFrame(results)
+    results = results[results["error"].isna()]
+
+    figure = Figure(figsize = (14, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(1, 2)
+
+    # There are more stages than colors, so the line style changes after every 10 stages
+    colors = matplotlib.colormaps["tab10"].colors
+
+    for position, (stage, runs) in enumerate(results.groupby("stage", sort = False)):
+        runs = runs.sort_values("rows")
+        style = {"color": colors[position % 10], "linestyle": ["-", "--", ":"][position // 10 % 3],
+                 "marker": "o", "label": stage}
+        axes[0].plot(runs["rows"], runs["seconds"], **style)
+
+        if runs["peak_mb"].notna().any():
+            axes[1].plot(runs["rows"], runs["peak_mb"], **style)
+
+    for ax, label in zip(axes, ["Time (seconds)", "Peak Memory (MB)"]):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("Rows")
+        ax.set_ylabel(label)
+        ax.grid(True, which = "both", alpha = 0.3)
+
+    # One legend for both plots (a stage has the same color in each)
+    figure.legend(*axes[0].get_legend_handles_labels(), loc = "center left", bbox_to_anchor = (1.0, 0.5),
+                  fontsize = 8)
+    figure.suptitle(title)
+    figure.savefig(file, dpi = 100, format = "png", bbox_inches = "tight")
+
+    return None
+
+def compare(results: list, baseline_file: str, tolerance: float = 1.25, min_seconds: float = 0.05) -> list:
+    # This function compares the results with the results of another run (e.g. from an earlier commit)
+    # :param results: the results (from run_stages)
+    # :type results: list
+    # :param baseline_file: the JSON file of the other run
+    # :type baseline_file: str
+    # :param tolerance: the ratio of the times above which a stage has regressed
+    # :type tolerance: float
+    # :param min_seconds: stages faster than this in both runs are not compared (their times are mostly noise)
+    # :type min_seconds: float
+    # :returns: the stages and sizes that regressed
+    # :rtype: list
+
+    with open(baseline_file) as baseline:
+        baseline = json.load(baseline)
+
+    old = {(run["stage"], run["rows"]): run["seconds"] for run in baseline["results"] if not run["error"]}
+    regressions = []
+
+    print("==========================================================")
+    print("Compared with commit {} ({}):".format(baseline.get("commit"), baseline_file))
+
+    for run in results:
+        key = (run["stage"], run["rows"])
+
+        if run["error"] or key not in old or max(run["seconds"], old[key]) < min_seconds:
+            continue
+
+        ratio = run["seconds"] / old[key] if old[key] else float("inf")
+        status = "REGRESSED" if ratio > tolerance else ""
+
+        if status:
+            regressions.append(key)
+
+        print("{:>10,} rows  {:<24} {:>9.3f}s -> {:>9.3f}s  ({:.2f}x)  {}".format(run["rows"], run["stage"], old[key],
+                                                                                 run["seconds"], ratio, status))
+
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Time and memory-profile each stage of the pipeline.")
+    parser.add_argument("--sizes", type = lambda size: int(float(size)), nargs = "+",
+                        default = [10000, 100000, 1000000, 10000000], help = "the numbers of rows")
+    parser.add_argument("--skip", nargs = "*", default = [], help = "the stages to skip (e.g. svm_model)")
+    parser.add_argument("--source", default = None,
+                        help = "a real transaction file to sample from (synthetic data is used by default)")
+    parser.add_argument("--no-memory", action = "store_true",
+                        help = "only time the stages (the peak memory is measured in a second, slower pass)")
+    parser.add_argument("--output", default = None,
+                        help = "the JSON file (defaults to ./reports/benchmarks/stages_<commit>.json)")
+    parser.add_argument("--compare", default = None, help = "a JSON file from an earlier run to compare with")
+    parser.add_argument("--tolerance", type = float, default = 1.25,
+                        help = "the slowdown above which a stage fails the comparison")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = os.path.abspath(args.output or os.path.join(".", "reports", "benchmarks",
+                                                         "stages_{}.json".format(commit or "local")))
+    os.makedirs(os.path.dirname(output), exist_ok = True)
+    source = pd.read_csv(args.source) if args.source else None
+
+    # The stages read from ../fraud_detection/data/external and write to ./reports, so they are run
+    # from a temporary copy of the project layout
+    work_dir = tempfile.mkdtemp(prefix = "fraud_benchmark_")
+    project_dir = os.path.join(work_dir, "fraud_detection")
+    os.makedirs(os.path.join(project_dir, "data", "external"))
+    os.makedirs(os.path.join(project_dir, "reports", "figures"))
+    cwd = os.getcwd()
+    results = []
+
+    try:
+        os.chdir(project_dir)
+
+        # Run every stage once on a small file first, so that the libraries the stages import lazily
+        # are not counted in the first size
+        write_transactions(os.path.join("data", "external", "warm_up.csv"), 20000, source)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_stages("warm_up.csv", 20000, False, args.skip)
+
+        for rows in sorted(args.sizes):
+            file = "benchmark_{}.csv".format(rows)
+            write_transactions(os.path.join("data", "external", file), rows, source)
+            timed = run_stages(file, rows, False, args.skip)
+
+            # The peak memory of each stage is added to its timed result
+            if not args.no_memory:
+                tracemalloc.start()
+
+                try:
+                    peaks = {run["stage"]: run["peak_mb"] for run in run_stages(file, rows, True, args.skip)}
+                finally:
+                    tracemalloc.stop()
+
+                for run in timed:
+                    run["peak_mb"] = peaks.get(run["stage"])
+
+            results += timed
+            os.remove(os.path.join("data", "external", file))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors = True)
+
+    import sklearn
+
+    run = {"commit": commit, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+           "platform": platform.platform(), "numpy": np.__version__, "pandas": pd.__version__,
+           "sklearn": sklearn.__version__, "data": args.source or "synthetic", "memory": not args.no_memory,
+           "results": results}
+
+    with open(output, "w") as output_file:
+        json.dump(run, output_file, indent = 2)
+
+    plot_scaling(os.path.splitext(output)[0] + ".png", results, "Pipeline Stage Scaling ({})".format(commit))
+    print("==========================================================")
+    print("The results were saved to {} (and the scaling curves to a .png next to it)".format(output))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+
+        if regressions:
+            print("{} stage(s) are more than {:.2f}x slower.".format(len(regressions), args.tolerance))
+            return 1
+
+        print(">>> No stage regressed!")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
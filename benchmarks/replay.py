@@ -0,0 +1,269 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This script replays the transactions in Fraud_Data.csv as a live
+# event stream to measure how a trained model would behave under real traffic.
+# The file is read in step order, and the transactions of each step (one hour
+# of event time) arrive evenly spread over that hour, sped up by a chosen
+# factor. An asyncio loop queues every arriving transaction, and scoring tasks
+# take whatever is waiting (up to a batch size) and score it with the saved
+# model bundle (its scaler and model) in a thread pool. The latency of each
+# transaction is measured from its scheduled arrival, so time spent waiting in
+# the queue is included. The script reports the p50, p95, and p99 latency, the
+# sustained throughput, and the queue depth over time, and saves them as JSON.
+#
+# Usage: python benchmarks/replay.py [--model DIR] [--speedup X] [--steps N]
+#                                    [--workers N] [--batch-size N] [--output FILE]
+#################################################################################
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from data.make_dataset import DATA_TYPES
+from features.account_store import AccountStore
+from features.transaction_graph import TransactionGraph
+from models.model_bundle import ModelBundle
+
+def account_stores(feature_cols: list) -> list:
+    # This function creates empty stores for the account and graph features that a model uses
+    # They start empty and fill up as the stream is replayed, as they would after go-live
+    # :param feature_cols: the model's features
+    # :type feature_cols: list
+    # :returns: the stores
+    # :rtype: list
+
+    stores = [AccountStore("nameOrig", "orig", balance_cols = ("oldbalanceOrig", "newbalanceOrig")),
+              AccountStore("nameDest", "dest"), TransactionGraph(window = 24)]
+
+    return [store for store in stores if set(store.columns) & set(feature_cols)]
+
+def read_steps(file: str, steps: int = None, chunk_size: int = 100000):
+    # This function reads the transactions one step at a time
+    # :param file: the path to the CSV file
+    # :type file: str
+    # :param steps: the number of steps to read (None reads the whole file)
+    # :type steps: int
+    # :param chunk_size: the number of rows read at once
+    # :type chunk_size: int
+    # :returns: a generator of (step, transactions) pairs, where the transactions are a list of dicts
+    # :rtype: generator
+
+    pending = None
+    count = 0
+
+    with pd.read_csv(file, sep = ",", dtype = DATA_TYPES, chunksize = chunk_size) as chunks:
+        for chunk in chunks:
+            if pending is not None:
+                chunk = pd.concat([pending, chunk])
+
+            if not chunk["step"].is_monotonic_increasing:
+                raise ValueError("The transactions in {} must be sorted by step.".format(file))
+
+            # The last step may continue in the next chunk, so it is held back
+            last = chunk["step"].iloc[-1]
+            pending = chunk[chunk["step"] == last]
+
+            for step, transactions in chunk[chunk["step"] != last].groupby("step", sort = False):
+                yield int(step), transactions.to_dict("records")
+                count += 1
+
+                if steps is not None and count == steps:
+                    return None
+
+    if pending is not None and len(pending):
+        yield int(pending["step"].iloc[0]), pending.to_dict("records")
+
+async def produce(events, queue: asyncio.Queue, speedup: float, start: float, consumers: int,
+                  progress: dict) -> None:
+    # Put each transaction on the queue at its scheduled arrival time
+    first_step = None
+
+    for step, transactions in events:
+        if first_step is None:
+            first_step = step
+
+        # The transactions of a step are spread evenly over its hour of event time
+        offsets = (step - first_step + np.arange(len(transactions)) / len(transactions)) * 3600 / speedup
+
+        for transaction, offset in zip(transactions, offsets.tolist()):
+            delay = start + offset - time.perf_counter()
+
+            # Sleeping for less than a millisecond is not accurate, so those transactions are sent right away
+            # They still yield to the event loop (putting on a queue with no limit never does), so the
+            # scoring tasks and the queue monitor keep running while a backlog is sent
+            await asyncio.sleep(delay if delay > 0.001 else 0)
+
+            await queue.put((start + offset, transaction))
+            progress["sent"] += 1
+
+    # One stop signal for each scoring task
+    for _ in range(consumers):
+        await queue.put(None)
+
+    return None
+
+async def consume(queue: asyncio.Queue, scorer, executor: ThreadPoolExecutor, batch_size: int,
+                  latencies: list, batch_sizes: list, progress: dict) -> None:
+    # Score whatever is waiting on the queue (up to the batch size) until a stop signal arrives
+    loop = asyncio.get_running_loop()
+    stop = False
+
+    while not stop:
+        item = await queue.get()
+
+        if item is None:
+            return None
+
+        batch = [item]
+
+        while len(batch) < batch_size and not queue.empty():
+            item = queue.get_nowait()
+
+            if item is None:
+                stop = True
+                break
+
+            batch.append(item)
+
+        await loop.run_in_executor(executor, scorer.score, [transaction for arrival, transaction in batch])
+        done = time.perf_counter()
+
+        latencies.extend(done - arrival for arrival, transaction in batch)
+        batch_sizes.append(len(batch))
+        progress["scored"] += len(batch)
+
+    return None
+
+async def monitor(queue: asyncio.Queue, start: float, interval: float, samples: list, progress: dict) -> None:
+    # Record the queue depth and the number of transactions sent and scored at a fixed interval
+    while True:
+        samples.append({"seconds": time.perf_counter() - start, "queue_depth": queue.qsize(),
+                        "sent": progress["sent"], "scored": progress["scored"]})
+        await asyncio.sleep(interval)
+
+async def replay(events, scorer, speedup: float = 3600.0, workers: int = 1, batch_size: int = 256,
+                 queue_size: int = 0, interval: float = 0.5) -> dict:
+    # This function replays a stream of transactions through a scorer and measures its performance
+    # :param events: the (step, transactions) pairs (from read_steps)
+    # :type events: iterator
+    # :param scorer: the scorer (from ModelBundle.scorer)
+    # :type scorer: FraudScorer
+    # :param speedup: how many times faster than real time the stream is replayed
+    #                 (3600 replays one step, an hour of transactions, every second)
+    # :type speedup: float
+    # :param workers: the number of scoring threads
+    # :type workers: int
+    # :param batch_size: the largest number of transactions scored at once
+    # :type batch_size: int
+    # :param queue_size: the most transactions that can wait to be scored (0 has no limit)
+    # :type queue_size: int
+    # :param interval: the time (in seconds) between samples of the queue depth
+    # :type interval: float
+    # :returns: the latency percentiles, throughput, and queue depth over time
+    # :rtype: dict
+
+    queue = asyncio.Queue(maxsize = queue_size)
+    latencies, batch_sizes, samples = [], [], []
+    progress = {"sent": 0, "scored": 0}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        sampler = asyncio.create_task(monitor(queue, start, interval, samples, progress))
+        consumers = [asyncio.create_task(consume(queue, scorer, executor, batch_size, latencies, batch_sizes,
+                                                 progress)) for _ in range(workers)]
+
+        await produce(events, queue, speedup, start, workers, progress)
+        await asyncio.gather(*consumers)
+
+        seconds = time.perf_counter() - start
+        sampler.cancel()
+
+    samples.append({"seconds": seconds, "queue_depth": queue.qsize(), "sent": progress["sent"],
+                    "scored": progress["scored"]})
+    latencies = np.array(latencies) * 1000
+
+    return {"transactions": len(latencies), "seconds": seconds, "speedup": speedup, "workers": workers,
+            "batch_size": batch_size,
+            "throughput": len(latencies) / seconds if seconds else 0.0,
+            "latency_ms": {name: float(np.percentile(latencies, q)) if len(latencies) else None
+                           for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+            "mean_batch_size": float(np.mean(batch_sizes)) if batch_sizes else 0.0,
+            "max_queue_depth": max(sample["queue_depth"] for sample in samples),
+            "queue_depth": samples}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = "Replay the transactions as a live stream through a model.")
+    parser.add_argument("--data", default = "../fraud_detection/data/external/Fraud_Data.csv",
+                        help = "the transaction file (sorted by step)")
+    parser.add_argument("--model", default = "../fraud_detection/models/logistic",
+                        help = "the model bundle directory (from ModelBundle.save)")
+    parser.add_argument("--speedup", type = float, default = 3600.0,
+                        help = "how many times faster than real time to replay (3600 is one step per second)")
+    parser.add_argument("--steps", type = int, default = 24, help = "the number of steps to replay (0 is all)")
+    parser.add_argument("--workers", type = int, default = 1, help = "the number of scoring threads")
+    parser.add_argument("--batch-size", type = int, default = 256, help = "the most transactions scored at once")
+    parser.add_argument("--queue-size", type = int, default = 0, help = "the longest queue allowed (0 has no limit)")
+    parser.add_argument("--interval", type = float, default = 0.5, help = "the seconds between queue samples")
+    parser.add_argument("--output", default = "./reports/replay.json", help = "the JSON file for the results")
+    args = parser.parse_args()
+
+    bundle = ModelBundle.load(args.model)
+    stores = account_stores(bundle.feature_cols)
+    workers = args.workers
+
+    # The stores must see the transactions in order, so they are only updated by one scoring thread
+    if stores and workers > 1:
+        print("The model uses account features, so the transactions are scored by a single thread.")
+        workers = 1
+
+    events = read_steps(args.data, args.steps or None)
+    first_step = next(events, None)
+
+    if first_step is None:
+        print("There are no transactions to replay in {}.".format(args.data))
+        return 1
+
+    # Score one transaction first so that the model's libraries are imported before the clock starts
+    # (with separate stores, so that the replayed stores start empty)
+    bundle.scorer(account_stores = account_stores(bundle.feature_cols)).score(first_step[1][0])
+
+    results = asyncio.run(replay(itertools.chain([first_step], events), bundle.scorer(account_stores = stores), 
+                                 args.speedup, workers, args.batch_size, args.queue_size, args.interval))
+    results["model"] = args.model
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok = True)
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent = 2)
+
+    latency = results["latency_ms"]
+    print("==========================================================")
+    print("Replayed {:,} transactions in {:.1f}s ({}x real time)".format(results["transactions"],
+                                                                       results["seconds"], args.speedup))
+
+    # The percentiles are None if nothing was scored
+    if results["transactions"]:
+        print("Latency (ms): p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+            latency["p50"], latency["p95"], latency["p99"], latency["max"]))
+
+    print("Throughput: {:,.0f} transactions per second".format(results["throughput"]))
+    print("Queue depth: max {:,} (mean batch size {:.1f})".format(results["max_queue_depth"],
+                                                                 results["mean_batch_size"]))
+    print("The queue depth over time was saved to {}".format(args.output))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
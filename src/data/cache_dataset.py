@@ -0,0 +1,146 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the CacheData class. This class contains two
+# main functions. The first function creates a fingerprint from a source file,
+# the code that transforms it, and a pipeline version tag. The second function
+# loads a processed dataset from a columnar (Feather) cache in ./data/processed,
+# rebuilding the cache whenever the fingerprint changes. Any other files that
+# the build writes (e.g. the account state) are cached next to the dataset and
+# restored with it.
+#################################################################################
+
+import glob
+import hashlib
+import inspect
+import os
+import shutil
+import pandas as pd
+
+# Bump this tag whenever the cleaning or feature steps change in a way that
+# the source code hash would not catch (e.g. a change in a library version)
+PIPELINE_VERSION = "1"
+
+# The code that produces the processed data
+# Any change to these files invalidates the cache
+PIPELINE_FILES = [os.path.join(os.path.dirname(__file__), "make_dataset.py"),
+                  os.path.join(os.path.dirname(os.path.dirname(__file__)), "features", "build_features.py"),
+                  os.path.join(os.path.dirname(os.path.dirname(__file__)), "features", "account_store.py"),
+                  os.path.join(os.path.dirname(os.path.dirname(__file__)), "features", "transaction_graph.py")]
+
+class CacheData:
+    def __init__(self, name):
+        self.name = name
+
+    def fingerprint(file: str, version: str = PIPELINE_VERSION, code_files: list = None,
+                    hash_contents: bool = False) -> str:
+        # This function creates a fingerprint for an external file and the code that processes it
+        # By default the file's size and modification time are used instead of hashing its contents
+        # :param file: file name
+        # :type file: str
+        # :param version: the pipeline version tag
+        # :type version: str
+        # :param code_files: the source files of the pipeline steps (defaults to PIPELINE_FILES)
+        # :type code_files: list
+        # :param hash_contents: whether to hash the full contents of the file
+        # :type hash_contents: bool
+        # :returns: the hex digest of the fingerprint
+        # :rtype: str
+
+        file_name = "../fraud_detection/data/external/" + file
+        key = hashlib.sha256()
+
+        # Identify the source data
+        stat = os.stat(file_name)
+        key.update(f"{file}|{stat.st_size}|{version}".encode())
+
+        if hash_contents:
+            with open(file_name, "rb") as source:
+                for block in iter(lambda: source.read(1 << 20), b""):
+                    key.update(block)
+        else:
+            key.update(str(stat.st_mtime_ns).encode())
+
+        # Identify the code that transforms the data
+        for code_file in (code_files if code_files is not None else PIPELINE_FILES):
+            with open(code_file, "rb") as code:
+                key.update(code.read())
+
+        return key.hexdigest()
+
+    def _copy(source: str, destination: str) -> None:
+        # Copy a file through a temporary file so that an interrupted copy never leaves a partial file
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok = True)
+        temp_file = destination + ".tmp"
+        shutil.copyfile(source, temp_file)
+        os.replace(temp_file, destination)
+
+        return None
+
+    def load_cached(file: str, build, version: str = PIPELINE_VERSION, code_files: list = None,
+                    cache_dir: str = "../fraud_detection/data/processed/", artifacts: list = None) -> pd.DataFrame:
+        # This function loads a processed dataset from the cache
+        # If there is no cache for the current fingerprint, the dataset is built and cached
+        # The artifacts are files that the build function writes as a side effect. They are cached under
+        # the same fingerprint and copied back to their paths when the cache is used, so they always
+        # match the cached dataset
+        # :param file: file name of the source data
+        # :type file: str
+        # :param build: a function that takes the file name and returns the processed dataframe
+        # :type build: callable
+        # :param version: the pipeline version tag
+        # :type version: str
+        # :param code_files: the source files of the pipeline steps (defaults to PIPELINE_FILES)
+        # :type code_files: list
+        # :param cache_dir: the directory holding the cached datasets
+        # :type cache_dir: str
+        # :param artifacts: the paths of the files that the build function writes
+        # :type artifacts: list
+        # :returns: dataframe
+        # :rtype: pd.DataFrame
+
+        stem = os.path.splitext(os.path.basename(file))[0]
+        key = CacheData.fingerprint(file, version, code_files)
+
+        # The build function is part of the pipeline, so changes to it also invalidate the cache
+        try:
+            key = hashlib.sha256((key + inspect.getsource(build)).encode()).hexdigest()
+        except (OSError, TypeError):
+            pass
+
+        cache_file = os.path.join(cache_dir, f"{stem}_{key[:16]}.feather")
+        artifacts = artifacts or []
+        cached_artifacts = [os.path.join(cache_dir, f"{stem}_{key[:16]}__{os.path.basename(artifact)}")
+                            for artifact in artifacts]
+
+        # pyarrow is slow to import, so it is imported here rather than with the module
+        import pyarrow.feather as feather
+
+        # The cache is current, so memory-map it instead of rebuilding the data
+        if os.path.exists(cache_file) and all(os.path.exists(cached) for cached in cached_artifacts):
+            for cached, artifact in zip(cached_artifacts, artifacts):
+                CacheData._copy(cached, artifact)
+
+            return feather.read_table(cache_file, memory_map = True).to_pandas()
+
+        # Use a default index so that a fresh build matches what is read back from the cache
+        data = build(file).reset_index(drop = True)
+
+        # Remove caches built from older versions of the data or code
+        os.makedirs(cache_dir, exist_ok = True)
+
+        for stale_file in glob.glob(os.path.join(cache_dir, f"{stem}_*.feather")) + \
+                glob.glob(os.path.join(cache_dir, f"{stem}_*__*")):
+            os.remove(stale_file)
+
+        # The artifacts are cached before the dataset, so a cached dataset always has its artifacts
+        for artifact, cached in zip(artifacts, cached_artifacts):
+            CacheData._copy(artifact, cached)
+
+        # Write to a temporary file first so that an interrupted run never leaves a partial cache
+        # The file is uncompressed so that it can be memory-mapped
+        temp_file = cache_file + ".tmp"
+        feather.write_feather(data, temp_file, compression = "uncompressed")
+        os.replace(temp_file, cache_file)
+
+        return data
@@ -1,14 +1,36 @@
 #################################################################################
 # Author: Cayson Seipel
 #
-# Summary: This file contains the BuildFeatures class. This class contains three
+# Summary: This file contains the CleanData class. This class contains four
 # main functions. The first function loads a specified dataset. The second
-# function converts the given fields to numeric datatypes. The third function
+# function streams a specified dataset in chunks with a fixed schema. The third
+# function converts the given fields to numeric datatypes. The fourth function
 # renames a column to a new name.
 #################################################################################
 
 import pandas as pd
 
+# The transaction types found in the PaySim data
+# The categories are fixed so that every chunk shares the same categorical codes
+TRANSACTION_TYPES = ["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"]
+
+# The explicit schema of the PaySim data
+# Numeric fields are pinned to 32-bit types to keep the memory footprint small
+DATA_TYPES = {"step": "int32", 
+              "type": pd.CategoricalDtype(TRANSACTION_TYPES), 
+              "amount": "float32", 
+              "nameOrig": "object", 
+              "oldbalanceOrg": "float32", 
+              "newbalanceOrig": "float32", 
+              "nameDest": "object", 
+              "oldbalanceDest": "float32", 
+              "newbalanceDest": "float32", 
+              "isFraud": "int32", 
+              "isFlaggedFraud": "int32"}
+
+# The account name columns which can be skipped while reading
+NAME_COLS = ["nameOrig", "nameDest"]
+
 class CleanData:
     def __init__(self, name):
         self.name = name
@@ -24,25 +46,70 @@ class CleanData:
         data = pd.read_csv(file_name, sep = ",")
 
         return data
+
+    def stream_data(file: str, chunk_size: int = 500000, drop_names: bool = True, consumer = None):
+        # This function reads a dataset from an external file in chunks of a fixed size
+        # Every chunk is read with the explicit schema in DATA_TYPES so that peak memory 
+        # depends on the chunk size instead of the size of the file
+        # :param file: file name
+        # :type file: str
+        # :param chunk_size: the number of rows in each chunk
+        # :type chunk_size: int
+        # :param drop_names: whether the nameOrig and nameDest columns are skipped
+        # :type drop_names: bool
+        # :param consumer: a function called with each chunk (if None, the chunks are yielded)
+        # :type consumer: callable
+        # :returns: a generator of dataframes, or the number of rows read if a consumer is given
+        # :rtype: generator or int
+
+        file_name = "../fraud_detection/data/external/" + file
+
+        # Only parse the columns that are needed
+        if drop_names:
+            cols = [col for col in DATA_TYPES if col not in NAME_COLS]
+        else:
+            cols = list(DATA_TYPES)
+
+        chunks = pd.read_csv(file_name, sep = ",", usecols = cols, 
+                             dtype = {col: DATA_TYPES[col] for col in cols}, chunksize = chunk_size)
+
+        # No consumer was given, so hand the chunks back to the caller
+        if consumer is None:
+            return chunks
+
+        # Hand each chunk to the consumer and release it before reading the next one
+        rows = 0
+
+        with chunks:
+            for chunk in chunks:
+                consumer(chunk)
+                rows += len(chunk)
+
+        return rows
     
-    def convert_to_numeric(data: pd.DataFrame, cols: list) -> pd.DataFrame:
+    def convert_to_numeric(data: pd.DataFrame, cols: list, inplace: bool = False) -> pd.DataFrame:
         # This function converts a list of columns to a numeric datatype
         # :param data: the dataset
         # :type data: pd.Dataframe
         # :param cols: columns to be converted to a numeric datatype
         # :type cols: list 
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
         # :returns: dataframe
         # :rtype: pd.dataframe 
 
-        # Create a copy of the data to preserve the original
-        data_copy = data.copy()
+        # Create a copy of the data to preserve the original (unless modifying in place)
+        data_copy = data if inplace else data.copy()
 
         # Convert the numeric data into appropriate numeric types
-        data_copy[cols].apply(pd.to_numeric)
+        # Columns that are already numeric are left alone so that no memory is reallocated
+        for col in cols:
+            if not pd.api.types.is_numeric_dtype(data_copy[col]):
+                data_copy[col] = pd.to_numeric(data_copy[col])
 
         return data_copy
 
-    def rename_col(data: pd.DataFrame, col: str, col_name: str) -> pd.DataFrame:
+    def rename_col(data: pd.DataFrame, col: str, col_name: str, inplace: bool = False) -> pd.DataFrame:
         # This function renames a column
         # :param data: the dataset
         # :type data: pd.Dataframe
@@ -50,10 +117,18 @@ class CleanData:
         # :type col: string
         # :param col_name: new column name
         # :type col_name: string
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
         # :returns: dataframe
         # :rtype: pd.dataframe 
 
+        # Rename a column in place
+        if inplace:
+            data.rename(columns = {col: col_name}, inplace = True)
+
+            return data
+
         # Rename a column 
         data_copy = data.rename(columns = {col: col_name})
 
-        return data_copy
\ No newline at end of file
+        return data_copy
@@ -0,0 +1,252 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the StratifiedSampler class. It samples rows so
+# that the classes of the target (isFraud) are in a chosen ratio, optionally
+# keeping the proportions of strata such as the transaction type or the day
+# within each class. Every row gets a random key from a hash of its index
+# label and the seed, and the rows with the smallest keys in each class and
+# stratum are kept. This gives the same sample for the same data and seed
+# whether the data is sampled at once (as index positions, without copying
+# the data) or in a streaming pass over chunks (a reservoir for each class and
+# stratum), and streaming samplers from separate processes can be merged.
+#################################################################################
+
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+def random_keys(labels: np.ndarray, random_state: int = 42) -> np.ndarray:
+    # This function returns a random key in [0, 1) for each row from its (integer) index label
+    # The keys come from the splitmix64 hash, so a row always gets the same key for the same seed
+    # :param labels: the integer index labels of the rows
+    # :type labels: np.ndarray
+    # :param random_state: the seed
+    # :type random_state: int
+    # :returns: the keys
+    # :rtype: np.ndarray
+
+    with np.errstate(over = "ignore"):
+        z = np.asarray(labels).astype(np.uint64) + np.uint64(random_state) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z ^= z >> np.uint64(31)
+
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+class StratifiedSampler:
+    def __init__(self, target: str = "isFraud", class_ratio: dict = None, strata: list = None,
+                 n_samples: int = None, random_state: int = 42):
+        # :param target: the class column
+        # :type target: str
+        # :param class_ratio: the relative size of each class in the sample, e.g. {0: 3, 1: 1} for three
+        #                     legitimate transactions per fraudulent one (if None, the classes are balanced)
+        # :type class_ratio: dict
+        # :param strata: the columns whose proportions are kept within each class, e.g. ["type", "day"]
+        # :type strata: list
+        # :param n_samples: the size of the sample (if None, the sample is as large as the ratio allows
+        #                   while keeping every row of the limiting class; required for streaming)
+        # :type n_samples: int
+        # :param random_state: the seed
+        # :type random_state: int
+
+        self.target = target
+        self.class_ratio = class_ratio
+        self.strata = list(strata) if strata else []
+        self.n_samples = n_samples
+        self.random_state = random_state
+
+        # The state of a streaming pass: the number of rows in each (class, stratum) group and the
+        # rows with the smallest keys in each group (with their keys in the _key column)
+        self.counts = Counter()
+        self.reservoir = None
+
+    def quotas(self, class_counts: dict) -> dict:
+        # This function returns the number of rows sampled from each class
+        # :param class_counts: the number of rows in each class
+        # :type class_counts: dict
+        # :returns: the number of rows sampled from each class
+        # :rtype: dict
+
+        ratio = self.class_ratio if self.class_ratio is not None else {label: 1 for label in class_counts}
+        ratio = {label: weight for label, weight in ratio.items() if weight > 0}
+        total = sum(ratio.values())
+
+        if self.n_samples is None:
+            # The largest sample that the smallest class (relative to its share) allows
+            scale = min(class_counts.get(label, 0) / weight for label, weight in ratio.items())
+        else:
+            scale = self.n_samples / total
+
+        return {label: min(class_counts.get(label, 0), int(round(scale * weight))) for label, weight in ratio.items()}
+
+    def allocate(self, counts: dict) -> dict:
+        # This function splits each class's quota across its strata in proportion to their sizes
+        # Rounding is done with the largest remainders, with ties going to the first stratum (in sorted order)
+        # :param counts: the number of rows in each (class, stratum) group
+        # :type counts: dict
+        # :returns: the number of rows sampled from each group
+        # :rtype: dict
+
+        class_counts = Counter()
+
+        for (label, stratum), count in counts.items():
+            class_counts[label] += count
+
+        allocation = {}
+
+        for label, quota in self.quotas(class_counts).items():
+            groups = sorted(group for group in counts if group[0] == label)
+            shares = np.array([quota * counts[group] / class_counts[label] for group in groups])
+            sizes = np.floor(shares).astype(np.int64)
+            extra = np.argsort(-(shares - sizes), kind = "stable")[:quota - sizes.sum()]
+            sizes[extra] += 1
+            allocation.update(zip(groups, sizes.tolist()))
+
+        return allocation
+
+    def _groups(self, data: pd.DataFrame) -> tuple:
+        # Return the (class, stratum) group code of each row, the name of each code, and the size of each group
+        classes, label_codes = np.unique(data[self.target].to_numpy(), return_inverse = True)
+        codes = np.zeros(len(data), dtype = np.int64)
+        values = []
+
+        # Combine the sorted codes of each column into one code, so no tuples are built for each row
+        for col in self.strata:
+            col_codes, uniques = pd.factorize(data[col], sort = True)
+
+            # A missing value gets the code -1, which would be counted in another stratum
+            if (col_codes < 0).any():
+                raise ValueError("The stratum column {} has missing values.".format(col))
+
+            codes = codes * len(uniques) + col_codes
+            values.append(uniques.tolist())
+
+        combined, codes = np.unique(codes, return_inverse = True)
+        strata = []
+
+        for code in combined.tolist():
+            stratum = []
+
+            for uniques in reversed(values):
+                code, position = divmod(code, len(uniques))
+                stratum.append(uniques[position])
+
+            strata.append(tuple(reversed(stratum)))
+
+        group = label_codes.astype(np.int64).ravel() * len(strata) + codes.ravel()
+        names = [(label, stratum) for label in classes.tolist() for stratum in strata]
+
+        return group, names, np.bincount(group, minlength = len(names))
+
+    def _smallest(self, group: np.ndarray, group_counts: np.ndarray, keys: np.ndarray, 
+                  limit: np.ndarray) -> np.ndarray:
+        # Return the sorted positions of the rows with the smallest keys in each group,
+        # keeping limit[code] rows from the group with that code
+        order = np.lexsort((keys, group))
+        starts = np.concatenate(([0], np.cumsum(group_counts)[:-1])).astype(np.int64)
+        sorted_group = group[order]
+        rank = np.arange(len(order)) - starts[sorted_group]
+
+        return np.sort(order[rank < limit[sorted_group]])
+
+    def _keys(self, data: pd.DataFrame) -> np.ndarray:
+        # Key each row by its index label
+        # Other labels (e.g. strings) are hashed to integers first, so that the chunks of a stream never
+        # reuse the same keys (as their positions would)
+        if pd.api.types.is_integer_dtype(data.index):
+            return random_keys(data.index.to_numpy(), self.random_state)
+
+        return random_keys(pd.util.hash_array(data.index.to_numpy()), self.random_state)
+
+    def sample_indices(self, data: pd.DataFrame) -> np.ndarray:
+        # This function returns the positions of the sampled rows (for data.iloc) without copying the data
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :returns: the sorted positions of the sampled rows
+        # :rtype: np.ndarray
+
+        group, names, group_counts = self._groups(data)
+        allocation = self.allocate({name: int(count) for name, count in zip(names, group_counts) if count})
+        limit = np.array([allocation.get(name, 0) for name in names], dtype = np.int64)
+
+        return self._smallest(group, group_counts, self._keys(data), limit)
+
+    def sample(self, data: pd.DataFrame) -> pd.DataFrame:
+        # This function returns the sampled rows
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :returns: the sample
+        # :rtype: pd.DataFrame
+
+        return data.iloc[self.sample_indices(data)]
+
+    def _capacity(self, label) -> int:
+        # A group never needs more rows than the largest possible quota of its class
+        if self.class_ratio is None:
+            return self.n_samples
+
+        return int(round(self.n_samples * self.class_ratio.get(label, 0) / sum(self.class_ratio.values())))
+
+    def _keep(self, rows: pd.DataFrame) -> None:
+        # Add rows (with their keys) to the reservoir and keep the rows with the smallest keys in each group
+        if self.reservoir is not None:
+            rows = pd.concat([self.reservoir, rows])
+
+        group, names, group_counts = self._groups(rows)
+        limit = np.array([self._capacity(label) for label, stratum in names], dtype = np.int64)
+        self.reservoir = rows.iloc[self._smallest(group, group_counts, rows["_key"].to_numpy(), limit)]
+
+        return None
+
+    def update(self, chunk: pd.DataFrame) -> "StratifiedSampler":
+        # This function adds a chunk of rows to a streaming sample
+        # The chunks should keep the index labels of the full dataset (as pd.read_csv chunks do),
+        # so that each row gets the same key as it would when sampling all of the data at once
+        # :param chunk: the rows
+        # :type chunk: pd.DataFrame
+        # :returns: the updated sampler
+        # :rtype: StratifiedSampler
+
+        if self.n_samples is None:
+            raise ValueError("n_samples must be set to sample a stream.")
+
+        group, names, group_counts = self._groups(chunk)
+        self.counts.update({name: int(count) for name, count in zip(names, group_counts) if count})
+
+        # Only the rows that could be in the sample are copied out of the chunk
+        keys = self._keys(chunk)
+        limit = np.array([self._capacity(label) for label, stratum in names], dtype = np.int64)
+        rows = self._smallest(group, group_counts, keys, limit)
+        self._keep(chunk.iloc[rows].assign(_key = keys[rows]))
+
+        return self
+
+    def merge(self, other: "StratifiedSampler") -> "StratifiedSampler":
+        # This function combines another streaming sample (of different rows) into this one
+        # :param other: the other sampler (with the same settings)
+        # :type other: StratifiedSampler
+        # :returns: the combined sampler
+        # :rtype: StratifiedSampler
+
+        self.counts.update(other.counts)
+
+        if other.reservoir is not None:
+            self._keep(other.reservoir)
+
+        return self
+
+    def result(self) -> pd.DataFrame:
+        # This function returns the sample from a streaming pass
+        # :returns: the sample (in index order)
+        # :rtype: pd.DataFrame
+
+        if self.reservoir is None:
+            return pd.DataFrame()
+
+        allocation = self.allocate(self.counts)
+        group, names, group_counts = self._groups(self.reservoir)
+        limit = np.array([allocation.get(name, 0) for name in names], dtype = np.int64)
+        rows = self._smallest(group, group_counts, self.reservoir["_key"].to_numpy(), limit)
+
+        return self.reservoir.iloc[rows].drop(columns = "_key").sort_index()
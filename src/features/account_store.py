@@ -0,0 +1,407 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the AccountStore class. It builds velocity
+# features for the accounts in one of the name columns (nameOrig or nameDest):
+# the number of transactions and the total amount of the account within the
+# last few hours (steps), the hours since the account's previous transaction,
+# and whether a transaction has ever drained the account to zero. Account
+# names are encoded as integer IDs that index flat arrays of each account's
+# state, and the transactions inside each time window are kept in a ring
+# buffer so that expired transactions can be subtracted from their accounts.
+# The features of a full dataset are computed in one vectorized pass (for
+# training), and the store can then be updated one transaction at a time (for
+# scoring) in constant time per transaction. Both give the same features.
+#################################################################################
+
+import numpy as np
+import pandas as pd
+
+class EventRing:
+    def __init__(self, capacity: int = 1024):
+        # The (account, step, amount) of each transaction inside a time window, oldest first
+        # The buffer is circular and doubles in size when it is full
+        # :param capacity: the initial number of transactions the buffer holds
+        # :type capacity: int
+
+        self.accounts = np.empty(capacity, dtype = np.int64)
+        self.steps = np.empty(capacity, dtype = np.int64)
+        self.amounts = np.empty(capacity, dtype = np.float64)
+        self.head = 0
+        self.size = 0
+
+    def _positions(self, count: int) -> np.ndarray:
+        # The buffer positions of the oldest count transactions, in order
+        return (self.head + np.arange(count)) % len(self.steps)
+
+    def _grow(self, needed: int) -> None:
+        # Copy the transactions (in order) into a larger buffer
+        positions = self._positions(self.size)
+        capacity = max(needed, 2 * len(self.steps))
+
+        for name in ("accounts", "steps", "amounts"):
+            values = getattr(self, name)
+            grown = np.empty(capacity, dtype = values.dtype)
+            grown[:self.size] = values[positions]
+            setattr(self, name, grown)
+
+        self.head = 0
+
+        return None
+
+    def push(self, accounts: np.ndarray, steps: np.ndarray, amounts: np.ndarray) -> None:
+        # Add transactions (in time order) to the end of the buffer
+        if self.size + len(accounts) > len(self.steps):
+            self._grow(self.size + len(accounts))
+
+        positions = (self.head + self.size + np.arange(len(accounts))) % len(self.steps)
+        self.accounts[positions] = accounts
+        self.steps[positions] = steps
+        self.amounts[positions] = amounts
+        self.size += len(accounts)
+
+        return None
+
+    def push_one(self, account: int, step: int, amount: float) -> None:
+        # Add one transaction to the end of the buffer
+        if self.size == len(self.steps):
+            self._grow(self.size + 1)
+
+        position = (self.head + self.size) % len(self.steps)
+        self.accounts[position] = account
+        self.steps[position] = step
+        self.amounts[position] = amount
+        self.size += 1
+
+        return None
+
+    def expire(self, cutoff: int) -> tuple:
+        # Remove the transactions at or before the cutoff step and return their accounts and amounts
+        # The buffer is made of at most two sorted runs (before and after it wraps around)
+        end = min(self.head + self.size, len(self.steps))
+        count = int(np.searchsorted(self.steps[self.head:end], cutoff, side = "right"))
+
+        if count == end - self.head and self.head + self.size > len(self.steps):
+            wrapped = self.head + self.size - len(self.steps)
+            count += int(np.searchsorted(self.steps[:wrapped], cutoff, side = "right"))
+
+        positions = self._positions(count)
+        expired = (self.accounts[positions], self.amounts[positions])
+        self.head = (self.head + count) % len(self.steps)
+        self.size -= count
+
+        return expired
+
+    def expire_one(self, cutoff: int):
+        # Remove the transactions at or before the cutoff step one at a time (a generator of accounts and amounts)
+        while self.size and self.steps[self.head] <= cutoff:
+            yield int(self.accounts[self.head]), float(self.amounts[self.head])
+
+            self.head = (self.head + 1) % len(self.steps)
+            self.size -= 1
+
+    def events(self) -> tuple:
+        # Return the accounts, steps, and amounts of the transactions in the buffer, oldest first
+        positions = self._positions(self.size)
+
+        return self.accounts[positions], self.steps[positions], self.amounts[positions]
+
+class AccountStore:
+    def __init__(self, key: str = "nameOrig", prefix: str = "orig", windows: tuple = (1, 24),
+                 amount_col: str = "amount", balance_cols: tuple = None):
+        # :param key: the account name column
+        # :type key: str
+        # :param prefix: the prefix of the feature columns (e.g. "orig" gives orig_count_24h)
+        # :type prefix: str
+        # :param windows: the lengths of the time windows in hours (steps)
+        # :type windows: tuple
+        # :param amount_col: the transaction amount column
+        # :type amount_col: str
+        # :param balance_cols: the account's balance columns before and after the transaction, e.g.
+        #                      ("oldbalanceOrig", "newbalanceOrig") (if None, there is no drained feature)
+        # :type balance_cols: tuple
+
+        self.key = key
+        self.prefix = prefix
+        self.windows = tuple(sorted(int(window) for window in windows))
+        self.amount_col = amount_col
+        self.balance_cols = tuple(balance_cols) if balance_cols is not None else None
+
+        # The integer ID of each account (IDs are given out in order, so the names are the keys in ID order)
+        self.ids = {}
+
+        # The state of each account, indexed by its ID
+        self.counts = np.zeros((len(self.windows), 0), dtype = np.int64)
+        self.totals = np.zeros((len(self.windows), 0), dtype = np.float64)
+        self.last_step = np.zeros(0, dtype = np.int64)
+        self.drained = np.zeros(0, dtype = bool)
+
+        # The transactions inside each window and the latest step seen
+        self.rings = [EventRing() for _ in self.windows]
+        self.now = -1
+
+    @property
+    def columns(self) -> list:
+        # The names of the feature columns, in order
+        columns = []
+
+        for window in self.windows:
+            columns += ["{}_count_{}h".format(self.prefix, window), "{}_amount_{}h".format(self.prefix, window)]
+
+        columns.append("{}_hours_since_last".format(self.prefix))
+
+        if self.balance_cols is not None:
+            columns.append("{}_drained".format(self.prefix))
+
+        return columns
+
+    @property
+    def inputs(self) -> list:
+        # The columns of the transactions that the store reads
+        return [self.key, self.amount_col, "step"] + list(self.balance_cols or ())
+
+    def _grow(self, accounts: int) -> None:
+        # Make room for the state of new accounts (the arrays at least double so that growing is amortized)
+        if accounts <= len(self.last_step):
+            return None
+
+        capacity = max(accounts, 2 * len(self.last_step))
+        extra = capacity - len(self.last_step)
+        self.counts = np.concatenate([self.counts, np.zeros((len(self.windows), extra), dtype = np.int64)], axis = 1)
+        self.totals = np.concatenate([self.totals, np.zeros((len(self.windows), extra))], axis = 1)
+        self.last_step = np.concatenate([self.last_step, np.full(extra, -1, dtype = np.int64)])
+        self.drained = np.concatenate([self.drained, np.zeros(extra, dtype = bool)])
+
+        return None
+
+    def encode(self, names) -> np.ndarray:
+        # This function returns the integer ID of each account name, giving new accounts the next free IDs
+        # :param names: the account names
+        # :type names: pd.Series or np.ndarray
+        # :returns: the ID of each account
+        # :rtype: np.ndarray
+
+        # Each distinct name is only looked up once
+        codes, uniques = pd.factorize(np.asarray(names, dtype = object))
+        unique_ids = np.fromiter((self.ids.setdefault(name, len(self.ids)) for name in uniques),
+                                 dtype = np.int64, count = len(uniques))
+        self._grow(len(self.ids))
+
+        return unique_ids[codes]
+
+    def _steps(self, data: pd.DataFrame) -> np.ndarray:
+        # The hour (step) of each transaction, rebuilt from the day and hour columns if step was already converted
+        if "step" in data.columns:
+            return data["step"].to_numpy(dtype = np.int64)
+
+        return data["day"].to_numpy(dtype = np.int64) * 24 + data["hour"].to_numpy(dtype = np.int64)
+
+    def _drains(self, data: pd.DataFrame) -> np.ndarray:
+        # Whether each transaction leaves an account that had money with a zero balance
+        if self.balance_cols is None:
+            return np.zeros(len(data), dtype = bool)
+
+        before, after = self.balance_cols
+
+        return (data[before].to_numpy() > 0) & (data[after].to_numpy() <= 0)
+
+    def transform(self, data: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        # This function adds the velocity features of a batch of transactions in one vectorized pass
+        # The transactions are taken in step order (keeping the row order within a step) and continue from
+        # any transactions the store has already seen, so transforming a dataset in chunks (or following
+        # it with AccountStore.update) gives the same features as transforming it all at once
+        # The counts and amounts include the transaction itself
+        # :param data: the transactions (with the account name, amount, and step or day and hour columns)
+        # :type data: pd.DataFrame
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
+        # :returns: dataframe
+        # :rtype: pd.DataFrame
+
+        data_copy = data if inplace else data.copy()
+        steps = self._steps(data_copy)
+
+        if len(steps) and steps.min() < self.now:
+            raise ValueError("The transactions must not be older than the latest step in the store.")
+
+        order = np.argsort(steps, kind = "stable")
+        ids = self.encode(data_copy[self.key])[order]
+        steps = steps[order]
+        amounts = data_copy[self.amount_col].to_numpy(dtype = np.float64)[order]
+        drains = self._drains(data_copy)[order]
+
+        # The transactions still inside the longest window come before the batch
+        history_ids, history_steps, history_amounts = self.rings[-1].events()
+        all_ids = np.concatenate([history_ids, ids])
+        all_steps = np.concatenate([history_steps, steps])
+        all_amounts = np.concatenate([history_amounts, amounts])
+        all_drains = np.concatenate([np.zeros(len(history_ids), dtype = bool), drains])
+
+        # Group the transactions by account, in time order within each account
+        sequence = np.arange(len(all_ids))
+        by_account = np.lexsort((sequence, all_steps, all_ids))
+        sorted_ids = all_ids[by_account]
+        sorted_steps = all_steps[by_account]
+        new_rows = by_account >= len(history_ids)
+        positions = np.arange(len(by_account))
+
+        # One sorted key per transaction (account, then step) so that each window is a single searchsorted
+        relative = sorted_steps - (sorted_steps.min() if len(sorted_steps) else 0)
+        span = (relative.max() if len(relative) else 0) + self.windows[-1] + 1
+        keys = sorted_ids * span + relative + self.windows[-1]
+        amount_sums = np.concatenate([[0.0], np.cumsum(all_amounts[by_account])])
+
+        features = {}
+
+        for window in self.windows:
+            starts = np.searchsorted(keys, keys - window, side = "right")
+            features["{}_count_{}h".format(self.prefix, window)] = (positions - starts + 1).astype(np.int32)
+            features["{}_amount_{}h".format(self.prefix, window)] = (amount_sums[positions + 1] -
+                                                                     amount_sums[starts]).astype(np.float32)
+
+        # The previous transaction of the same account, or the last step in the store's state
+        first = np.r_[True, sorted_ids[1:] != sorted_ids[:-1]] if len(sorted_ids) else np.zeros(0, dtype = bool)
+        previous = np.where(first, self.last_step[sorted_ids], np.r_[-1, sorted_steps[:-1]])
+        features["{}_hours_since_last".format(self.prefix)] = np.where(previous >= 0, sorted_steps - previous,
+                                                                       -1).astype(np.int32)
+
+        # An account stays drained once any of its transactions has emptied it
+        drain_sums = np.concatenate([[0], np.cumsum(all_drains[by_account])])
+        group_starts = np.maximum.accumulate(np.where(first, positions, 0))
+        drained = (drain_sums[positions + 1] - drain_sums[group_starts] > 0) | self.drained[sorted_ids]
+
+        if self.balance_cols is not None:
+            features["{}_drained".format(self.prefix)] = drained.astype(np.int8)
+
+        # Put the features of the batch back in the original row order
+        rows = np.empty(len(order), dtype = np.int64)
+        rows[order] = np.arange(len(order))
+        batch_positions = by_account[new_rows] - len(history_ids)
+
+        for col in self.columns:
+            values = np.empty(len(order), dtype = features[col].dtype)
+            values[batch_positions] = features[col][new_rows]
+            data_copy[col] = values[rows]
+
+        # Update the state of each account with its last transaction
+        last = np.r_[sorted_ids[1:] != sorted_ids[:-1], True] if len(sorted_ids) else first
+        self.last_step[sorted_ids[last]] = sorted_steps[last]
+        self.drained[sorted_ids[last]] = drained[last]
+        self._advance(ids, steps, amounts)
+
+        return data_copy
+
+    def _advance(self, ids: np.ndarray, steps: np.ndarray, amounts: np.ndarray) -> None:
+        # Add a batch of transactions (in time order) to every window and remove the ones that expired
+        if not len(steps):
+            return None
+
+        self.now = int(steps[-1])
+
+        for position, (window, ring) in enumerate(zip(self.windows, self.rings)):
+            ring.push(ids, steps, amounts)
+            np.add.at(self.counts[position], ids, 1)
+            np.add.at(self.totals[position], ids, amounts)
+
+            expired_ids, expired_amounts = ring.expire(self.now - window)
+            np.subtract.at(self.counts[position], expired_ids, 1)
+            np.subtract.at(self.totals[position], expired_ids, expired_amounts)
+
+            # Clear the rounding error of accounts with no transactions left in the window
+            empty = expired_ids[self.counts[position, expired_ids] == 0]
+            self.totals[position, empty] = 0.0
+
+        return None
+
+    def update(self, record: dict) -> dict:
+        # This function adds one transaction to the store and returns its velocity features
+        # The work done is constant for each transaction (apart from the transactions that expire)
+        # :param record: the transaction (with the account name, amount, and step or day and hour)
+        # :type record: dict
+        # :returns: the features of the transaction
+        # :rtype: dict
+
+        step = int(record["step"]) if "step" in record else int(record["day"]) * 24 + int(record["hour"])
+
+        if step < self.now:
+            raise ValueError("The transactions must not be older than the latest step in the store.")
+
+        account = self.ids.get(record[self.key])
+
+        if account is None:
+            account = self.ids[record[self.key]] = len(self.ids)
+            self._grow(len(self.ids))
+
+        amount = float(record[self.amount_col])
+        self.now = step
+        features = {}
+
+        for position, (window, ring) in enumerate(zip(self.windows, self.rings)):
+            for expired, expired_amount in ring.expire_one(step - window):
+                self.counts[position, expired] -= 1
+                self.totals[position, expired] = (self.totals[position, expired] - expired_amount
+                                                  if self.counts[position, expired] else 0.0)
+
+            ring.push_one(account, step, amount)
+            self.counts[position, account] += 1
+            self.totals[position, account] += amount
+            features["{}_count_{}h".format(self.prefix, window)] = int(self.counts[position, account])
+            features["{}_amount_{}h".format(self.prefix, window)] = float(self.totals[position, account])
+
+        previous = self.last_step[account]
+        features["{}_hours_since_last".format(self.prefix)] = int(step - previous) if previous >= 0 else -1
+        self.last_step[account] = step
+
+        if self.balance_cols is not None:
+            before, after = self.balance_cols
+            self.drained[account] |= float(record[before]) > 0 and float(record[after]) <= 0
+            features["{}_drained".format(self.prefix)] = int(self.drained[account])
+
+        return features
+
+    def save(self, file: str) -> None:
+        # This function saves the store's settings and state to an .npz file
+        # :param file: the file name
+        # :type file: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        accounts = len(self.ids)
+        rings = {}
+
+        for position, ring in enumerate(self.rings):
+            rings.update(zip(["ring_accounts_{}".format(position), "ring_steps_{}".format(position),
+                              "ring_amounts_{}".format(position)], ring.events()))
+
+        np.savez(file, key = self.key, prefix = self.prefix, windows = np.array(self.windows),
+                 amount_col = self.amount_col, balance_cols = np.array(self.balance_cols or (), dtype = str),
+                 names = np.array(list(self.ids), dtype = str), counts = self.counts[:, :accounts],
+                 totals = self.totals[:, :accounts], last_step = self.last_step[:accounts],
+                 drained = self.drained[:accounts], now = self.now, **rings)
+
+        return None
+
+    def load(file: str) -> "AccountStore":
+        # This function loads a store saved by AccountStore.save (e.g. to score new transactions)
+        # It is called on the class (AccountStore.load(file))
+        # :param file: the file name
+        # :type file: str
+        # :returns: the store
+        # :rtype: AccountStore
+
+        with np.load(file) as state:
+            balance_cols = state["balance_cols"].tolist()
+            store = AccountStore(str(state["key"]), str(state["prefix"]), state["windows"].tolist(),
+                                 str(state["amount_col"]), balance_cols or None)
+            store.ids = {name: position for position, name in enumerate(state["names"].tolist())}
+            store.counts = state["counts"].astype(np.int64)
+            store.totals = state["totals"].astype(np.float64)
+            store.last_step = state["last_step"].astype(np.int64)
+            store.drained = state["drained"].astype(bool)
+            store.now = int(state["now"])
+
+            for position, ring in enumerate(store.rings):
+                ring.push(state["ring_accounts_{}".format(position)], state["ring_steps_{}".format(position)],
+                          state["ring_amounts_{}".format(position)])
+
+        return store
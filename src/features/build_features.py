@@ -1,32 +1,43 @@
 #################################################################################
 # Author: Cayson Seipel
 #
-# Summary: This file contains the BuildFeatures class. This class contains two
+# Summary: This file contains the BuildFeatures class. This class contains three
 # main functions. The first function converts a date field of a specific type
 # (see the function for more details) to a day and hour field. 
 # The second function converts a categorical field (called "type") to multiple
-# dummy variables.
+# dummy variables. The third function adds balance-consistency features for the
+# originating and destination accounts. This file also contains the
+# DummyEncoder class, which stores the categories seen in the training data so
+# that every dataset it encodes ends up with the same dummy variables in the
+# same order.
 #################################################################################
 
+import numpy as np
 import pandas as pd
 import sys
 
+# The columns added by BuildFeatures.balance_features
+BALANCE_FEATURES = ["orig_balance_error", "dest_balance_error", "orig_zero_before", "orig_zero_after",
+                    "dest_zero_before", "dest_zero_after", "orig_amount_ratio", "dest_amount_ratio"]
+
 class BuildFeatures:
     def __init__(self, name):
         self.name = name
 
-    def convert_to_date(data: pd.DataFrame, col: str) -> pd.DataFrame:
+    def convert_to_date(data: pd.DataFrame, col: str, inplace: bool = False) -> pd.DataFrame:
         # This function converts a column into a date field (an hour and a day column)
         # The original column is an integer type representing the hours since the beginning of the month
         # :param data: the dataset
         # :type data: pd.Dataframe
         # :param col: column location to be converted to a date field
         # :type col: string 
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
         # :returns: dataframe
         # :rtype: pd.dataframe 
         
-        # Copy the data so as not to change the original dataset
-        data_copy = data.copy()
+        # Copy the data so as not to change the original dataset (unless modifying in place)
+        data_copy = data if inplace else data.copy()
 
         # determine the day and hour of the transaction
         # Add the data to new columns
@@ -38,14 +49,38 @@ class BuildFeatures:
 
         return data_copy
 
-    def convert_to_dummy(data: pd.DataFrame, remove_cash_in: bool = True) -> pd.DataFrame:
+    def convert_to_dummy(data: pd.DataFrame, remove_cash_in: bool = True, inplace: bool = False, 
+                         encoder: "DummyEncoder" = None) -> pd.DataFrame:
         # This function converts a categorical column into dummy variables
         # The original column is a string representing the column to be one-hot encoded
         # IMPORTANT: The dataset must contain the column "type" which has multiple rows
         # :param data: the dataset
         # :type data: pd.Dataframe
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
+        # :param encoder: a fitted encoder (if given, its categories are used instead of the ones in the data)
+        # :type encoder: DummyEncoder
         # :returns: dataframe
         # :rtype: pd.dataframe 
+
+        # Use the categories from the training data
+        if encoder is not None:
+            return encoder.encode(data, inplace)
+
+        # Only the dummy columns are allocated when modifying in place
+        # They are appended to the end of the dataset, the same as pd.get_dummies
+        if inplace:
+            if "type" not in data.columns:
+                print("the column \"type\" does not exist in the data.")
+                sys.exit(1)
+
+            dummies = pd.get_dummies(data["type"], prefix = "", prefix_sep = "")
+            data.drop("type", axis = 1, inplace = True)
+
+            for col in dummies.columns:
+                data[col] = dummies[col]
+
+            return data
         
         # Copy the data so as not to change the original dataset
         data_copy = data.copy()
@@ -58,4 +93,151 @@ class BuildFeatures:
             print("the column \"type\" does not exist in the data.")
             sys.exit(1)
 
-        return data_copy
\ No newline at end of file
+        return data_copy
+
+    def balance_features(data: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        # This function adds features that check whether each account's balances agree with the amount
+        # In PaySim, fraudulent transfers often leave the balances inconsistent (e.g. the destination balance
+        # does not increase by the amount), even though the new balances are too correlated to be used directly
+        # The balance errors are the amount of money missing from each side (0 when the balances agree),
+        # the zero flags mark empty balances before and after the transaction, and the ratios are the
+        # amount relative to each original balance (a balance under 1 is treated as 1)
+        # The features are computed in float64 and stored as float32, and the balance errors are rounded
+        # to the cent, so balances that agree give an error of exactly 0 (float32 would leave rounding noise)
+        # Columns that were already read as float32 (see DATA_TYPES) keep the rounding of large balances
+        # IMPORTANT: The dataset must contain the amount and the old and new balance columns of both accounts
+        # :param data: the dataset
+        # :type data: pd.Dataframe
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
+        # :returns: dataframe
+        # :rtype: pd.dataframe 
+
+        data_copy = data if inplace else data.copy()
+
+        # Each column is read once (without a copy if it is already float64)
+        amount = data_copy["amount"].to_numpy(dtype = np.float64)
+        old_orig = data_copy["oldbalanceOrig"].to_numpy(dtype = np.float64)
+        new_orig = data_copy["newbalanceOrig"].to_numpy(dtype = np.float64)
+        old_dest = data_copy["oldbalanceDest"].to_numpy(dtype = np.float64)
+        new_dest = data_copy["newbalanceDest"].to_numpy(dtype = np.float64)
+
+        # The originating account should lose the amount and the destination account should gain it
+        # The intermediate results are written into the arrays that hold each feature
+        orig_error = np.subtract(old_orig, amount)
+        np.subtract(orig_error, new_orig, out = orig_error)
+        np.round(orig_error, 2, out = orig_error)
+        dest_error = np.add(old_dest, amount)
+        np.subtract(dest_error, new_dest, out = dest_error)
+        np.round(dest_error, 2, out = dest_error)
+
+        orig_ratio = np.maximum(old_orig, 1.0)
+        np.divide(amount, orig_ratio, out = orig_ratio)
+        dest_ratio = np.maximum(old_dest, 1.0)
+        np.divide(amount, dest_ratio, out = dest_ratio)
+
+        data_copy["orig_balance_error"] = orig_error.astype(np.float32)
+        data_copy["dest_balance_error"] = dest_error.astype(np.float32)
+
+        # The flags are stored as uint8, the same as the dummy variables
+        data_copy["orig_zero_before"] = (old_orig == 0).view(np.uint8)
+        data_copy["orig_zero_after"] = (new_orig == 0).view(np.uint8)
+        data_copy["dest_zero_before"] = (old_dest == 0).view(np.uint8)
+        data_copy["dest_zero_after"] = (new_dest == 0).view(np.uint8)
+
+        data_copy["orig_amount_ratio"] = orig_ratio.astype(np.float32)
+        data_copy["dest_amount_ratio"] = dest_ratio.astype(np.float32)
+
+        return data_copy
+
+
+class DummyEncoder:
+    def __init__(self, col: str = "type", categories: list = None, sparse: bool = False):
+        # :param col: the categorical column to be one-hot encoded
+        # :type col: str
+        # :param categories: the categories to encode (if None, they are learned with fit)
+        # :type categories: list
+        # :param sparse: whether to return sparse dummy variables
+        # :type sparse: bool
+
+        self.col = col
+        self.categories = list(categories) if categories is not None else None
+        self.sparse = sparse
+
+    def fit(self, data: pd.DataFrame) -> "DummyEncoder":
+        # This function stores the categories found in the data
+        # The categories are sorted so that the dummy variables match pd.get_dummies
+        # :param data: the dataset (ideally the training data)
+        # :type data: pd.DataFrame
+        # :returns: the fitted encoder
+        # :rtype: DummyEncoder
+
+        self.categories = sorted(pd.unique(data[self.col].dropna()).tolist())
+
+        return self
+
+    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+        # This function creates one uint8 dummy variable for each stored category
+        # Categories that were not seen during fitting are encoded as all zeros
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :returns: the dummy variables
+        # :rtype: pd.DataFrame
+
+        if self.categories is None:
+            raise ValueError("The encoder must be fit before it can transform data.")
+
+        # Map every row to the position of its category in one vectorized pass
+        codes = pd.Categorical(data[self.col], categories = self.categories).codes
+        rows = np.flatnonzero(codes >= 0)
+
+        if self.sparse:
+            from scipy import sparse
+
+            matrix = sparse.csr_matrix((np.ones(len(rows), dtype = np.uint8), (rows, codes[rows])), 
+                                       shape = (len(codes), len(self.categories)))
+            dummies = pd.DataFrame.sparse.from_spmatrix(matrix, columns = self.categories)
+            dummies.index = data.index
+
+            return dummies
+
+        matrix = np.zeros((len(codes), len(self.categories)), dtype = np.uint8)
+        matrix[rows, codes[rows]] = 1
+
+        return pd.DataFrame(matrix, columns = self.categories, index = data.index)
+
+    def encode(self, data: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        # This function replaces the categorical column with its dummy variables
+        # The dummy variables are appended to the end of the dataset, the same as pd.get_dummies
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
+        # :returns: dataframe
+        # :rtype: pd.DataFrame
+
+        dummies = self.transform(data)
+        data_copy = data if inplace else data.copy()
+        data_copy.drop(self.col, axis = 1, inplace = True)
+
+        for col in dummies.columns:
+            data_copy[col] = dummies[col]
+
+        return data_copy
+
+    def to_dict(self) -> dict:
+        # This function returns the state of the encoder so it can be saved alongside a model
+        # :returns: the encoder state
+        # :rtype: dict
+
+        return {"col": self.col, "categories": self.categories, "sparse": self.sparse}
+
+    def from_dict(state: dict) -> "DummyEncoder":
+        # This function recreates an encoder from a state created by to_dict
+        # It is called on the class (DummyEncoder.from_dict(state))
+        # :param state: the encoder state
+        # :type state: dict
+        # :returns: the encoder
+        # :rtype: DummyEncoder
+
+        return DummyEncoder(state["col"], state["categories"], state["sparse"])
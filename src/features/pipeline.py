@@ -0,0 +1,87 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the FeaturePipeline class. A pipeline chains the
+# cleaning and feature functions (from CleanData and BuildFeatures) so that they
+# run one after another on the same dataset. In in-place mode the steps modify
+# the dataset directly instead of copying it at every step. The pipeline also
+# records the time of each step and, when profiling, its peak memory.
+#################################################################################
+
+import inspect
+import time
+import tracemalloc
+import pandas as pd
+
+class FeaturePipeline:
+    def __init__(self, inplace: bool = False, profile: bool = False):
+        # :param inplace: whether the steps modify the dataset instead of a copy
+        # :type inplace: bool
+        # :param profile: whether to record the peak memory of each step with tracemalloc
+        #                 (this slows Python code in the steps down by up to 20x, so it is off by default)
+        # :type profile: bool
+
+        self.inplace = inplace
+        self.profile = profile
+        self.steps = []
+        self.report = None
+
+    def add_step(self, func, *args, name: str = None, **kwargs) -> "FeaturePipeline":
+        # This function adds a step to the end of the pipeline
+        # The step is called as func(data, *args, **kwargs) and must return the dataset
+        # :param func: the step (e.g. CleanData.rename_col)
+        # :type func: callable
+        # :param name: the name of the step in the report (defaults to the function name)
+        # :type name: str
+        # :returns: the pipeline so that calls can be chained
+        # :rtype: FeaturePipeline
+
+        # Only pass the inplace flag to steps that support it
+        if "inplace" in inspect.signature(func).parameters:
+            kwargs.setdefault("inplace", self.inplace)
+
+        self.steps.append((name if name else func.__name__, func, args, kwargs))
+
+        return self
+
+    def run(self, data: pd.DataFrame) -> pd.DataFrame:
+        # This function runs every step of the pipeline on the dataset
+        # In in-place mode the supplied dataset is modified
+        # The time (and peak memory, when profiling) of each step are stored in self.report
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :returns: the transformed dataset
+        # :rtype: pd.DataFrame
+
+        report = []
+
+        # Leave tracing alone if the caller is already using tracemalloc
+        started_tracing = self.profile and not tracemalloc.is_tracing()
+
+        if started_tracing:
+            tracemalloc.start()
+
+        try:
+            for name, func, args, kwargs in self.steps:
+                if self.profile:
+                    tracemalloc.reset_peak()
+                    start_memory = tracemalloc.get_traced_memory()[0]
+
+                start_time = time.perf_counter()
+                data = func(data, *args, **kwargs)
+                seconds = time.perf_counter() - start_time
+
+                # The peak is measured relative to the memory in use when the step started
+                peak_mb = None
+
+                if self.profile:
+                    peak_mb = (tracemalloc.get_traced_memory()[1] - start_memory) / 2**20
+
+                report.append({"step": name, "seconds": seconds, "peak_mb": peak_mb})
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        self.report = pd.DataFrame(report, columns = ["step", "seconds", "peak_mb"])
+
+        return data
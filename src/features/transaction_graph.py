@@ -0,0 +1,403 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the TransactionGraph class. It indexes the
+# transactions as edges from nameOrig to nameDest, with both name columns
+# encoded as integer account IDs, and builds graph features for mule accounts:
+# the number of transactions sent by the originating account (fan-out) and
+# received by the destination account (fan-in), the number of distinct
+# senders to the destination within a time window, and the number of
+# TRANSFERs received by an account within the window before it makes a
+# CASH_OUT (a two-hop TRANSFER -> CASH_OUT chain). The transactions are
+# processed one step (hour) at a time, so the same code builds the features
+# of the full dataset and updates them as new hours arrive. Every edge is
+# kept, and the graph can be read in CSR (compressed sparse row) form. The
+# (sender, destination) pairs are kept in a PairTable, so adding an hour only
+# costs time for the pairs it adds or expires, not for every pair in the window.
+#################################################################################
+
+import math
+import numpy as np
+import pandas as pd
+from features.account_store import EventRing
+
+# The step stored for keys that are not in a PairTable
+MISSING = np.iinfo(np.int64).min
+
+def _running(keys: np.ndarray, flags: np.ndarray = None) -> np.ndarray:
+    # For each position, the number of positions up to and including it with the same key
+    # (only counting the flagged positions if flags are given)
+    order = np.argsort(keys, kind = "stable")
+    sorted_keys = keys[order]
+    counts = np.ones(len(keys), dtype = np.int64) if flags is None else flags[order].astype(np.int64)
+    sums = np.cumsum(counts)
+
+    # Subtract the total from before the start of each key's group (the totals only increase,
+    # so carrying the largest one forward gives the start of the current group)
+    first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]] if len(keys) else np.zeros(0, dtype = bool)
+    before = np.maximum.accumulate(np.where(first, sums - counts, 0)) if len(keys) else sums
+
+    running = np.empty(len(keys), dtype = np.int64)
+    running[order] = sums - before
+
+    return running
+
+class PairTable:
+    def __init__(self, buffer_size: int = 4096):
+        # Sorted keys with a step for each
+        # New keys go into a small sorted buffer, which is merged into the main arrays once it holds more
+        # than buffer_size keys (or the square root of the main arrays' size), so adding keys does not copy
+        # the whole table every time
+        # :param buffer_size: the smallest number of keys the buffer holds before it is merged
+        # :type buffer_size: int
+
+        self.buffer_size = buffer_size
+        self.keys = np.zeros(0, dtype = np.int64)
+        self.steps = np.zeros(0, dtype = np.int64)
+        self.buffer_keys = np.zeros(0, dtype = np.int64)
+        self.buffer_steps = np.zeros(0, dtype = np.int64)
+
+    def _find(self, table: np.ndarray, keys: np.ndarray) -> tuple:
+        # The position of each key in a sorted table and whether it is there
+        positions = np.searchsorted(table, keys)
+        found = positions < len(table)
+        found[found] = table[positions[found]] == keys[found]
+
+        return positions, found
+
+    def get(self, keys: np.ndarray) -> np.ndarray:
+        # Return the step of each key (MISSING if the key is not in the table)
+        steps = np.full(len(keys), MISSING, dtype = np.int64)
+
+        for table, table_steps in ((self.keys, self.steps), (self.buffer_keys, self.buffer_steps)):
+            positions, found = self._find(table, keys)
+            steps[found] = table_steps[positions[found]]
+
+        return steps
+
+    def set(self, keys: np.ndarray, step: int, cutoff: int) -> None:
+        # Set the step of each key (the keys must be unique), adding the keys that are not in the table
+        # The keys with a step at or before the cutoff are dropped when the buffer is merged
+        missing = np.ones(len(keys), dtype = bool)
+
+        for table, table_steps in ((self.keys, self.steps), (self.buffer_keys, self.buffer_steps)):
+            positions, found = self._find(table, keys)
+            table_steps[positions[found]] = step
+            missing &= ~found
+
+        insert_at = np.searchsorted(self.buffer_keys, keys[missing])
+        self.buffer_keys = np.insert(self.buffer_keys, insert_at, keys[missing])
+        self.buffer_steps = np.insert(self.buffer_steps, insert_at, step)
+
+        if len(self.buffer_keys) > max(self.buffer_size, math.isqrt(len(self.keys))):
+            self.keys, self.steps = self.items()
+            self.buffer_keys = self.buffer_keys[:0]
+            self.buffer_steps = self.buffer_steps[:0]
+
+            keep = self.steps > cutoff
+            self.keys, self.steps = self.keys[keep], self.steps[keep]
+
+        return None
+
+    def items(self) -> tuple:
+        # Return every key (sorted) and its step
+        insert_at = np.searchsorted(self.keys, self.buffer_keys)
+
+        return (np.insert(self.keys, insert_at, self.buffer_keys),
+                np.insert(self.steps, insert_at, self.buffer_steps))
+
+class TransactionGraph:
+    def __init__(self, window: int = 24):
+        # :param window: the length of the time window in hours (steps) for the distinct senders and the chains
+        # :type window: int
+
+        self.window = int(window)
+
+        # The integer ID of each account (both name columns share the IDs, so chains can be followed)
+        self.ids = {}
+
+        # Every edge (originating account, destination account, step), in time order
+        self.src = np.zeros(0, dtype = np.int32)
+        self.dst = np.zeros(0, dtype = np.int32)
+        self.steps = np.zeros(0, dtype = np.int32)
+        self.edges = 0
+
+        # The number of transactions sent and received by each account
+        self.fan_out = np.zeros(0, dtype = np.int64)
+        self.fan_in = np.zeros(0, dtype = np.int64)
+
+        # The last step of each (sender, destination) pair and the number of distinct senders to each
+        # destination within the window
+        # Each step's pairs are also logged in time order, so the pairs that leave the window can be found
+        # without checking every pair (the pairs that left are dropped from the table from time to time)
+        self.pairs = PairTable()
+        self.pair_log = EventRing()
+        self.senders = np.zeros(0, dtype = np.int64)
+
+        # The TRANSFERs received within the window and their number for each account
+        self.transfers = EventRing()
+        self.transfers_in = np.zeros(0, dtype = np.int64)
+
+        self.now = -1
+        self._csr = {}
+
+    @property
+    def columns(self) -> list:
+        # The names of the feature columns, in order
+        return ["orig_fan_out", "dest_fan_in", "dest_senders_{}h".format(self.window),
+                "chain_transfers_{}h".format(self.window)]
+
+    @property
+    def inputs(self) -> list:
+        # The columns of the transactions that the graph reads
+        return ["nameOrig", "nameDest", "type", "step"]
+
+    def _grow(self, accounts: int) -> None:
+        # Make room for the state of new accounts (the arrays at least double so that growing is amortized)
+        if accounts <= len(self.fan_in):
+            return None
+
+        extra = max(accounts, 2 * len(self.fan_in)) - len(self.fan_in)
+
+        for name in ("fan_out", "fan_in", "senders", "transfers_in"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(extra, dtype = np.int64)]))
+
+        return None
+
+    def encode(self, names) -> np.ndarray:
+        # This function returns the integer ID of each account name, giving new accounts the next free IDs
+        # :param names: the account names
+        # :type names: pd.Series or np.ndarray
+        # :returns: the ID of each account
+        # :rtype: np.ndarray
+
+        codes, uniques = pd.factorize(np.asarray(names, dtype = object))
+        unique_ids = np.fromiter((self.ids.setdefault(name, len(self.ids)) for name in uniques),
+                                 dtype = np.int64, count = len(uniques))
+        self._grow(len(self.ids))
+
+        return unique_ids[codes]
+
+    def _add_edges(self, src: np.ndarray, dst: np.ndarray, step: int) -> None:
+        # Append edges to the edge arrays (which at least double when they are full)
+        needed = self.edges + len(src)
+
+        if needed > len(self.src):
+            capacity = max(needed, 2 * len(self.src))
+
+            for name in ("src", "dst", "steps"):
+                grown = np.empty(capacity, dtype = np.int32)
+                grown[:self.edges] = getattr(self, name)[:self.edges]
+                setattr(self, name, grown)
+
+        self.src[self.edges:needed] = src
+        self.dst[self.edges:needed] = dst
+        self.steps[self.edges:needed] = step
+        self.edges = needed
+        self._csr = {}
+
+        return None
+
+    def _expire(self, step: int) -> None:
+        # Remove the pairs and TRANSFERs that are no longer within the window of the step
+        cutoff = step - self.window
+
+        # A logged pair has left the window if it has not been seen again since
+        keys = np.unique(self.pair_log.expire(cutoff)[0])
+        expired = keys[self.pairs.get(keys) <= cutoff]
+        np.subtract.at(self.senders, expired & 0xFFFFFFFF, 1)
+
+        accounts = self.transfers.expire(cutoff)[0]
+        np.subtract.at(self.transfers_in, accounts, 1)
+
+        return None
+
+    def _add_step(self, step: int, src: np.ndarray, dst: np.ndarray, transfer: np.ndarray,
+                  cash_out: np.ndarray) -> dict:
+        # Add the transactions of one step (in order) and return their features
+        self._expire(step)
+        self.now = step
+
+        # The totals before the step plus the transactions earlier in the step (and the transaction itself)
+        fan_out = self.fan_out[src] + _running(src)
+        fan_in = self.fan_in[dst] + _running(dst)
+
+        # A sender is new to a destination if the pair is not in the window yet and this is its first
+        # transaction in the step
+        keys = (src << 32) | dst
+        found = self.pairs.get(keys) > step - self.window
+        new = ~found & (_running(keys) == 1)
+        senders = self.senders[dst] + _running(dst, new)
+
+        # The TRANSFERs received by a CASH_OUT's originating account before it, within the window
+        # Each row is a TRANSFER received by its destination, followed by a lookup of its originator
+        accounts = np.column_stack([dst, src]).ravel()
+        received = np.column_stack([transfer, np.zeros(len(src), dtype = bool)]).ravel()
+        chains = np.where(cash_out, self.transfers_in[src] + _running(accounts, received)[1::2], 0)
+
+        # Update the state with the step
+        np.add.at(self.fan_out, src, 1)
+        np.add.at(self.fan_in, dst, 1)
+        step_keys = np.unique(keys)
+        self.pairs.set(step_keys, step, step - self.window)
+        self.pair_log.push(step_keys, np.full(len(step_keys), step), np.zeros(len(step_keys)))
+        np.add.at(self.senders, keys[new] & 0xFFFFFFFF, 1)
+
+        self.transfers.push(dst[transfer], np.full(transfer.sum(), step), np.zeros(transfer.sum()))
+        np.add.at(self.transfers_in, dst[transfer], 1)
+        self._add_edges(src, dst, step)
+
+        return dict(zip(self.columns, (fan_out, fan_in, senders, chains)))
+
+    def _types(self, data: pd.DataFrame, name: str) -> np.ndarray:
+        # Whether each transaction has a type (from the type column or its dummy variable)
+        if "type" in data.columns:
+            return (data["type"] == name).to_numpy(dtype = bool)
+
+        return data[name].to_numpy(dtype = bool)
+
+    def transform(self, data: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        # This function adds the transactions to the graph and adds their graph features to the dataset
+        # The transactions are taken in step order (keeping the row order within a step), so a dataset can
+        # be added all at once or in chunks (e.g. as each new hour arrives) with the same features
+        # The counts include the transaction itself
+        # :param data: the transactions (with nameOrig, nameDest, type or its dummy variables,
+        #              and step or day and hour)
+        # :type data: pd.DataFrame
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
+        # :returns: dataframe
+        # :rtype: pd.DataFrame
+
+        data_copy = data if inplace else data.copy()
+
+        if "step" in data_copy.columns:
+            steps = data_copy["step"].to_numpy(dtype = np.int64)
+        else:
+            steps = data_copy["day"].to_numpy(dtype = np.int64) * 24 + data_copy["hour"].to_numpy(dtype = np.int64)
+
+        if len(steps) and steps.min() < self.now:
+            raise ValueError("The transactions must not be older than the latest step in the graph.")
+
+        order = np.argsort(steps, kind = "stable")
+        steps = steps[order]
+        src = self.encode(data_copy["nameOrig"])[order]
+        dst = self.encode(data_copy["nameDest"])[order]
+        transfer = self._types(data_copy, "TRANSFER")[order]
+        cash_out = self._types(data_copy, "CASH_OUT")[order]
+
+        features = {col: np.empty(len(steps), dtype = np.int32) for col in self.columns}
+        bounds = np.flatnonzero(np.r_[True, steps[1:] != steps[:-1], True]) if len(steps) else []
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            step_features = self._add_step(int(steps[start]), src[start:end], dst[start:end], transfer[start:end],
+                                           cash_out[start:end])
+
+            for col, values in step_features.items():
+                features[col][start:end] = values
+
+        # Put the features back in the original row order
+        for col, values in features.items():
+            row_values = np.empty(len(values), dtype = np.int32)
+            row_values[order] = values
+            data_copy[col] = row_values
+
+        return data_copy
+
+    def csr(self, direction: str = "in", window: int = None) -> tuple:
+        # This function returns the graph in CSR form
+        # The neighbors of account i are indices[indptr[i]:indptr[i + 1]] (in time order), with the
+        # step of each edge in steps
+        # :param direction: "in" for the senders to each account or "out" for the receivers from each account
+        # :type direction: str
+        # :param window: only keep the edges within this many hours of the latest step (None keeps every edge)
+        # :type window: int
+        # :returns: indptr, indices, and steps
+        # :rtype: tuple
+
+        if direction not in ("in", "out"):
+            raise ValueError("direction must be \"in\" or \"out\".")
+
+        if (direction, window) not in self._csr:
+            rows, neighbors = (self.dst, self.src) if direction == "in" else (self.src, self.dst)
+            keep = np.arange(self.edges)
+
+            if window is not None:
+                keep = keep[self.steps[:self.edges] > self.now - window]
+
+            order = keep[np.argsort(rows[keep], kind = "stable")]
+            indptr = np.r_[0, np.cumsum(np.bincount(rows[keep], minlength = len(self.ids)))]
+            self._csr[direction, window] = (indptr, neighbors[order], self.steps[order])
+
+        return self._csr[direction, window]
+
+    def neighbors(self, name: str, direction: str = "in", window: int = None) -> list:
+        # This function returns the distinct accounts that sent money to (or received money from) an account
+        # :param name: the account name
+        # :type name: str
+        # :param direction: "in" for the senders or "out" for the receivers
+        # :type direction: str
+        # :param window: only use the edges within this many hours of the latest step (None uses every edge)
+        # :type window: int
+        # :returns: the account names
+        # :rtype: list
+
+        if name not in self.ids:
+            return []
+
+        indptr, indices, steps = self.csr(direction, window)
+        account = self.ids[name]
+        names = list(self.ids)
+
+        return [names[neighbor] for neighbor in np.unique(indices[indptr[account]:indptr[account + 1]])]
+
+    def save(self, file: str) -> None:
+        # This function saves the graph to an .npz file
+        # :param file: the file name
+        # :type file: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        accounts = len(self.ids)
+        transfer_accounts, transfer_steps = self.transfers.events()[:2]
+
+        # Only the pairs within the window are saved
+        pair_keys, pair_steps = self.pairs.items()
+        keep = pair_steps > self.now - self.window
+
+        np.savez(file, window = self.window, names = np.array(list(self.ids), dtype = str),
+                 src = self.src[:self.edges], dst = self.dst[:self.edges], steps = self.steps[:self.edges],
+                 fan_out = self.fan_out[:accounts], fan_in = self.fan_in[:accounts],
+                 pair_keys = pair_keys[keep], pair_steps = pair_steps[keep], senders = self.senders[:accounts],
+                 transfer_accounts = transfer_accounts, transfer_steps = transfer_steps,
+                 transfers_in = self.transfers_in[:accounts], now = self.now)
+
+        return None
+
+    def load(file: str) -> "TransactionGraph":
+        # This function loads a graph saved by TransactionGraph.save (e.g. to add new hours of transactions)
+        # It is called on the class (TransactionGraph.load(file))
+        # :param file: the file name
+        # :type file: str
+        # :returns: the graph
+        # :rtype: TransactionGraph
+
+        with np.load(file) as state:
+            graph = TransactionGraph(int(state["window"]))
+            graph.ids = {name: position for position, name in enumerate(state["names"].tolist())}
+            graph.src, graph.dst, graph.steps = state["src"], state["dst"], state["steps"]
+            graph.edges = len(graph.src)
+
+            for name in ("fan_out", "fan_in", "senders", "transfers_in"):
+                setattr(graph, name, state[name].astype(np.int64))
+
+            graph.pairs.keys = state["pair_keys"].astype(np.int64)
+            graph.pairs.steps = state["pair_steps"].astype(np.int64)
+            order = np.argsort(graph.pairs.steps, kind = "stable")
+            graph.pair_log.push(graph.pairs.keys[order], graph.pairs.steps[order], np.zeros(len(order)))
+
+            graph.transfers.push(state["transfer_accounts"], state["transfer_steps"],
+                                 np.zeros(len(state["transfer_steps"])))
+            graph.now = int(state["now"])
+
+        return graph
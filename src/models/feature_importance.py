@@ -0,0 +1,120 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the FeatureImportance class. This class contains
+# one main function, which measures the permutation importance of each feature
+# of a trained logistic regression or support vector machine: how much the
+# score drops when the feature's values are shuffled. The features are
+# permuted in parallel across processes on a stratified subsample of the
+# evaluation data. Each process keeps a single working copy of the data and
+# permutes one column at a time into a pre-allocated buffer, restoring it
+# afterwards, so the data is never copied for each permutation.
+#################################################################################
+
+import numpy as np
+import pandas as pd
+from data.sample_data import StratifiedSampler
+from models.metrics import Metrics
+from models.predict_model import PredictModels
+from parallel import process_pool
+
+# The data and model shared by every permutation in a worker process
+# They are sent to each process once instead of with every feature
+_worker_data = {}
+
+def _init_worker(X: np.ndarray, y: np.ndarray, columns: list, model, scoring: str) -> None:
+    _worker_data.update(X = X, y = y, columns = columns, model = model, scoring = scoring,
+                        buffer = np.empty(len(X), dtype = X.dtype))
+
+def _score(X: np.ndarray) -> float:
+    # Score the model on the worker's (possibly permuted) data
+    model = _worker_data["model"]
+    X = pd.DataFrame(X, columns = _worker_data["columns"], copy = False)
+
+    if hasattr(model, "params"):
+        y_pred = (PredictModels.logistic_score(X, model) >= 0.5).astype(int)
+    else:
+        y_pred = model.predict(X)
+
+    if _worker_data["scoring"] in Metrics.SCORES:
+        return Metrics.score(_worker_data["y"], y_pred, _worker_data["scoring"])
+
+    from sklearn import metrics
+
+    return float(getattr(metrics, _worker_data["scoring"] + "_score")(_worker_data["y"], y_pred))
+
+def _permute_feature(column: int, seeds: list) -> list:
+    # Shuffle one column for each seed, score the model, and restore the column
+    X, buffer = _worker_data["X"], _worker_data["buffer"]
+    original = X[:, column].copy()
+    scores = []
+
+    try:
+        for seed in seeds:
+            np.take(original, np.random.default_rng(seed).permutation(len(original)), out = buffer)
+            X[:, column] = buffer
+            scores.append(_score(X))
+    finally:
+        X[:, column] = original
+
+    return scores
+
+class FeatureImportance:
+    def __init__(self, name):
+        self.name = name
+
+    def permutation_importance(X: pd.DataFrame, y: pd.DataFrame, model, scoring: str = "f1", n_repeats: int = 5,
+                               sample_size: int = 20000, n_jobs: int = None, random_state: int = 42) -> pd.DataFrame:
+        # This function measures how much the model's score drops when each feature is shuffled
+        # :param X: the evaluation data (from the test set, scaled like the training data)
+        # :type X: pd.DataFrame
+        # :param y: the response variable (from the test set)
+        # :type y: pd.DataFrame
+        # :param model: the trained model (from TrainModels.logistic_model or TrainModels.svm_model)
+        # :type model: sm.Logit or SVC
+        # :param scoring: the metric (any sklearn.metrics function named <scoring>_score)
+        # :type scoring: str
+        # :param n_repeats: the number of times each feature is shuffled
+        # :type n_repeats: int
+        # :param sample_size: the size of the stratified subsample that is scored (None uses every row)
+        # :type sample_size: int
+        # :param n_jobs: the number of processes (if None, every core is used)
+        # :type n_jobs: int
+        # :param random_state: the seed for the subsample and the permutations
+        # :type random_state: int
+        # :returns: the mean and standard deviation of the drop in score for each feature (largest first)
+        # :rtype: pd.DataFrame
+
+        y = pd.Series(np.asarray(y, dtype = np.int64), index = X.index, name = "y")
+
+        # Keep the classes in their original proportions in the subsample
+        rows = np.arange(len(X))
+
+        if sample_size is not None and sample_size < len(X):
+            class_counts = y.value_counts().to_dict()
+            rows = StratifiedSampler("y", class_ratio = class_counts, n_samples = sample_size,
+                                     random_state = random_state).sample_indices(y.to_frame())
+
+        X_values = np.ascontiguousarray(X.iloc[rows].to_numpy(dtype = np.float64))
+        y_values = y.to_numpy()[rows]
+        columns = list(X.columns)
+
+        # Every permutation gets its own seed, so the results do not depend on the number of processes
+        seeds = np.random.SeedSequence(random_state).generate_state(len(columns) * n_repeats).reshape(
+            len(columns), n_repeats)
+
+        with process_pool(n_jobs, initializer = _init_worker,
+                          initargs = (X_values, y_values, columns, model, scoring)) as pool:
+            jobs = [pool.submit(_permute_feature, column, seeds[column].tolist()) for column in range(len(columns))]
+            scores = np.array([job.result() for job in jobs])
+
+        # Score the unshuffled data once in this process
+        _init_worker(X_values, y_values, columns, model, scoring)
+        baseline = _score(X_values)
+        _worker_data.clear()
+
+        drops = baseline - scores
+        importance = pd.DataFrame({"feature": columns, "importance_mean": drops.mean(axis = 1),
+                                   "importance_std": drops.std(axis = 1)})
+
+        return importance.sort_values("importance_mean", ascending = False, ignore_index = True)
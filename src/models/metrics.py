@@ -0,0 +1,247 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the Metrics class. It evaluates binary fraud
+# predictions with vectorized NumPy code and no plotting, so it is cheap
+# enough to call for every cross-validation fold or decision threshold. The
+# confusion matrix is counted in a single pass with bincount, and the
+# precision, recall, F1 score, and classification report are all computed
+# from it. ROC-AUC and PR-AUC (average precision) are computed from scores
+# with a single sort, as is a sweep over every decision threshold. This file
+# must only import NumPy and pandas.
+#################################################################################
+
+import numpy as np
+import pandas as pd
+
+class Metrics:
+    # The metrics that Metrics.score computes from a confusion matrix
+    SCORES = ("accuracy", "precision", "recall", "f1")
+
+    def __init__(self, name):
+        self.name = name
+
+    def confusion_matrix(y, y_pred) -> np.ndarray:
+        # This function counts the confusion matrix in a single pass over the labels
+        # Rows are the true classes and columns are the predicted classes (0, then 1)
+        # :param y: the true classes (0 or 1)
+        # :type y: np.ndarray or pd.Series
+        # :param y_pred: the predicted classes (0 or 1)
+        # :type y_pred: np.ndarray or pd.Series
+        # :returns: the 2 x 2 confusion matrix
+        # :rtype: np.ndarray
+
+        y = np.asarray(y)
+        y_pred = np.asarray(y_pred)
+
+        if len(y) != len(y_pred):
+            raise ValueError("y and y_pred must have the same length ({} and {}).".format(len(y), len(y_pred)))
+
+        # Any other label would be counted in the wrong cell, so only 0 and 1 are accepted
+        for name, labels in (("y", y), ("y_pred", y_pred)):
+            if not np.isin(labels, (0, 1)).all():
+                raise ValueError("{} must only contain the classes 0 and 1 (found {}).".format(
+                    name, ", ".join(str(label) for label in np.unique(labels[~np.isin(labels, (0, 1))])[:5])))
+
+        return np.bincount(2 * y.astype(np.int64) + y_pred.astype(np.int64), minlength = 4).reshape(2, 2)
+
+    def class_scores(cm: np.ndarray) -> dict:
+        # This function returns the precision, recall, F1 score, and support of each class
+        # Scores that divide by zero are 0 (as in scikit-learn)
+        # :param cm: the confusion matrix
+        # :type cm: np.ndarray
+        # :returns: an array of each score, with one value for each class
+        # :rtype: dict
+
+        cm = np.asarray(cm, dtype = np.float64)
+        true_positives = np.diag(cm)
+        predicted = cm.sum(axis = 0)
+        support = cm.sum(axis = 1)
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+            recall = np.where(support > 0, true_positives / support, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        return {"precision": precision, "recall": recall, "f1": f1, "support": support.astype(np.int64)}
+
+    def score(y, y_pred, scoring: str = "f1") -> float:
+        # This function returns one score of the fraudulent class (or the accuracy)
+        # :param y: the true classes
+        # :type y: np.ndarray or pd.Series
+        # :param y_pred: the predicted classes
+        # :type y_pred: np.ndarray or pd.Series
+        # :param scoring: "accuracy", "precision", "recall", or "f1"
+        # :type scoring: str
+        # :returns: the score
+        # :rtype: float
+
+        cm = Metrics.confusion_matrix(y, y_pred)
+
+        if scoring == "accuracy":
+            return float(np.trace(cm) / max(cm.sum(), 1))
+
+        if scoring not in Metrics.SCORES:
+            raise ValueError("scoring must be one of {}.".format(", ".join(Metrics.SCORES)))
+
+        return float(Metrics.class_scores(cm)[scoring][1])
+
+    def classification_report(cm: np.ndarray, target_names: list = None, digits: int = 2) -> str:
+        # This function formats a classification report from a confusion matrix
+        # The layout matches sklearn.metrics.classification_report
+        # :param cm: the confusion matrix
+        # :type cm: np.ndarray
+        # :param target_names: the name of each class
+        # :type target_names: list
+        # :param digits: the number of digits of each score
+        # :type digits: int
+        # :returns: the report
+        # :rtype: str
+
+        if target_names is None:
+            target_names = ["Not Fraudulent", "Fraudulent"]
+
+        scores = Metrics.class_scores(cm)
+        support = scores["support"]
+        total = support.sum()
+        averages = {}
+
+        for name in ("precision", "recall", "f1"):
+            averages[name] = (scores[name].mean(),
+                              float(np.dot(scores[name], support) / total) if total else 0.0)
+
+        width = max(max(len(name) for name in target_names), len("weighted avg"), digits)
+        headers = ["precision", "recall", "f1-score", "support"]
+        row_format = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+
+        report = ("{:>{width}s} " + " {:>9}" * len(headers)).format("", *headers, width = width) + "\n\n"
+
+        for position, name in enumerate(target_names):
+            report += row_format.format(name, scores["precision"][position], scores["recall"][position],
+                                        scores["f1"][position], support[position], width = width, digits = digits)
+
+        report += "\n"
+        report += ("{:>{width}s} " + " {:>9.{digits}}" * 2 + " {:>9.{digits}f}" + " {:>9}\n").format(
+            "accuracy", "", "", np.trace(cm) / total if total else 0.0, total, width = width, digits = digits)
+
+        for position, name in enumerate(("macro avg", "weighted avg")):
+            report += row_format.format(name, averages["precision"][position], averages["recall"][position],
+                                        averages["f1"][position], total, width = width, digits = digits)
+
+        return report
+
+    def _ranked(y, scores) -> tuple:
+        # Sort the transactions by score (highest first) and count the true and false positives
+        # at each distinct score
+        # Empty inputs have no curve, so they raise an error (a single class gives NaN in roc_auc and pr_auc)
+        y = np.asarray(y)
+        scores = np.asarray(scores, dtype = np.float64)
+
+        if len(y) != len(scores):
+            raise ValueError("y and scores must have the same length ({} and {}).".format(len(y), len(scores)))
+
+        if len(y) == 0:
+            raise ValueError("y and scores must not be empty.")
+
+        if not np.isin(y, (0, 1)).all():
+            raise ValueError("y must only contain the classes 0 and 1 (found {}).".format(
+                ", ".join(str(label) for label in np.unique(y[~np.isin(y, (0, 1))])[:5])))
+
+        y = y.astype(np.int64)
+        order = np.argsort(-scores, kind = "stable")
+        scores = scores[order]
+        y = y[order]
+
+        # The last position of each distinct score
+        distinct = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+        true_positives = np.cumsum(y)[distinct]
+        false_positives = (distinct + 1) - true_positives
+
+        return scores[distinct], true_positives, false_positives
+
+    def roc_auc(y, scores) -> float:
+        # This function returns the area under the ROC curve
+        # :param y: the true classes
+        # :type y: np.ndarray or pd.Series
+        # :param scores: the fraud scores (higher is more likely to be fraudulent)
+        # :type scores: np.ndarray or pd.Series
+        # :returns: the ROC-AUC (NaN if only one class is present)
+        # :rtype: float
+
+        thresholds, true_positives, false_positives = Metrics._ranked(y, scores)
+
+        if true_positives[-1] == 0 or false_positives[-1] == 0:
+            return float("nan")
+
+        # Trapezoids between consecutive thresholds (ties are handled by the diagonal segments)
+        tpr = np.r_[0, true_positives] / true_positives[-1]
+        fpr = np.r_[0, false_positives] / false_positives[-1]
+
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def pr_auc(y, scores) -> float:
+        # This function returns the area under the precision-recall curve (the average precision)
+        # :param y: the true classes
+        # :type y: np.ndarray or pd.Series
+        # :param scores: the fraud scores (higher is more likely to be fraudulent)
+        # :type scores: np.ndarray or pd.Series
+        # :returns: the average precision (NaN if there are no fraudulent transactions)
+        # :rtype: float
+
+        thresholds, true_positives, false_positives = Metrics._ranked(y, scores)
+
+        if true_positives[-1] == 0:
+            return float("nan")
+
+        precision = true_positives / (true_positives + false_positives)
+        recall = np.r_[0, true_positives] / true_positives[-1]
+
+        return float(np.sum(np.diff(recall) * precision))
+
+    def threshold_sweep(y, scores) -> pd.DataFrame:
+        # This function returns the precision, recall, and F1 score of the fraudulent class at every
+        # distinct decision threshold (a transaction is flagged when its score is at least the threshold)
+        # :param y: the true classes
+        # :type y: np.ndarray or pd.Series
+        # :param scores: the fraud scores (higher is more likely to be fraudulent)
+        # :type scores: np.ndarray or pd.Series
+        # :returns: one row for each threshold (highest first, with a recall of 0 if there are no
+        #           fraudulent transactions)
+        # :rtype: pd.DataFrame
+
+        thresholds, true_positives, false_positives = Metrics._ranked(y, scores)
+        frauds = true_positives[-1]
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            precision = true_positives / (true_positives + false_positives)
+            recall = true_positives / frauds if frauds else np.zeros(len(thresholds))
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        return pd.DataFrame({"threshold": thresholds, "precision": precision, "recall": recall, "f1": f1,
+                             "flagged": true_positives + false_positives})
+
+    def evaluate(y, y_pred = None, scores = None) -> dict:
+        # This function returns every metric that the inputs allow, without plotting
+        # :param y: the true classes
+        # :type y: np.ndarray or pd.Series
+        # :param y_pred: the predicted classes
+        # :type y_pred: np.ndarray or pd.Series
+        # :param scores: the fraud scores (for ROC-AUC and PR-AUC)
+        # :type scores: np.ndarray or pd.Series
+        # :returns: the metrics of the fraudulent class
+        # :rtype: dict
+
+        results = {}
+
+        if y_pred is not None:
+            cm = Metrics.confusion_matrix(y, y_pred)
+            scores_by_class = Metrics.class_scores(cm)
+            results.update({"accuracy": float(np.trace(cm) / max(cm.sum(), 1)),
+                            "precision": float(scores_by_class["precision"][1]),
+                            "recall": float(scores_by_class["recall"][1]),
+                            "f1": float(scores_by_class["f1"][1])})
+
+        if scores is not None:
+            results.update({"roc_auc": Metrics.roc_auc(y, scores), "pr_auc": Metrics.pr_auc(y, scores)})
+
+        return results
@@ -0,0 +1,137 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the ModelBundle class. A bundle holds everything
+# needed to score new transactions with a trained model: the fitted scaler, the
+# feature columns in order, the transaction type vocabulary, and the model
+# itself, along with version metadata. A bundle is saved to a directory in
+# ./models and can be loaded with its NumPy arrays (e.g. support vectors and
+# coefficients) memory-mapped, so a scoring process starts without retraining.
+#################################################################################
+
+from __future__ import annotations
+import json
+import os
+import platform
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from features.build_features import DummyEncoder
+from models.numpy_scorer import NumpyScorer
+from models.online_scaler import OnlineScaler
+from models.score_model import FraudScorer
+
+# Bump this version whenever the layout of a saved bundle changes
+BUNDLE_VERSION = 1
+
+class ModelBundle:
+    def __init__(self, model, scaler: OnlineScaler, scalable_features: list, feature_cols: list,
+                 encoder: DummyEncoder = None, metadata: dict = None):
+        # :param model: the trained model (a statsmodels logistic regression or a scikit-learn classifier)
+        # :type model: sm.Logit or a scikit-learn classifier
+        # :param scaler: the scaler fit on the training data (None for models that use unscaled features)
+        # :type scaler: OnlineScaler
+        # :param scalable_features: the columns that were scaled
+        # :type scalable_features: list
+        # :param feature_cols: the columns used by the model, in order
+        # :type feature_cols: list
+        # :param encoder: the encoder for the transaction type
+        # :type encoder: DummyEncoder
+        # :param metadata: any extra information to save with the bundle (e.g. training metrics)
+        # :type metadata: dict
+
+        self.model = model
+        self.scaler = scaler
+        self.scalable_features = list(scalable_features)
+        self.feature_cols = list(feature_cols)
+        self.encoder = encoder
+        self.metadata = dict(metadata) if metadata else {}
+
+        # The saved metadata (versions, creation time) of a loaded bundle
+        self.info = None
+
+    def save(self, path: str, remove_data: bool = True) -> None:
+        # This function saves the bundle to a directory
+        # The arrays are stored uncompressed so that they can be memory-mapped when loaded
+        # :param path: the bundle directory (e.g. "../fraud_detection/models/svm")
+        # :type path: str
+        # :param remove_data: whether to drop the training data that statsmodels keeps in its results
+        #                     (this modifies the model, and its summary is no longer available)
+        # :type remove_data: bool
+        # :returns: nothing is returned
+        # :rtype: None
+
+        import sklearn
+        import statsmodels
+
+        os.makedirs(path, exist_ok = True)
+
+        if remove_data and hasattr(self.model, "remove_data"):
+            self.model.remove_data()
+
+        metadata = {"bundle_version": BUNDLE_VERSION,
+                    "model_type": type(self.model).__name__,
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "scikit-learn": sklearn.__version__,
+                    "statsmodels": statsmodels.__version__,
+                    "feature_cols": self.feature_cols,
+                    "scalable_features": self.scalable_features,
+                    "encoder": self.encoder.to_dict() if self.encoder is not None else None,
+                    "metadata": self.metadata}
+
+        joblib.dump({"model": self.model, "scaler": self.scaler}, os.path.join(path, "bundle.joblib"))
+
+        # Write the metadata last so that a bundle with metadata is always complete
+        with open(os.path.join(path, "metadata.json"), "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent = 2)
+
+        return None
+
+    def load(path: str, mmap: bool = True) -> "ModelBundle":
+        # This function loads a bundle saved by ModelBundle.save
+        # It is called on the class (ModelBundle.load(path))
+        # :param path: the bundle directory
+        # :type path: str
+        # :param mmap: whether to memory-map the model's arrays instead of reading them into memory
+        # :type mmap: bool
+        # :returns: the bundle
+        # :rtype: ModelBundle
+
+        with open(os.path.join(path, "metadata.json")) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        if metadata["bundle_version"] != BUNDLE_VERSION:
+            raise ValueError("The bundle in {} has version {}, but version {} is required.".format(
+                path, metadata["bundle_version"], BUNDLE_VERSION))
+
+        objects = joblib.load(os.path.join(path, "bundle.joblib"), mmap_mode = "r" if mmap else None)
+        encoder = DummyEncoder.from_dict(metadata["encoder"]) if metadata["encoder"] is not None else None
+
+        bundle = ModelBundle(objects["model"], objects["scaler"], metadata["scalable_features"],
+                             metadata["feature_cols"], encoder, metadata["metadata"])
+        bundle.info = metadata
+
+        return bundle
+
+    def scorer(self, threshold: float = None, account_stores: list = None) -> FraudScorer:
+        # This function creates a scorer for raw transactions from the bundle
+        # :param threshold: the score at which a transaction is labeled as fraudulent
+        # :type threshold: float
+        # :param account_stores: the stores that add account features (for models that use them)
+        # :type account_stores: list
+        # :returns: the scorer
+        # :rtype: FraudScorer
+
+        return FraudScorer(self.model, self.scaler, self.scalable_features, self.feature_cols,
+                           self.encoder, threshold, account_stores)
+
+    def numpy_scorer(self) -> NumpyScorer:
+        # This function exports the bundle's model and scaler to a scorer that only needs NumPy
+        # :returns: the scorer
+        # :rtype: NumpyScorer
+
+        return NumpyScorer.export(self.model, self.scaler, self.scalable_features, self.feature_cols)
@@ -0,0 +1,207 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the NumpyScorer class. A trained logistic
+# regression (statsmodels) or RBF support vector machine (scikit-learn) is
+# exported to plain NumPy arrays, along with its scaler. Scoring then only
+# needs NumPy: float32 feature arrays are scored in blocks with matrix
+# operations and no pandas, statsmodels, or scikit-learn overhead. This file
+# must only import NumPy so that scoring workers start quickly.
+#################################################################################
+
+import numpy as np
+
+class NumpyScorer:
+    def __init__(self, kind: str, feature_cols: list, mean: np.ndarray, scale: np.ndarray, intercept: float,
+                 coef: np.ndarray = None, support_vectors: np.ndarray = None, dual_coef: np.ndarray = None,
+                 gamma: float = None):
+        # Use NumpyScorer.export to create a scorer from a trained model
+        # :param kind: the type of model ("linear" or "rbf")
+        # :type kind: str
+        # :param feature_cols: the columns the model expects, in order
+        # :type feature_cols: list
+        # :param mean: the mean subtracted from each feature (0 for features that are not scaled)
+        # :type mean: np.ndarray
+        # :param scale: the standard deviation each feature is divided by (1 for features that are not scaled)
+        # :type scale: np.ndarray
+        # :param intercept: the intercept of the model
+        # :type intercept: float
+        # :param coef: the coefficients of a linear model
+        # :type coef: np.ndarray
+        # :param support_vectors: the support vectors of an RBF support vector machine
+        # :type support_vectors: np.ndarray
+        # :param dual_coef: the dual coefficients of an RBF support vector machine
+        # :type dual_coef: np.ndarray
+        # :param gamma: the kernel coefficient of an RBF support vector machine
+        # :type gamma: float
+
+        if kind not in ("linear", "rbf"):
+            raise ValueError("kind must be \"linear\" or \"rbf\".")
+
+        self.kind = kind
+        self.feature_cols = list(feature_cols)
+        self.mean = np.asarray(mean, dtype = np.float32)
+        self.scale = np.asarray(scale, dtype = np.float32)
+        self.intercept = np.float32(intercept)
+
+        if kind == "linear":
+            # Fold the scaler into the coefficients so that raw features can be scored directly
+            # The model's own coefficients are kept so that the scorer can be saved without rounding
+            coef = np.asarray(coef, dtype = np.float64)
+            self.params = np.append(float(intercept), coef)
+            self.coef = (coef / self.scale).astype(np.float32)
+            self.intercept = np.float32(intercept - np.dot(coef, self.mean / self.scale))
+        else:
+            self.support_vectors = np.ascontiguousarray(support_vectors, dtype = np.float32)
+            self.dual_coef = np.ascontiguousarray(dual_coef, dtype = np.float32).ravel()
+            self.gamma = np.float32(gamma)
+            self.sv_norms = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+
+    def export(model, scaler, scalable_features: list, feature_cols: list) -> "NumpyScorer":
+        # This function exports a trained model and its scaler to a scorer
+        # It is called on the class (NumpyScorer.export(model, ...))
+        # :param model: a statsmodels logistic regression, an RBF SVC, or a scikit-learn linear classifier
+        # :type model: sm.Logit, SVC, or a linear classifier
+        # :param scaler: the scaler fit on the training data (anything with mean_ and scale_)
+        # :type scaler: StandardScaler
+        # :param scalable_features: the columns that were scaled
+        # :type scalable_features: list
+        # :param feature_cols: the columns used by the model, in order
+        # :type feature_cols: list
+        # :returns: the scorer
+        # :rtype: NumpyScorer
+
+        feature_cols = list(feature_cols)
+        scalable_features = list(scalable_features)
+
+        # Expand the scaler to every feature used by the model
+        mean = np.zeros(len(feature_cols))
+        scale = np.ones(len(feature_cols))
+
+        for position, col in enumerate(feature_cols):
+            if col in scalable_features:
+                mean[position] = scaler.mean_[scalable_features.index(col)]
+                scale[position] = scaler.scale_[scalable_features.index(col)]
+
+        # statsmodels results store the coefficients by name, including the constant
+        if hasattr(model, "params"):
+            params = model.params
+            coef = np.array([params[col] for col in feature_cols])
+
+            return NumpyScorer("linear", feature_cols, mean, scale, params["const"], coef = coef)
+
+        # A linear scikit-learn classifier (e.g. SGDClassifier or LogisticRegression)
+        if hasattr(model, "coef_") and not hasattr(model, "support_vectors_"):
+            return NumpyScorer("linear", feature_cols, mean, scale, model.intercept_[0], coef = model.coef_[0])
+
+        if getattr(model, "kernel", None) == "rbf" and len(model.classes_) == 2:
+            return NumpyScorer("rbf", feature_cols, mean, scale, model.intercept_[0],
+                               support_vectors = model.support_vectors_, dual_coef = model.dual_coef_,
+                               gamma = model._gamma)
+
+        raise TypeError("Only statsmodels logistic regressions, linear classifiers, and binary RBF SVMs "
+                        "can be exported.")
+
+    def score(self, X: np.ndarray, out: np.ndarray = None, block_size: int = 4096) -> np.ndarray:
+        # This function scores raw (unscaled) features
+        # Linear models return the probability of fraud and RBF SVMs return the decision function
+        # :param X: the features in the order of self.feature_cols (ideally a C-ordered float32 array)
+        # :type X: np.ndarray
+        # :param out: a pre-allocated float32 array for the scores
+        # :type out: np.ndarray
+        # :param block_size: the number of rows scored at once by the RBF SVM
+        # :type block_size: int
+        # :returns: the score of each transaction
+        # :rtype: np.ndarray
+
+        X = np.asarray(X, dtype = np.float32)
+
+        if out is None:
+            out = np.empty(len(X), dtype = np.float32)
+
+        if self.kind == "linear":
+            # The sigmoid is computed in place on the output array
+            np.dot(X, self.coef, out = out)
+            out += self.intercept
+            np.negative(out, out = out)
+            np.exp(out, out = out)
+            out += 1
+            np.reciprocal(out, out = out)
+
+            return out
+
+        # Score the RBF SVM in blocks so that the kernel matrix stays small
+        # ||x - sv||^2 = ||x||^2 + ||sv||^2 - 2 x.sv
+        kernel = np.empty((min(block_size, len(X)), len(self.support_vectors)), dtype = np.float32)
+        block = np.empty((min(block_size, len(X)), X.shape[1]), dtype = np.float32)
+
+        for start in range(0, len(X), block_size):
+            stop = min(start + block_size, len(X))
+            rows = stop - start
+            X_block = block[:rows]
+            K = kernel[:rows]
+
+            np.subtract(X[start:stop], self.mean, out = X_block)
+            X_block /= self.scale
+
+            np.dot(X_block, self.support_vectors.T, out = K)
+            K *= -2
+            K += self.sv_norms
+            K += np.einsum("ij,ij->i", X_block, X_block)[:, None]
+            np.maximum(K, 0, out = K)
+            K *= -self.gamma
+            np.exp(K, out = K)
+
+            np.dot(K, self.dual_coef, out = out[start:stop])
+
+        out += self.intercept
+
+        return out
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # This function classifies raw (unscaled) features (1 is fraudulent)
+        # :param X: the features in the order of self.feature_cols
+        # :type X: np.ndarray
+        # :returns: the predicted class of each transaction
+        # :rtype: np.ndarray
+
+        threshold = 0.5 if self.kind == "linear" else 0.0
+
+        return (self.score(X) >= threshold).astype(np.int8)
+
+    def save(self, file: str) -> None:
+        # This function saves the scorer to an uncompressed .npz file
+        # :param file: the file name
+        # :type file: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        arrays = {"kind": np.array(self.kind), "feature_cols": np.array(self.feature_cols),
+                  "mean": self.mean, "scale": self.scale}
+
+        # The linear coefficients are saved before the scaler is folded in
+        if self.kind == "linear":
+            arrays.update({"intercept": self.params[0], "coef": self.params[1:]})
+        else:
+            arrays.update({"intercept": self.intercept, "support_vectors": self.support_vectors,
+                           "dual_coef": self.dual_coef, "gamma": self.gamma})
+
+        np.savez(file, **arrays)
+
+        return None
+
+    def load(file: str) -> "NumpyScorer":
+        # This function loads a scorer saved by NumpyScorer.save
+        # It is called on the class (NumpyScorer.load(file))
+        # :param file: the file name
+        # :type file: str
+        # :returns: the scorer
+        # :rtype: NumpyScorer
+
+        with np.load(file) as arrays:
+            kind = str(arrays["kind"])
+            extra = {name: arrays[name] for name in ("coef", "support_vectors", "dual_coef", "gamma")
+                     if name in arrays}
+
+            return NumpyScorer(kind, arrays["feature_cols"].tolist(), arrays["mean"], arrays["scale"],
+                               float(arrays["intercept"]), **extra)
@@ -0,0 +1,214 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the OnlineLearner class. It trains a linear
+# classifier (logistic or hinge loss) with stochastic gradient descent one
+# chunk of transactions at a time, so every row can be used in bounded memory
+# instead of a downsampled subset. The classes are weighted instead of
+# discarding non-fraudulent transactions, the learner is checkpointed to disk
+# every few chunks, and a saved learner can be updated with new (e.g. daily)
+# transactions without retraining from scratch.
+#################################################################################
+
+from __future__ import annotations
+import os
+from collections import Counter
+from typing import TYPE_CHECKING
+import joblib
+import numpy as np
+import pandas as pd
+from models.online_scaler import OnlineScaler
+
+# SGDClassifier is imported when the model is created (this is only for the type hints)
+if TYPE_CHECKING:
+    from sklearn.linear_model import SGDClassifier
+
+class OnlineLearner:
+    def __init__(self, feature_cols: list, scalable_features: list, target: str = "isFraud",
+                 loss: str = "log_loss", alpha_val: float = 1e-5, learning_rate: float = 0.01,
+                 class_weight = "balanced", checkpoint_dir: str = None, checkpoint_every: int = 10,
+                 random_state: int = 42):
+        # :param feature_cols: the columns used by the model, in order
+        # :type feature_cols: list
+        # :param scalable_features: the columns that are scaled
+        # :type scalable_features: list
+        # :param target: the response variable
+        # :type target: str
+        # :param loss: the loss function ("log_loss" for a logistic regression or "hinge" for a linear SVM)
+        # :type loss: str
+        # :param alpha_val: the L2 regularization weight
+        # :type alpha_val: float
+        # :param learning_rate: the step size of the solver
+        # :type learning_rate: float
+        # :param class_weight: "balanced", a weight for each class (dict), or None for equal weights
+        # :type class_weight: str or dict
+        # :param checkpoint_dir: the directory the learner is checkpointed to (None disables checkpoints)
+        # :type checkpoint_dir: str
+        # :param checkpoint_every: the number of chunks between checkpoints
+        # :type checkpoint_every: int
+        # :param random_state: the seed for the solver
+        # :type random_state: int
+
+        if loss not in ("log_loss", "hinge"):
+            raise ValueError("loss must be \"log_loss\" or \"hinge\".")
+
+        from sklearn.linear_model import SGDClassifier
+
+        self.feature_cols = list(feature_cols)
+        self.scalable_features = list(scalable_features)
+        self.target = target
+        self.class_weight = class_weight
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+
+        # The step size is constant so that new data still moves the model after millions of rows
+        # Averaging the weights over every step keeps the heavily weighted fraud rows from making it unstable
+        self.model = SGDClassifier(loss = loss, alpha = alpha_val, learning_rate = "constant", eta0 = learning_rate,
+                                   average = True, random_state = random_state)
+        self.scaler = OnlineScaler(self.scalable_features)
+        self.class_counts = Counter()
+        self.chunks_seen = 0
+        self.rows_seen = 0
+
+    def update_stats(self, chunk: pd.DataFrame) -> "OnlineLearner":
+        # This function updates the scaler and the class counts (used for the class weights) with a chunk
+        # :param chunk: the transactions, including the response variable
+        # :type chunk: pd.DataFrame
+        # :returns: the updated learner
+        # :rtype: OnlineLearner
+
+        self.scaler.partial_fit(chunk[self.scalable_features])
+        self._count_classes(chunk)
+
+        return self
+
+    def _count_classes(self, chunk: pd.DataFrame) -> None:
+        # Add the chunk's classes to the class counts
+        labels, counts = np.unique(chunk[self.target].to_numpy(), return_counts = True)
+        self.class_counts.update(dict(zip(labels.tolist(), counts.tolist())))
+
+        return None
+
+    def class_weights(self) -> dict:
+        # This function returns the weight of each class
+        # Balanced weights make each class count as much as the other in total (n / (2 * n_class))
+        # :returns: the weight of each class
+        # :rtype: dict
+
+        if self.class_weight == "balanced":
+            total = sum(self.class_counts.values())
+
+            return {label: total / (2 * self.class_counts.get(label, 0)) if self.class_counts.get(label) else 1.0
+                    for label in (0, 1)}
+
+        if self.class_weight is None:
+            return {0: 1.0, 1: 1.0}
+
+        return dict(self.class_weight)
+
+    def _features(self, X: pd.DataFrame) -> pd.DataFrame:
+        # Copy the model's columns out of the chunk and scale them
+        X = X[self.feature_cols].astype(np.float64)
+        X[self.scalable_features] = self.scaler.transform(X[self.scalable_features], copy = False)
+
+        return X
+
+    def partial_fit(self, chunk: pd.DataFrame) -> "OnlineLearner":
+        # This function trains the model on one chunk of transactions
+        # The scaler is fit on the first chunk if it has not already been fit, and is then kept fixed
+        # so that the model's coefficients stay on the same scale
+        # The class weights are updated with the classes of every chunk (e.g. new daily data)
+        # :param chunk: the transactions, including the response variable
+        # :type chunk: pd.DataFrame
+        # :returns: the updated learner
+        # :rtype: OnlineLearner
+
+        if self.scaler.mean_ is None:
+            self.scaler.partial_fit(chunk[self.scalable_features])
+
+        self._count_classes(chunk)
+        y = chunk[self.target].to_numpy(dtype = np.int64)
+        weights = self.class_weights()
+        sample_weight = np.where(y == 1, weights[1], weights[0])
+
+        self.model.partial_fit(self._features(chunk), y, classes = np.array([0, 1]),
+                               sample_weight = sample_weight)
+        self.chunks_seen += 1
+        self.rows_seen += len(chunk)
+
+        if self.checkpoint_dir is not None and self.chunks_seen % self.checkpoint_every == 0:
+            self.save(self.checkpoint_dir)
+
+        return self
+
+    def fit_stream(self, chunks, epochs: int = 1) -> "OnlineLearner":
+        # This function trains the model on a stream of chunks
+        # If chunks is a function that returns a new iterator of chunks, a first pass fits the scaler and
+        # counts the classes, and the model then makes the given number of passes over the stream
+        # Otherwise, the stream is only read once and the scaler is fit on its first chunk
+        # :param chunks: an iterator of DataFrames or a function that returns one
+        # :type chunks: iterator or callable
+        # :param epochs: the number of passes over the stream (only when chunks is a function)
+        # :type epochs: int
+        # :returns: the trained learner
+        # :rtype: OnlineLearner
+
+        if not callable(chunks):
+            for chunk in chunks:
+                self.partial_fit(chunk)
+        else:
+            if self.scaler.mean_ is None:
+                for chunk in chunks():
+                    self.update_stats(chunk)
+
+            for _ in range(epochs):
+                for chunk in chunks():
+                    self.partial_fit(chunk)
+
+        if self.checkpoint_dir is not None:
+            self.save(self.checkpoint_dir)
+
+        return self
+
+    def decision_function(self, X: pd.DataFrame) -> np.ndarray:
+        # This function returns the signed distance of each transaction from the decision boundary
+        # :param X: the unscaled features
+        # :type X: pd.DataFrame
+        # :returns: the distance of each transaction (positive is fraudulent)
+        # :rtype: np.ndarray
+
+        return self.model.decision_function(self._features(X))
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        # This function classifies transactions (1 is fraudulent)
+        # :param X: the unscaled features
+        # :type X: pd.DataFrame
+        # :returns: the predicted class of each transaction
+        # :rtype: np.ndarray
+
+        return (self.decision_function(X) > 0).astype(np.int8)
+
+    def save(self, path: str) -> None:
+        # This function saves the learner to online_model.joblib in a directory
+        # The file is written to a temporary file first, so an interrupted save keeps the last checkpoint
+        # :param path: the directory
+        # :type path: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        os.makedirs(path, exist_ok = True)
+        file = os.path.join(path, "online_model.joblib")
+        joblib.dump(self, file + ".tmp")
+        os.replace(file + ".tmp", file)
+
+        return None
+
+    def load(path: str) -> "OnlineLearner":
+        # This function loads a learner saved by OnlineLearner.save (e.g. to update it with new data)
+        # It is called on the class (OnlineLearner.load(path))
+        # :param path: the directory
+        # :type path: str
+        # :returns: the learner
+        # :rtype: OnlineLearner
+
+        return joblib.load(os.path.join(path, "online_model.joblib"))
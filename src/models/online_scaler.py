@@ -0,0 +1,192 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the OnlineScaler class. It standardizes features
+# like scikit-learn's StandardScaler (and has the same mean_, var_, and scale_
+# attributes), but its running mean and variance are updated one chunk at a
+# time with partial_fit, so the training data never has to be loaded at once.
+# Scalers fit on separate chunks can be merged, and the running state can be
+# saved and loaded so that training and scoring share the same scaler. float32
+# blocks are standardized in place. This file must only import NumPy so that
+# scoring workers start quickly.
+#################################################################################
+
+import numpy as np
+
+class OnlineScaler:
+    def __init__(self, features: list = None):
+        # :param features: the names of the columns to scale, in order (read from the first DataFrame if None)
+        # :type features: list
+
+        self.feature_names_in_ = list(features) if features is not None else None
+        self.n_samples_seen_ = None
+        self.mean_ = None
+        self.var_ = None
+        self.scale_ = None
+
+        # The running sum of squared differences from the mean (var_ = m2 / n_samples_seen_)
+        self.m2 = None
+
+    def _values(self, X) -> tuple:
+        # Return the columns to scale as an array, in the order of the features,
+        # and whether the array is a new copy that can be modified
+        fresh = False
+
+        if hasattr(X, "columns"):
+            if self.feature_names_in_ is None:
+                self.feature_names_in_ = [str(col) for col in X.columns]
+
+            X = X[self.feature_names_in_].to_numpy(copy = True)
+            fresh = True
+
+        X = np.asarray(X)
+
+        return (X.reshape(-1, 1) if X.ndim == 1 else X), fresh
+
+    def partial_fit(self, X) -> "OnlineScaler":
+        # This function updates the running mean and variance with a chunk of rows
+        # Missing values (NaN) are ignored
+        # :param X: the chunk of rows
+        # :type X: pd.DataFrame or np.ndarray
+        # :returns: the updated scaler
+        # :rtype: OnlineScaler
+
+        X = self._values(X)[0].astype(np.float64, copy = False)
+        present = ~np.isnan(X)
+
+        # The moments of the chunk
+        other = OnlineScaler(self.feature_names_in_)
+        other.n_samples_seen_ = present.sum(axis = 0).astype(np.int64)
+        counts = np.maximum(other.n_samples_seen_, 1)
+        other.mean_ = np.where(present, X, 0.0).sum(axis = 0) / counts
+        other.m2 = (np.where(present, X - other.mean_, 0.0) ** 2).sum(axis = 0)
+
+        return self.merge(other)
+
+    def fit(self, X) -> "OnlineScaler":
+        # This function fits the scaler on all of the rows at once (discarding any earlier state)
+        # :param X: the rows
+        # :type X: pd.DataFrame or np.ndarray
+        # :returns: the fitted scaler
+        # :rtype: OnlineScaler
+
+        self.n_samples_seen_ = self.mean_ = self.var_ = self.scale_ = self.m2 = None
+
+        return self.partial_fit(X)
+
+    def merge(self, other: "OnlineScaler") -> "OnlineScaler":
+        # This function combines another scaler's running state into this one
+        # :param other: the other scaler (fit on the same features)
+        # :type other: OnlineScaler
+        # :returns: the combined scaler
+        # :rtype: OnlineScaler
+
+        if other.n_samples_seen_ is None:
+            return self
+
+        if self.feature_names_in_ is None:
+            self.feature_names_in_ = other.feature_names_in_
+
+        if self.n_samples_seen_ is None:
+            self.n_samples_seen_ = other.n_samples_seen_.copy()
+            self.mean_ = other.mean_.copy()
+            self.m2 = other.m2.copy()
+        else:
+            if len(self.mean_) != len(other.mean_):
+                raise ValueError("Only scalers fit on the same features can be merged.")
+
+            count = self.n_samples_seen_ + other.n_samples_seen_
+            ratio = other.n_samples_seen_ / np.maximum(count, 1)
+            delta = other.mean_ - self.mean_
+            self.mean_ = self.mean_ + delta * ratio
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.n_samples_seen_ * ratio
+            self.n_samples_seen_ = count
+
+        # Constant features are not scaled (as with StandardScaler)
+        self.var_ = self.m2 / np.maximum(self.n_samples_seen_, 1)
+        self.scale_ = np.sqrt(self.var_)
+        self.scale_[self.scale_ < 10 * np.finfo(np.float64).eps * np.maximum(np.abs(self.mean_), 1)] = 1.0
+
+        return self
+
+    def transform(self, X, copy: bool = True) -> np.ndarray:
+        # This function standardizes the rows
+        # With copy=False, a float32 or float64 array is standardized in place and returned
+        # (a DataFrame's columns are always copied out first, and then standardized in place)
+        # :param X: the rows
+        # :type X: pd.DataFrame or np.ndarray
+        # :param copy: whether to standardize a copy of the rows
+        # :type copy: bool
+        # :returns: the standardized rows
+        # :rtype: np.ndarray
+
+        if self.mean_ is None:
+            raise RuntimeError("The scaler must be fit before it is used.")
+
+        X, fresh = self._values(X)
+
+        if (copy and not fresh) or X.dtype not in (np.float32, np.float64) or not X.flags.writeable:
+            X = X.astype(np.float32 if X.dtype == np.float32 else np.float64)
+
+        # Subtract and divide with the block's own precision so that nothing is upcast
+        np.subtract(X, self.mean_.astype(X.dtype), out = X)
+        X /= self.scale_.astype(X.dtype)
+
+        return X
+
+    def fit_transform(self, X) -> np.ndarray:
+        # This function fits the scaler and standardizes a copy of the rows
+        # :param X: the rows
+        # :type X: pd.DataFrame or np.ndarray
+        # :returns: the standardized rows
+        # :rtype: np.ndarray
+
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X, copy: bool = True) -> np.ndarray:
+        # This function undoes the standardization
+        # :param X: the standardized rows
+        # :type X: np.ndarray
+        # :param copy: whether to change a copy of the rows
+        # :type copy: bool
+        # :returns: the original rows
+        # :rtype: np.ndarray
+
+        X = np.array(X, dtype = np.float64) if copy else np.asarray(X)
+        X *= self.scale_.astype(X.dtype)
+        X += self.mean_.astype(X.dtype)
+
+        return X
+
+    def save(self, file: str) -> None:
+        # This function saves the running state to an .npz file
+        # :param file: the file name
+        # :type file: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        if self.mean_ is None:
+            raise RuntimeError("The scaler must be fit before it is saved.")
+
+        np.savez(file, features = np.array(self.feature_names_in_ or [], dtype = str),
+                 n_samples_seen = self.n_samples_seen_, mean = self.mean_, m2 = self.m2)
+
+        return None
+
+    def load(file: str) -> "OnlineScaler":
+        # This function loads a scaler saved by OnlineScaler.save
+        # It is called on the class (OnlineScaler.load(file)), and the scaler can keep being updated
+        # :param file: the file name
+        # :type file: str
+        # :returns: the scaler
+        # :rtype: OnlineScaler
+
+        with np.load(file) as state:
+            other = OnlineScaler()
+            other.n_samples_seen_ = state["n_samples_seen"]
+            other.mean_ = state["mean"]
+            other.m2 = state["m2"]
+
+            features = state["features"].tolist()
+
+        return OnlineScaler(features or None).merge(other)
@@ -1,26 +1,35 @@
 #################################################################################
 # Author: Cayson Seipel
 #
-# Summary: This file contains the PredictModels class. This class contains three
+# Summary: This file contains the PredictModels class. This class contains seven
 # main functions. The first function returns a performance report containing
-# a confusion matrix and a classification report. The second function
-# classifies test data from a given logistic regression. The second function 
-# classifies test data from a given support vector machine. For both the second 
-# and third functions, a performance report is generated.
+# a confusion matrix and a classification report (computed by the Metrics
+# class, with the plot as an optional extra step). The second function
+# classifies test data from a given logistic regression. The third function 
+# classifies test data from a given support vector machine. The fourth function
+# classifies test data from a given gradient boosting model. For the second, 
+# third, and fourth functions, a performance report is generated. The other 
+# functions only score the data (no labels or plots are needed) so that they 
+# can be used on unlabeled data.
 #################################################################################
 
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-import statsmodels.api as sm
-from sklearn.svm import SVC
-from sklearn import metrics
-import matplotlib.pyplot as plt
+from models.metrics import Metrics
+
+# Only needed for the type hints; the models are already trained when they reach this file
+if TYPE_CHECKING:
+    import statsmodels.api as sm
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.svm import SVC
 
 class PredictModels:
     def __init__(self, name):
         self.name = name
 
-    def performance_report(y: pd.DataFrame, y_pred: pd.DataFrame, file_name: str = None) -> tuple:
+    def performance_report(y: pd.DataFrame, y_pred: pd.DataFrame, file_name: str = None, plot: bool = True) -> tuple:
         # Create a confusion matrix from the supplied data
         # The results are displayed to the console unless a file name is supplied
         # :param y: The target data
@@ -29,11 +38,22 @@ class PredictModels:
         # :type y_pred: pd.DataFrame
         # :param file_name: The file title for the produced graph(s) 
         # :type file_name: str
+        # :param plot: whether to plot the confusion matrix (e.g. False when it is rendered by ReportFigures)
+        # :type plot: bool
         # :returns: the confusion matrix and classification report for the given model
         # :rtype: a tuple containing metrics.confusion_matrix and metrics.classification_report
         
+        # The report is computed from the confusion matrix, so the labels are only read once
+        cm = Metrics.confusion_matrix(y, y_pred)
+        report = Metrics.classification_report(cm)
+
+        if not plot:
+            return cm, report
+
+        import matplotlib.pyplot as plt
+        from sklearn import metrics
+
         # Show the confusion matrix
-        cm = metrics.confusion_matrix(y, y_pred, labels = [0, 1])
         cm_display = metrics.ConfusionMatrixDisplay(confusion_matrix = cm, display_labels = [0, 1])
         cm_display.plot(values_format = ".1f")
         
@@ -47,9 +67,10 @@ class PredictModels:
         plt.clf()
         plt.close()
 
-        return cm, metrics.classification_report(y, y_pred, target_names = ["Not Fraudulent", "Fraudulent"])
+        return cm, report
 
-    def logistic_predict(X: pd.DataFrame, y: pd.DataFrame, log_model: sm.Logit, file_name: str = None) -> tuple:
+    def logistic_predict(X: pd.DataFrame, y: pd.DataFrame, log_model: sm.Logit, file_name: str = None, 
+                         plot: bool = True) -> tuple:
         # This function predicts from an already fit logistic regression model
         # :param X: the prediction data
         # :type X: pd.DataFrame
@@ -59,22 +80,25 @@ class PredictModels:
         # :type log_model: LogisticRegression 
         # :param file_name: The file title for the produced graph(s) 
         # :type file_name: str
+        # :param plot: whether to plot the confusion matrix
+        # :type plot: bool
         # :returns: the confusion matrix and classification report for the logistic regression
         # :rtype: a tuple containing metrics.confusion_matrix and metrics.classification_report
 
         # Predict the response variable
-        y_pred = log_model.predict(sm.add_constant(X))
+        y_pred = PredictModels.logistic_score(X, log_model)
 
         # Print the accuracy
         as_binary = (y_pred >= 0.5).astype(int)
 
         # Get the performance report
-        report = PredictModels.performance_report(y, as_binary, file_name)
+        report = PredictModels.performance_report(y, as_binary, file_name, plot)
 
         # return the performance report
         return report
 
-    def svm_predict(X: pd.DataFrame, y: pd.DataFrame, svm_trained: SVC, file_name: str = None) -> tuple:
+    def svm_predict(X: pd.DataFrame, y: pd.DataFrame, svm_trained: SVC, file_name: str = None, 
+                    plot: bool = True) -> tuple:
         # This function predicts from an already fit svm
         # :param X: the prediction data
         # :type X: pd.DataFrame
@@ -84,6 +108,8 @@ class PredictModels:
         # :type svm_trained: SVC 
         # :param file_name: The file title for the produced graph(s) 
         # :type file_name: str
+        # :param plot: whether to plot the confusion matrix
+        # :type plot: bool
         # :returns: the confusion matrix and classification report for the svm
         # :rtype: a tuple containing metrics.confusion_matrix and metrics.classification_report
 
@@ -91,7 +117,79 @@ class PredictModels:
         y_pred = svm_trained.predict(X)
         
         # Get the performance report
-        report = PredictModels.performance_report(y, y_pred, file_name)
+        report = PredictModels.performance_report(y, y_pred, file_name, plot)
+
+        # return the classification report
+        return report
+
+    def boosting_predict(X: pd.DataFrame, y: pd.DataFrame, boosting: HistGradientBoostingClassifier, 
+                         file_name: str = None, plot: bool = True) -> tuple:
+        # This function predicts from an already fit gradient boosting model
+        # :param X: the prediction data
+        # :type X: pd.DataFrame
+        # :param y: the response variable (from the test set)
+        # :type y: pd.DataFrame 
+        # :param boosting: the gradient boosting model
+        # :type boosting: HistGradientBoostingClassifier 
+        # :param file_name: The file title for the produced graph(s) 
+        # :type file_name: str
+        # :param plot: whether to plot the confusion matrix
+        # :type plot: bool
+        # :returns: the confusion matrix and classification report for the gradient boosting model
+        # :rtype: a tuple containing metrics.confusion_matrix and metrics.classification_report
+
+        # Predict the response variable
+        y_pred = (PredictModels.boosting_score(X, boosting) >= 0.5).astype(int)
+
+        # Get the performance report
+        report = PredictModels.performance_report(y, y_pred, file_name, plot)
 
         # return the classification report
-        return report
\ No newline at end of file
+        return report
+
+    def logistic_score(X: pd.DataFrame, log_model: sm.Logit) -> np.ndarray:
+        # This function returns the probability of fraud from an already fit logistic regression model
+        # :param X: the prediction data
+        # :type X: pd.DataFrame
+        # :param log_model: the logistic regression model
+        # :type log_model: LogisticRegression 
+        # :returns: the probability that each transaction is fraudulent
+        # :rtype: np.ndarray
+
+        import statsmodels.api as sm
+
+        # Always add the constant - statsmodels skips it when a column is constant,
+        # which happens in small batches (e.g. a batch with no transfers)
+        return np.asarray(log_model.predict(sm.add_constant(X, has_constant = "add")))
+
+    def svm_score(X: pd.DataFrame, svm_trained: SVC) -> np.ndarray:
+        # This function returns the signed distance of each transaction from the svm's decision boundary
+        # Positive distances are classified as fraudulent
+        # :param X: the prediction data
+        # :type X: pd.DataFrame
+        # :param svm_trained: the trained support vector machine
+        # :type svm_trained: SVC 
+        # :returns: the decision function for each transaction
+        # :rtype: np.ndarray
+
+        return svm_trained.decision_function(X)
+
+    def boosting_score(X: pd.DataFrame, boosting: HistGradientBoostingClassifier, 
+                       batch_size: int = 1000000) -> np.ndarray:
+        # This function returns the probability of fraud from an already fit gradient boosting model
+        # The trees are evaluated natively on every core, one large batch at a time
+        # :param X: the prediction data
+        # :type X: pd.DataFrame
+        # :param boosting: the gradient boosting model
+        # :type boosting: HistGradientBoostingClassifier 
+        # :param batch_size: the number of transactions scored at once (bounds the memory used)
+        # :type batch_size: int
+        # :returns: the probability that each transaction is fraudulent
+        # :rtype: np.ndarray
+
+        scores = np.empty(len(X))
+
+        for start in range(0, len(X), batch_size):
+            scores[start:start + batch_size] = boosting.predict_proba(X.iloc[start:start + batch_size])[:, 1]
+
+        return scores
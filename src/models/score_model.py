@@ -0,0 +1,286 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the FraudScorer and MicroBatcher classes. The
+# FraudScorer scores raw transaction records (dicts, a DataFrame, or a CSV
+# stream) with a trained model. The records go through the same cleaning,
+# feature, and scaling steps as the training data, and fraud scores and labels
+# are returned without plotting or computing metrics (account velocity features
+# and transaction graph features are added when the model uses them). The
+# MicroBatcher groups single transactions into small batches so that each call
+# to the model scores many transactions at once.
+#################################################################################
+
+from __future__ import annotations
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from data.make_dataset import CleanData, DATA_TYPES, TRANSACTION_TYPES
+from features.build_features import BuildFeatures, DummyEncoder, BALANCE_FEATURES
+from models.online_scaler import OnlineScaler
+from models.predict_model import PredictModels
+from models.train_model import TrainModels
+
+class FraudScorer:
+    def __init__(self, model, scaler: OnlineScaler, scalable_features: list, feature_cols: list = None,
+                 encoder: DummyEncoder = None, threshold: float = None, account_stores: list = None):
+        # :param model: the trained model (a statsmodels logistic regression or a scikit-learn classifier)
+        # :type model: sm.Logit or a scikit-learn classifier
+        # :param scaler: the scaler fit on the training data (None for models that use unscaled features)
+        # :type scaler: OnlineScaler
+        # :param scalable_features: the columns that were scaled
+        # :type scalable_features: list
+        # :param feature_cols: the columns used by the model, in order (if None, they are read from the model)
+        # :type feature_cols: list
+        # :param encoder: the encoder for the transaction type (defaults to the PaySim transaction types)
+        # :type encoder: DummyEncoder
+        # :param threshold: the score at which a transaction is labeled as fraudulent
+        #                   (defaults to 0.5 for probabilities and 0 for decision functions)
+        # :type threshold: float
+        # :param account_stores: the stores that add account features (AccountStores and TransactionGraphs),
+        #                        which are updated with every transaction
+        # :type account_stores: list
+
+        self.model = model
+        self.scaler = scaler
+        self.scalable_features = list(scalable_features)
+        self.encoder = encoder if encoder is not None else DummyEncoder(categories = TRANSACTION_TYPES)
+        self.account_stores = list(account_stores) if account_stores else []
+
+        # Read the feature order from the model if it was not supplied
+        if feature_cols is None:
+            if hasattr(model, "params"):
+                feature_cols = [col for col in model.params.index if col != "const"]
+            else:
+                feature_cols = list(model.feature_names_in_)
+
+        self.feature_cols = list(feature_cols)
+
+        # Only compute the balance-consistency features for models that use them
+        self.balance_features = any(col in BALANCE_FEATURES for col in self.feature_cols)
+
+        # Decision functions are centered on 0, probabilities on 0.5
+        if threshold is None:
+            threshold = 0.5 if hasattr(model, "params") or hasattr(model, "predict_proba") else 0.0
+
+        self.threshold = threshold
+
+    def prepare(self, records) -> pd.DataFrame:
+        # This function turns raw transaction records into the scaled model features
+        # :param records: a transaction (dict), a list of transactions, or a DataFrame of transactions
+        # :type records: dict, list, or pd.DataFrame
+        # :returns: the model features
+        # :rtype: pd.DataFrame
+
+        if isinstance(records, dict):
+            records = [records]
+
+        if isinstance(records, pd.DataFrame):
+            # Only take the columns that are needed, which also avoids modifying the caller's data
+            needed = set(self.feature_cols) | {"step", self.encoder.col, "oldbalanceOrg"}
+
+            if self.balance_features:
+                needed |= {"amount", "newbalanceOrig", "oldbalanceDest", "newbalanceDest"}
+
+            for store in self.account_stores:
+                needed |= set(store.inputs)
+
+            data = records[[col for col in records.columns if col in needed]].copy()
+        else:
+            data = pd.DataFrame.from_records(records)
+
+        # Apply the training data's cleaning and feature steps
+        if "oldbalanceOrg" in data.columns:
+            data = CleanData.rename_col(data, "oldbalanceOrg", "oldbalanceOrig", inplace = True)
+
+        if self.balance_features:
+            data = BuildFeatures.balance_features(data, inplace = True)
+
+        # The stores are updated with the transactions, so they must be scored in step order
+        for store in self.account_stores:
+            data = store.transform(data, inplace = True)
+
+        if "step" in data.columns:
+            data = BuildFeatures.convert_to_date(data, "step", inplace = True)
+
+        if self.encoder.col in data.columns:
+            data = self.encoder.encode(data, inplace = True)
+
+        X = data[self.feature_cols].astype(np.float64)
+
+        if self.scaler is None or not self.scalable_features:
+            return X
+
+        return TrainModels.scale_data(X, self.scalable_features, self.scaler, inplace = True)[1]
+
+    def score(self, records) -> pd.DataFrame:
+        # This function scores raw transaction records
+        # :param records: a transaction (dict), a list of transactions, or a DataFrame of transactions
+        # :type records: dict, list, or pd.DataFrame
+        # :returns: the fraud score and label (1 is fraudulent) of each transaction
+        # :rtype: pd.DataFrame
+
+        X = self.prepare(records)
+
+        if hasattr(self.model, "params"):
+            scores = PredictModels.logistic_score(X, self.model)
+        elif hasattr(self.model, "predict_proba"):
+            scores = self.model.predict_proba(X)[:, 1]
+        else:
+            scores = PredictModels.svm_score(X, self.model)
+
+        return pd.DataFrame({"score": scores, "prediction": (scores >= self.threshold).astype(np.int8)},
+                            index = X.index)
+
+    def score_stream(self, file, chunk_size: int = 100000):
+        # This function scores a CSV file (or an open stream) of transactions in chunks
+        # :param file: the path to the CSV file or a file-like object
+        # :type file: str or file-like
+        # :param chunk_size: the number of transactions scored at once
+        # :type chunk_size: int
+        # :returns: a generator of the scored chunks
+        # :rtype: generator
+
+        with pd.read_csv(file, sep = ",", dtype = DATA_TYPES, chunksize = chunk_size) as chunks:
+            for chunk in chunks:
+                yield self.score(chunk)
+
+
+class MicroBatcher:
+    def __init__(self, scorer: FraudScorer, max_batch_size: int = 256, max_latency: float = 0.005):
+        # A batch is scored when it is full or when its oldest transaction has waited max_latency seconds
+        # :param scorer: the scorer used for each batch
+        # :type scorer: FraudScorer
+        # :param max_batch_size: the largest number of transactions scored at once
+        # :type max_batch_size: int
+        # :param max_latency: the longest time (in seconds) a transaction waits for its batch to fill
+        # :type max_latency: float
+
+        self.scorer = scorer
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+
+        # The sizes of the latest 1000 batches, and the number of batches and transactions scored so far
+        self.batch_sizes = deque(maxlen = 1000)
+        self.batches = 0
+        self.scored = 0
+        self._requests = queue.Queue()
+        self._closed = False
+
+        # Held while checking the closed flag and queueing, so that no transaction is queued after the stop signal
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target = self._run, daemon = True)
+        self._worker.start()
+
+    def submit(self, record: dict) -> Future:
+        # This function queues a single transaction to be scored
+        # :param record: the transaction
+        # :type record: dict
+        # :returns: a future holding the transaction's score and label
+        # :rtype: Future
+
+        future = Future()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The micro-batcher has been closed.")
+
+            # The time the transaction was queued starts its wait for the batch
+            self._requests.put((record, future, time.perf_counter()))
+
+        return future
+
+    def score(self, record: dict, timeout: float = None) -> tuple:
+        # This function scores a single transaction and waits for the result
+        # :param record: the transaction
+        # :type record: dict
+        # :param timeout: the longest time (in seconds) to wait for the result
+        # :type timeout: float
+        # :returns: the fraud score and label
+        # :rtype: tuple
+
+        return self.submit(record).result(timeout)
+
+    def close(self) -> None:
+        # This function scores the queued transactions and stops the batching thread
+        # :returns: nothing is returned
+        # :rtype: None
+
+        with self._lock:
+            closing = not self._closed
+
+            if closing:
+                self._closed = True
+                self._requests.put(None)
+
+        # The thread is joined outside of the lock (it never takes the lock itself)
+        if closing:
+            self._worker.join()
+
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self) -> None:
+        # Collect transactions until the batch is full or the oldest one has waited too long
+        # (counted from when it was submitted, so the time spent in the queue counts too)
+        while True:
+            request = self._requests.get()
+
+            if request is None:
+                return None
+
+            batch = [request]
+            deadline = request[2] + self.max_latency
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+
+                # Once the oldest transaction has waited too long, only the transactions already queued are added
+                try:
+                    if remaining > 0:
+                        request = self._requests.get(timeout = remaining)
+                    else:
+                        request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    stop = True
+                    break
+
+                batch.append(request)
+
+            self._score_batch(batch)
+
+            if stop:
+                return None
+
+    def _score_batch(self, batch: list) -> None:
+        # Score the whole batch with one call and hand each transaction its result
+        self.batch_sizes.append(len(batch))
+        self.batches += 1
+        self.scored += len(batch)
+
+        try:
+            scored = self.scorer.score([record for record, future, submitted in batch])
+        except Exception as error:
+            for record, future, submitted in batch:
+                future.set_exception(error)
+
+            return None
+
+        for (record, future, submitted), score, prediction in zip(batch, scored["score"].to_numpy(),
+                                                       scored["prediction"].to_numpy()):
+            future.set_result((float(score), int(prediction)))
+
+        return None
@@ -1,63 +1,89 @@
 #################################################################################
 # Author: Cayson Seipel
 #
-# Summary: This file contains the TrainModels class. This class contains four 
-# main functions. The first function scales the data using scikit-learn's 
-# StandardScaler. The second function downsamples the data so that both classes
-# are equally represented in the data. The third function fits a logistic
-# regression model to the given data. Finally, the fourth function fits a
-# support vector machine to the given data.
+# Summary: This file contains the TrainModels class. This class contains seven 
+# main functions. The first function scales the data using an OnlineScaler
+# (see online_scaler.py), which can also be fit one chunk at a time. The 
+# second function downsamples the data so that the classes are in a chosen
+# ratio (see sample_data.py). The third function fits a logistic
+# regression model to the given data. The fourth function fits a support 
+# vector machine to the given data. The fifth function fits a linear
+# classifier on an approximation of the support vector machine's kernel, which
+# scales to the full dataset. The sixth function trains an online learner on
+# a stream of chunks, so every row is used in bounded memory (see 
+# online_model.py). Finally, the seventh function fits a histogram-based
+# gradient boosting model on every core, which also scales to the full dataset.
 #################################################################################
 
+from __future__ import annotations
+from typing import TYPE_CHECKING
 import pandas as pd
-from sklearn.utils import resample
-from sklearn.preprocessing import StandardScaler
-from sklearn import model_selection
-from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from sklearn.inspection import permutation_importance
-import statsmodels.api as sm
+from data.sample_data import StratifiedSampler
+from models.online_model import OnlineLearner
+from models.online_scaler import OnlineScaler
+
+# Each model's library is imported by the function that trains it (these are only for the type hints)
+if TYPE_CHECKING:
+    import statsmodels.api as sm
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.svm import SVC
 
 class TrainModels:
     def __init__(self, name):
         self.name = name
 
-    def scale_data(to_scale: pd.DataFrame, scalable_features: list, scaler: StandardScaler = None) -> tuple:
+    def scale_data(to_scale: pd.DataFrame, scalable_features: list, scaler: OnlineScaler = None, 
+                   inplace: bool = False) -> tuple:
         # :param to_scale: the dataset to scale
         # :type to_scale: pd.Dataframe
         # :param scalable_features: the columns that should be scaled
         # :type scalable_features: list
+        # :param scaler: a fitted scaler (if None, an OnlineScaler is fit on the dataset)
+        #                a StandardScaler from older model bundles is also accepted
+        # :type scaler: OnlineScaler
+        # :param inplace: whether to modify the dataset instead of a copy
+        # :type inplace: bool
         # :returns: the scaler to be used for the test data and the scaled data
-        # :rtype: a tuple containing StandardScaler and pd.DataFrame
+        # :rtype: a tuple containing OnlineScaler and pd.DataFrame
         
-        # Scale the data
-        data_scaled = to_scale.copy()
+        # Scale the data (copying it first unless modifying in place)
+        data_scaled = to_scale if inplace else to_scale.copy()
 
         # No scaler was given to the function
         if not scaler:
-            scaler = StandardScaler().fit(data_scaled[scalable_features])
-        
-        data_scaled[scalable_features] = scaler.transform(data_scaled[scalable_features])
+            scaler = OnlineScaler(scalable_features).partial_fit(data_scaled[scalable_features])
+
+        # The OnlineScaler copies the columns out of the frame once and standardizes them in place
+        if isinstance(scaler, OnlineScaler):
+            data_scaled[scalable_features] = scaler.transform(data_scaled[scalable_features], copy = False)
+        else:
+            data_scaled[scalable_features] = scaler.transform(data_scaled[scalable_features])
 
         return scaler, data_scaled
 
-    def downsample(data: pd.DataFrame, y: str) -> pd.DataFrame:
+    def downsample(data: pd.DataFrame, y: str, class_ratio: dict = None, strata: list = None, 
+                   random_state: int = 42) -> pd.DataFrame:
         # This function downsamples the data to fix unbalanced classes
+        # The sampled rows are chosen from index arrays, so only the sample itself is copied
         # :param data: the dataset to be downsampled
         # :type data: pd.Dataframe
         # :param y: the response variable
         # :type y: pd.Dataframe 
+        # :param class_ratio: the relative size of each class, e.g. {0: 3, 1: 1} (if None, the classes are balanced)
+        # :type class_ratio: dict
+        # :param strata: the columns whose proportions are kept within each class, e.g. ["day"]
+        # :type strata: list
+        # :param random_state: the seed (the same data and seed always give the same sample)
+        # :type random_state: int
         # :returns: downsampled data
         # :rtype: pd.DataFrame
 
-        fraud_data = data[data[y] == 1]
-
-        downsampled_data = pd.concat([resample(data[data[y] == 0], replace = False, 
-                                      n_samples = len(fraud_data), random_state = 42), fraud_data])
+        downsampled_data = StratifiedSampler(y, class_ratio, strata, random_state = random_state).sample(data)
 
         return downsampled_data
 
-    def logistic_model(X: pd.DataFrame, y: pd.DataFrame) -> sm.Logit:
+    def logistic_model(X: pd.DataFrame, y: pd.DataFrame, alpha_val: float = 0.0) -> sm.Logit:
         # This function fits a logistic regression model to the given data
         # It is recommended that training data be used (instead of the whole dataset)
         # :param X: the predictors (from the training set and, ideally, scaled)
@@ -66,11 +92,15 @@ class TrainModels:
         # :type y: pd.Dataframe 
         # :param num_iter: the maximum number of iterations allowed for the model
         # :type num_iter: int 
+        # :param alpha_val: the L1 regularization weight (0 is no regularization)
+        # :type alpha_val: float
         # :returns: the logistic model
         # :rtype: LogisticRegression
 
+        import statsmodels.api as sm
+
         # Fit the statsmodels logistic model to determine features that have high p-values
-        log_reg = sm.Logit(y, sm.add_constant(X)).fit_regularized()
+        log_reg = sm.Logit(y, sm.add_constant(X)).fit_regularized(alpha = alpha_val)
 
         # Print the model summary to check p-values
         print("The logistic regression summary: ", log_reg.summary2())
@@ -91,6 +121,128 @@ class TrainModels:
         # :returns: the support vector machine
         # :rtype: svm
 
+        from sklearn.svm import SVC
+
         svm_train = SVC(kernel = "rbf", C = C_val, gamma = gamma_val).fit(X, y)
 
         return svm_train
+
+    def kernel_svm_model(X: pd.DataFrame, y: pd.DataFrame, method: str = "nystroem", n_components: int = 500, 
+                         C_val: float = 3.0, gamma_val: float = 3.0, solver: str = "sgd", 
+                         random_state: int = 42) -> Pipeline:
+        # This function fits a linear classifier on an approximation of the RBF kernel
+        # Unlike svm_model, the training time grows linearly with the number of rows, 
+        # so the full (imbalanced) dataset can be used instead of a downsampled one
+        # :param X: the predictors (from the training set)
+        # :type X: pd.Dataframe
+        # :param y: the response variable (from the training set)
+        # :type y: pd.Dataframe 
+        # :param method: the kernel approximation ("nystroem" or "rff" for random Fourier features)
+        # :type method: str
+        # :param n_components: the number of features in the kernel approximation
+        # :type n_components: int
+        # :param C_val: the regularization parameter (greater than 0)
+        # :type C_val: float
+        # :param gamma_val: the kernel coefficient (greater than 0)
+        # :type gamma_val: float
+        # :param solver: the linear solver ("sgd" or "liblinear")
+        # :type solver: str
+        # :param random_state: the seed for the kernel approximation and the solver
+        # :type random_state: int
+        # :returns: the kernel approximation and linear classifier
+        # :rtype: Pipeline
+
+        from sklearn.kernel_approximation import Nystroem, RBFSampler
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.pipeline import make_pipeline
+        from sklearn.svm import LinearSVC
+
+        if method == "nystroem":
+            kernel = Nystroem(kernel = "rbf", gamma = gamma_val, n_components = n_components, 
+                              random_state = random_state)
+        elif method == "rff":
+            kernel = RBFSampler(gamma = gamma_val, n_components = n_components, random_state = random_state)
+        else:
+            raise ValueError("method must be \"nystroem\" or \"rff\".")
+
+        # The classes are weighted instead of downsampled so that every row is used
+        # The SGD penalty is the equivalent of C for the hinge loss (alpha = 1 / (C * n))
+        if solver == "sgd":
+            classifier = SGDClassifier(loss = "hinge", alpha = 1 / (C_val * len(X)), class_weight = "balanced", 
+                                       random_state = random_state)
+        elif solver == "liblinear":
+            classifier = LinearSVC(C = C_val, class_weight = "balanced", dual = False, random_state = random_state)
+        else:
+            raise ValueError("solver must be \"sgd\" or \"liblinear\".")
+
+        kernel_svm = make_pipeline(kernel, classifier).fit(X, y)
+
+        return kernel_svm
+
+    def online_model(chunks, feature_cols: list, scalable_features: list, target: str = "isFraud", 
+                     loss: str = "log_loss", alpha_val: float = 1e-5, epochs: int = 1, 
+                     checkpoint_dir: str = None, checkpoint_every: int = 10, random_state: int = 42) -> OnlineLearner:
+        # This function trains a linear classifier with stochastic gradient descent on a stream of chunks
+        # The classes are weighted instead of downsampled, and only one chunk is held in memory at a time
+        # :param chunks: an iterator of DataFrames (including the response variable) or a function that returns one
+        #                (a function allows a first pass to fit the scaler and more than one epoch)
+        # :type chunks: iterator or callable
+        # :param feature_cols: the columns used by the model, in order
+        # :type feature_cols: list
+        # :param scalable_features: the columns that should be scaled
+        # :type scalable_features: list
+        # :param target: the response variable
+        # :type target: str
+        # :param loss: the loss function ("log_loss" for a logistic regression or "hinge" for a linear SVM)
+        # :type loss: str
+        # :param alpha_val: the L2 regularization weight
+        # :type alpha_val: float
+        # :param epochs: the number of passes over the stream
+        # :type epochs: int
+        # :param checkpoint_dir: the directory the learner is checkpointed to (None disables checkpoints)
+        # :type checkpoint_dir: str
+        # :param checkpoint_every: the number of chunks between checkpoints
+        # :type checkpoint_every: int
+        # :param random_state: the seed for the solver
+        # :type random_state: int
+        # :returns: the online learner (update it with new data using partial_fit)
+        # :rtype: OnlineLearner
+
+        learner = OnlineLearner(feature_cols, scalable_features, target, loss, alpha_val, 
+                                checkpoint_dir = checkpoint_dir, checkpoint_every = checkpoint_every, 
+                                random_state = random_state)
+
+        return learner.fit_stream(chunks, epochs)
+
+    def boosting_model(X: pd.DataFrame, y: pd.DataFrame, max_iter: int = 200, learning_rate: float = 0.1, 
+                       max_leaf_nodes: int = 31, class_weight = "balanced", 
+                       random_state: int = 42) -> HistGradientBoostingClassifier:
+        # This function fits a histogram-based gradient boosting model
+        # The features are binned once and every core is used to build the trees, so the full (imbalanced)
+        # dataset can be used, and the features do not need to be scaled
+        # :param X: the predictors (from the training set)
+        # :type X: pd.Dataframe
+        # :param y: the response variable (from the training set)
+        # :type y: pd.Dataframe 
+        # :param max_iter: the largest number of trees (fewer are built if the validation score stops improving)
+        # :type max_iter: int
+        # :param learning_rate: the shrinkage of each tree
+        # :type learning_rate: float
+        # :param max_leaf_nodes: the largest number of leaves in each tree
+        # :type max_leaf_nodes: int
+        # :param class_weight: "balanced", a weight for each class (dict), or None for equal weights
+        # :type class_weight: str or dict
+        # :param random_state: the seed for the validation split
+        # :type random_state: int
+        # :returns: the gradient boosting model
+        # :rtype: HistGradientBoostingClassifier
+
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        # Early stopping holds out 10% of the rows (stratified) to pick the number of trees
+        boosting = HistGradientBoostingClassifier(max_iter = max_iter, learning_rate = learning_rate, 
+                                                  max_leaf_nodes = max_leaf_nodes, class_weight = class_weight, 
+                                                  early_stopping = True, scoring = "loss", 
+                                                  random_state = random_state).fit(X, y)
+
+        return boosting
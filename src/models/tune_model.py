@@ -0,0 +1,193 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the TuneModels class. This class contains one
+# main function, which searches for the best hyperparameters of the logistic
+# regression (alpha_val) or the support vector machine (C_val and gamma_val).
+# The candidates come from a grid or a random space and are cross-validated
+# in parallel across processes. Successive halving drops poor candidates after
+# they are scored on a small subsample, and every fold result is cached on
+# disk so that an interrupted search picks up where it left off.
+#################################################################################
+
+import hashlib
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from models.metrics import Metrics
+from models.train_model import TrainModels
+from parallel import process_pool
+
+# The data shared by every fold in a worker process
+# It is sent to each process once instead of with every fold
+_worker_data = {}
+
+def _init_worker(X: np.ndarray, y: np.ndarray) -> None:
+    _worker_data["X"] = X
+    _worker_data["y"] = y
+
+def _read_score(cache_file: str) -> float:
+    # Return the cached score of a fold (None if it has not been cached or the file cannot be read)
+    try:
+        with open(cache_file) as cached:
+            return float(json.load(cached)["score"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _score_fold(model: str, params: dict, train_idx: np.ndarray, test_idx: np.ndarray, scoring: str) -> float:
+    # Fit a model on one training fold and score it on the matching validation fold
+    X, y = _worker_data["X"], _worker_data["y"]
+
+    if model == "svm":
+        from sklearn.svm import SVC
+
+        fitted = SVC(kernel = "rbf", C = params["C_val"], gamma = params["gamma_val"]).fit(X[train_idx], y[train_idx])
+        y_pred = fitted.predict(X[test_idx])
+    else:
+        import statsmodels.api as sm
+
+        fitted = sm.Logit(y[train_idx], sm.add_constant(X[train_idx], has_constant = "add")).fit_regularized(
+            alpha = params["alpha_val"], disp = 0)
+        y_pred = (fitted.predict(sm.add_constant(X[test_idx], has_constant = "add")) >= 0.5).astype(int)
+
+    if scoring in Metrics.SCORES:
+        return Metrics.score(y[test_idx], y_pred, scoring)
+
+    from sklearn import metrics
+
+    return float(getattr(metrics, scoring + "_score")(y[test_idx], y_pred))
+
+class TuneModels:
+    def __init__(self, name):
+        self.name = name
+
+    def search(X: pd.DataFrame, y: pd.DataFrame, model: str, space: dict, n_iter: int = None, cv: int = 3,
+               min_resources: int = 1000, factor: int = 3, scoring: str = "f1", n_jobs: int = None,
+               cache_dir: str = "../fraud_detection/models/search/", random_state: int = 42) -> tuple:
+        # This function searches for the hyperparameters with the best cross-validated score
+        # Every candidate starts on a stratified subsample of min_resources rows. After each round
+        # only the best 1/factor of the candidates move on to a subsample factor times larger
+        # :param X: the predictors (from the training set and, ideally, scaled)
+        # :type X: pd.DataFrame
+        # :param y: the response variable (from the training set)
+        # :type y: pd.DataFrame
+        # :param model: the model to tune ("svm" or "logistic")
+        # :type model: str
+        # :param space: the values to try for each parameter (lists, or distributions when n_iter is given)
+        #               e.g. {"C_val": [0.3, 1, 3, 10], "gamma_val": [0.3, 1, 3]}
+        # :type space: dict
+        # :param n_iter: the number of random candidates (if None, every combination in the grid is tried)
+        # :type n_iter: int
+        # :param cv: the number of cross-validation folds
+        # :type cv: int
+        # :param min_resources: the number of rows used in the first round
+        # :type min_resources: int
+        # :param factor: the rate at which candidates are dropped and the subsample grows
+        # :type factor: int
+        # :param scoring: the metric to maximize (any sklearn.metrics function named <scoring>_score)
+        # :type scoring: str
+        # :param n_jobs: the number of processes (if None, every core is used)
+        # :type n_jobs: int
+        # :param cache_dir: the directory holding the fold results
+        # :type cache_dir: str
+        # :param random_state: the seed for the candidates, subsamples, and folds
+        # :type random_state: int
+        # :returns: the best model (refit on all of the data) and a table with the results of every round
+        # :rtype: a tuple containing the model and pd.DataFrame
+
+        from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+
+        if model not in ("svm", "logistic"):
+            raise ValueError("model must be \"svm\" or \"logistic\".")
+
+        if n_iter is None:
+            candidates = list(ParameterGrid(space))
+        else:
+            candidates = list(ParameterSampler(space, n_iter, random_state = random_state))
+
+        X_values = np.ascontiguousarray(X.to_numpy(dtype = np.float64))
+        y_values = np.ascontiguousarray(np.asarray(y, dtype = np.int64))
+
+        # Fold results are only reused for the same data and search settings
+        # The arrays are hashed in place instead of copying them into one bytes object
+        data_hash = hashlib.sha256()
+        data_hash.update(memoryview(X_values))
+        data_hash.update(memoryview(y_values))
+        data_key = data_hash.hexdigest()
+        os.makedirs(cache_dir, exist_ok = True)
+
+        results = []
+        n_resources = min(min_resources, len(y_values))
+        search_round = 0
+
+        with process_pool(n_jobs, initializer = _init_worker, initargs = (X_values, y_values)) as pool:
+            while True:
+                # Take a stratified subsample for this round
+                if n_resources < len(y_values):
+                    subsample = train_test_split(np.arange(len(y_values)), train_size = n_resources,
+                                                 stratify = y_values, random_state = random_state)[0]
+                else:
+                    subsample = np.arange(len(y_values))
+
+                folds = [(subsample[train], subsample[test]) for train, test in StratifiedKFold(
+                    cv, shuffle = True, random_state = random_state).split(subsample, y_values[subsample])]
+
+                # Submit the folds that have not already been cached
+                jobs = {}
+
+                for candidate, params in enumerate(candidates):
+                    for fold, (train_idx, test_idx) in enumerate(folds):
+                        key = hashlib.sha256(json.dumps([data_key, model, params, scoring, cv, n_resources, fold,
+                                                         random_state], sort_keys = True, default = float)
+                                             .encode()).hexdigest()
+                        cache_file = os.path.join(cache_dir, key + ".json")
+                        score = _read_score(cache_file)
+
+                        if score is not None:
+                            jobs[candidate, fold] = (score, None)
+                        else:
+                            jobs[candidate, fold] = (pool.submit(_score_fold, model, params, train_idx,
+                                                                 test_idx, scoring), cache_file)
+
+                # Collect the scores, caching each fold as soon as it finishes
+                scores = np.empty((len(candidates), len(folds)))
+
+                for (candidate, fold), (job, cache_file) in jobs.items():
+                    if cache_file is None:
+                        scores[candidate, fold] = job
+                    else:
+                        scores[candidate, fold] = job.result()
+
+                        # Write to a temporary file first so that an interrupted search never leaves a partial file
+                        with open(cache_file + ".tmp", "w") as cached:
+                            json.dump({"score": scores[candidate, fold]}, cached)
+
+                        os.replace(cache_file + ".tmp", cache_file)
+
+                for params, fold_scores in zip(candidates, scores):
+                    results.append({**params, "round": search_round, "n_resources": len(subsample),
+                                    "mean_score": fold_scores.mean(), "std_score": fold_scores.std()})
+
+                # Stop once a single candidate is left or all of the data has been used
+                if len(candidates) <= 1 or len(subsample) == len(y_values):
+                    break
+
+                keep = max(1, math.ceil(len(candidates) / factor))
+                best = np.argsort(-scores.mean(axis = 1), kind = "stable")[:keep]
+                candidates = [candidates[candidate] for candidate in best]
+                n_resources = min(n_resources * factor, len(y_values))
+                search_round += 1
+
+        results = pd.DataFrame(results)
+        final_round = results[results["round"] == search_round]
+        best_params = candidates[int(np.argmax(final_round["mean_score"].to_numpy()))]
+
+        # Refit the best candidate on all of the data
+        if model == "svm":
+            best_model = TrainModels.svm_model(X, y, **best_params)
+        else:
+            best_model = TrainModels.logistic_model(X, y, **best_params)
+
+        return best_model, results
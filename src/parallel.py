@@ -0,0 +1,25 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the process_pool function, which creates the
+# process pools used to render the report figures and to measure the feature
+# importances in parallel. This file must only import the standard library.
+#################################################################################
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def process_pool(max_workers: int = None, **kwargs) -> ProcessPoolExecutor:
+    # This function creates a process pool that forks its workers where possible
+    # Forked workers do not re-run the calling script (e.g. run_model.py) when they start
+    # :param max_workers: the number of processes (None uses every core)
+    # :type max_workers: int
+    # :param kwargs: passed to ProcessPoolExecutor (e.g. initializer and initargs)
+    # :type kwargs: dict
+    # :returns: the process pool
+    # :rtype: ProcessPoolExecutor
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    return ProcessPoolExecutor(max_workers = max_workers, mp_context = context, **kwargs)
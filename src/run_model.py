@@ -2,17 +2,29 @@
 # Author: Cayson Seipel
 #
 # Summary: The goal of this project is to predict whether transactions are 
-# fraudulent or not. I use two models (logistic regression and support vector 
-# machine) to model the data. 
+# fraudulent or not. I use five models to model the data: a logistic
+# regression and a support vector machine trained on a balanced sample, and a
+# kernel approximation SVM, an online (SGD) learner, and a histogram gradient
+# boosting classifier trained on every transaction outside the test set.
 #################################################################################
 
-from data.make_dataset import CleanData
-from features.build_features import BuildFeatures
+from data.make_dataset import CleanData, TRANSACTION_TYPES
+from data.cache_dataset import CacheData
+from features.build_features import BuildFeatures, DummyEncoder, BALANCE_FEATURES
+from features.account_store import AccountStore
+from features.transaction_graph import TransactionGraph
+from features.pipeline import FeaturePipeline
 from visualization.visualize import Visualize
+from visualization.correlation_data import StreamCorrelation
+from visualization.report_figures import ReportFigures, render_boxplots, render_confusion_matrix, render_heatmap, \
+    render_importance
 from models.train_model import TrainModels
 from models.predict_model import PredictModels
+from models.model_bundle import ModelBundle
+from models.feature_importance import FeatureImportance
 from sklearn.model_selection import train_test_split
 import pandas as pd
+import time
 
 
 #################################################################################
@@ -22,35 +34,87 @@ import pandas as pd
 # Show all of the columns when printing to the console
 pd.set_option("display.max_columns", 20)
 
-# Import the data
+# The account and transaction graph state at the end of the data (written by build_dataset)
+ACCOUNT_STATE_FILES = ["../fraud_detection/models/orig_accounts.npz", "../fraud_detection/models/dest_accounts.npz",
+                       "../fraud_detection/models/transaction_graph.npz"]
+
+# Build the cleaned dataset from the raw transaction data
 # The data can be found at https://www.kaggle.com/datasets/ealaxi/paysim1
-fraud_data = CleanData.load_data("Fraud_Data.csv")
+def build_dataset(file: str) -> pd.DataFrame:
+    # Import the data
+    fraud_data = CleanData.load_data(file)
 
+    # The freshly loaded data is not used anywhere else, so each step modifies it in place
+    # instead of making a full copy of the dataset
+    pipeline = FeaturePipeline(inplace = True)
 
-#################################################################################
-# Data Cleansing
-#################################################################################
 
-# Convert all of the numeric columns into numeric datatypes 
-# the code would throw errors because the data was nonnumeric
-fraud_data = CleanData.convert_to_numeric(fraud_data, ["step", "amount", "oldbalanceOrg", "newbalanceOrig", 
-    "oldbalanceDest", "newbalanceDest", "isFraud", "isFlaggedFraud"])
+    #############################################################################
+    # Data Cleansing
+    #############################################################################
 
-# rename a column to be consistent with other columns 
-fraud_data = CleanData.rename_col(fraud_data, "oldbalanceOrg", "oldbalanceOrig")
+    # Convert all of the numeric columns into numeric datatypes 
+    # the code would throw errors because the data was nonnumeric
+    pipeline.add_step(CleanData.convert_to_numeric, ["step", "amount", "oldbalanceOrg", "newbalanceOrig", 
+        "oldbalanceDest", "newbalanceDest", "isFraud", "isFlaggedFraud"])
 
+    # rename a column to be consistent with other columns 
+    pipeline.add_step(CleanData.rename_col, "oldbalanceOrg", "oldbalanceOrig")
 
-#################################################################################
-# Feature Engineering
-#################################################################################
 
-# Convert the step column into day and hour fields  
-# The original column was a date column representing hours since the beginning of the month 
-# there is only one month of data
-fraud_data_clean = BuildFeatures.convert_to_date(fraud_data, "step")
+    #############################################################################
+    # Feature Engineering
+    #############################################################################
+
+    # Add the velocity features of the originating and destination accounts (the number of transactions
+    # and total amount in the last 1 and 24 hours, the hours since the previous transaction, and whether
+    # the originating account has been drained to zero) in one pass over the transactions
+    orig_store = AccountStore("nameOrig", "orig", balance_cols = ("oldbalanceOrig", "newbalanceOrig"))
+    dest_store = AccountStore("nameDest", "dest")
+    pipeline.add_step(orig_store.transform, name = "orig_account_features")
+    pipeline.add_step(dest_store.transform, name = "dest_account_features")
+
+    # Add the transaction graph features for mule accounts (fan-out, fan-in, the distinct senders to the
+    # destination in the last 24 hours, and the TRANSFERs received before a CASH_OUT) one hour at a time
+    # This needs the transaction type, so it runs before the type is converted to dummy variables
+    transaction_graph = TransactionGraph(window = 24)
+    pipeline.add_step(transaction_graph.transform, name = "graph_features")
+
+    # Add the balance errors, zero-balance flags, and amount-to-balance ratios of both accounts
+    # The new balances are dropped from the models later, but how far they are from the expected
+    # balances (old balance minus or plus the amount) separates the fraudulent transactions well
+    pipeline.add_step(BuildFeatures.balance_features)
+
+    # Convert the step column into day and hour fields  
+    # The original column was a date column representing hours since the beginning of the month 
+    # there is only one month of data
+    pipeline.add_step(BuildFeatures.convert_to_date, "step")
+
+    # Convert the transaction type to dummy variables
+    # The encoder uses the fixed PaySim vocabulary so the columns never depend on which types are present
+    pipeline.add_step(BuildFeatures.convert_to_dummy, encoder = DummyEncoder(categories = TRANSACTION_TYPES))
+
+    fraud_data_clean = pipeline.run(fraud_data)
+
+    # Save the account state at the end of the data so that new transactions can be scored with
+    # FraudScorer(..., account_stores = [AccountStore.load(...), ...]) without re-reading the history
+    # The files are cached with the dataset (see ACCOUNT_STATE_FILES)
+    orig_store.save(ACCOUNT_STATE_FILES[0])
+    dest_store.save(ACCOUNT_STATE_FILES[1])
+    transaction_graph.save(ACCOUNT_STATE_FILES[2])
+
+    # print the time of each step
+    # (use FeaturePipeline(inplace = True, profile = True) to also record the peak memory of each step)
+    print("==========================================================")
+    print("The Data Pipeline Report:")
+    print(pipeline.report)
 
-# Convert the transaction type to dummy variables
-fraud_data_clean = BuildFeatures.convert_to_dummy(fraud_data_clean)
+    return fraud_data_clean
+
+# The cleaned data is cached in ./data/processed 
+# It is only rebuilt when the raw data or the cleaning and feature code changes
+# The account state that build_dataset saves is cached with it, and restored to ./models when the cache is used
+fraud_data_clean = CacheData.load_cached("Fraud_Data.csv", build_dataset, artifacts = ACCOUNT_STATE_FILES)
 
 
 #################################################################################
@@ -60,7 +124,21 @@ fraud_data_clean = BuildFeatures.convert_to_dummy(fraud_data_clean)
 # Create a Pandas Profile Report
 # There are no missing values 
 # The data will need to be standardized
-Visualize.data_profile(fraud_data_clean)
+# Profiling every row runs out of memory, so the summaries are computed in one pass over chunks
+# and the Pandas Profile Report only uses a stratified sample
+# The account names are IDs with millions of values, so they are not profiled
+profile_cols = fraud_data_clean.columns.drop(["nameOrig", "nameDest"])
+Visualize.stream_profile((fraud_data_clean.iloc[start:start + 500000][profile_cols] 
+    for start in range(0, len(fraud_data_clean), 500000)), sample_size = 100000)
+
+# The figures are collected here and rendered in parallel at the end of the script
+# Figures whose data has not changed since the last run are not rendered again
+report_figures = ReportFigures()
+
+# The boxplot statistics of every column are computed by fraud type in one pass
+# so the plots do not have to filter or draw millions of rows
+boxplot_stats = Visualize.boxplot_stats(fraud_data_clean, ["amount", "oldbalanceOrig", "newbalanceOrig", 
+    "oldbalanceDest", "newbalanceDest"], by = "isFraud")
 
 # Side-by-side boxplot comparison of transaction amounts by fraud type
 # I did a lot of these to determine where the fraudulent transactions fit within the data
@@ -68,48 +146,58 @@ Visualize.data_profile(fraud_data_clean)
 # don't appear to be linearly seperable
 # A non-linear classification technique will likely work best
 # I chose a support vector machine utilizing the RBF method to account for the non-linearity
-Visualize.transaction_boxplots(data1 = fraud_data_clean[fraud_data_clean["isFraud"] == 0]["amount"], 
-   data2 = fraud_data_clean[fraud_data_clean["isFraud"] == 1]["amount"], 
-   title = "Transaction Amounts by Fraud Type",
-   x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
-   y_label = "Transaction Amount (In Millions Of Local Currency)", 
-   file_name = "amount_fraud_comparison.png")
+report_figures.add("amount_fraud_comparison.png", render_boxplots, 
+    stats1 = boxplot_stats["amount", 0], 
+    stats2 = boxplot_stats["amount", 1], 
+    title = "Transaction Amounts by Fraud Type",
+    x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
+    y_label = "Transaction Amount (In Millions Of Local Currency)")
 
 # Side-by-side boxplot comparison of oldbalanceOrig by fraud type
-Visualize.transaction_boxplots(data1 = fraud_data_clean[fraud_data_clean["isFraud"] == 0]["oldbalanceOrig"], 
-    data2 = fraud_data_clean[fraud_data_clean["isFraud"] == 1]["oldbalanceOrig"], 
+report_figures.add("original_balance_fraud_comparison.png", render_boxplots, 
+    stats1 = boxplot_stats["oldbalanceOrig", 0], 
+    stats2 = boxplot_stats["oldbalanceOrig", 1], 
     title = "Originator Original Balance by Transaction Fraud Type",
     x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
-    y_label = "Original Balance (In Millions Of Local Currency)", 
-    file_name = "original_balance_fraud_comparison.png")
+    y_label = "Original Balance (In Millions Of Local Currency)")
 
 # Side-by-side boxplot comparison of newbalanceOrg by fraud type
-Visualize.transaction_boxplots(data1 = fraud_data_clean[fraud_data_clean["isFraud"] == 0]["newbalanceOrig"], 
-    data2 = fraud_data_clean[fraud_data_clean["isFraud"] == 1]["newbalanceOrig"], 
+report_figures.add("new_balance_fraud_comparison.png", render_boxplots, 
+    stats1 = boxplot_stats["newbalanceOrig", 0], 
+    stats2 = boxplot_stats["newbalanceOrig", 1], 
     title = "Originator New Balance by Transaction Fraud Type",
     x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
-    y_label = "New Balance (In Millions Of Local Currency)", 
-    file_name = "new_balance_fraud_comparison.png")
+    y_label = "New Balance (In Millions Of Local Currency)")
 
 # Side-by-side boxplot comparison of oldbalanceDest by fraud type
-Visualize.transaction_boxplots(data1 = fraud_data_clean[fraud_data_clean["isFraud"] == 0]["oldbalanceDest"], 
-    data2 = fraud_data_clean[fraud_data_clean["isFraud"] == 1]["oldbalanceDest"], 
+report_figures.add("original_destination_fraud_comparison.png", render_boxplots, 
+    stats1 = boxplot_stats["oldbalanceDest", 0], 
+    stats2 = boxplot_stats["oldbalanceDest", 1], 
     title = "Destination Original Balance by Transaction Fraud Type",
     x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
-    y_label = "Original Balance (In Millions Of Local Currency)", 
-    file_name = "original_destination_fraud_comparison.png")
+    y_label = "Original Balance (In Millions Of Local Currency)")
 
 # Side-by-side boxplot comparison of newbalanceDest by fraud type
-Visualize.transaction_boxplots(data1 = fraud_data_clean[fraud_data_clean["isFraud"] == 0]["newbalanceDest"], 
-    data2 = fraud_data_clean[fraud_data_clean["isFraud"] == 1]["newbalanceDest"], 
+report_figures.add("new_destination_fraud_comparison.png", render_boxplots, 
+    stats1 = boxplot_stats["newbalanceDest", 0], 
+    stats2 = boxplot_stats["newbalanceDest", 1], 
     title = "Destination New Balance by Transaction Fraud Type",
     x_label1 = "Non-Fraudulent", x_label2 = "Fraudulent", 
-    y_label = "New Balance (In Millions Of Local Currency)", 
-    file_name = "new_destination_fraud_comparison.png")
+    y_label = "New Balance (In Millions Of Local Currency)")
 
 # A correlation plot of the data
 # Saved to ./reports for easy future access
-Visualize.correlation_matrix(fraud_data_clean, file_name = "corr_matrix.png")
+# The correlation is accumulated over chunks and its state is saved, so new transactions can be
+# added later with StreamCorrelation.load(...).update(new_data) without re-reading the history
+# Only the raw transaction columns are correlated (the engineered features would make the plot unreadable)
+fraud_correlation = StreamCorrelation(columns = ["day", "hour", "amount", "oldbalanceOrig", "newbalanceOrig",
+    "oldbalanceDest", "newbalanceDest", "isFraud", "isFlaggedFraud"])
+
+for start in range(0, len(fraud_data_clean), 500000):
+    fraud_correlation.update(fraud_data_clean.iloc[start:start + 500000])
+
+fraud_correlation.save("../fraud_detection/data/processed/correlation_state.npz")
+report_figures.add("corr_matrix.png", render_heatmap, corr_matrix = fraud_correlation.correlation())
 
 
 #################################################################################
@@ -120,7 +208,8 @@ Visualize.correlation_matrix(fraud_data_clean, file_name = "corr_matrix.png")
 # This will be the baseline method to beat in accuracy
 # It is pretty bad, so this shouldn't be too difficult to do
 report = PredictModels.performance_report(y = fraud_data_clean["isFraud"], y_pred = fraud_data_clean["isFlaggedFraud"], 
-    file_name = "orig_conf_matrix.png")
+    plot = False)
+report_figures.add("orig_conf_matrix.png", render_confusion_matrix, cm = report[0])
 
 # print the current method's classification report
 print("==========================================================")
@@ -134,8 +223,9 @@ print(report[1])
 # Remove highly correlated columns
 # The columns removed are already captured by the amount and original balance columns
 # The data is imbalanced, so I downsample the non-fraud data to balance the classes  
-fraud_data_downsample = TrainModels.downsample(fraud_data_clean.drop(["newbalanceOrig", "newbalanceDest"], axis = 1), 
-    "isFraud")
+# The columns are dropped after sampling so that the full dataset is not copied
+fraud_data_downsample = TrainModels.downsample(fraud_data_clean, "isFraud").drop(["newbalanceOrig", 
+    "newbalanceDest"], axis = 1)
 
 # Split the data into train-test sets 
 X_train, X_test, y_train, y_test = train_test_split(fraud_data_downsample[
@@ -153,26 +243,137 @@ scaler, X_train_scaled = TrainModels.scale_data(X_train, ["amount", "oldbalanceO
 X_test_scaled = TrainModels.scale_data(X_test, ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour"], 
     scaler)[1]
 
+# Save the scaler's running state so that it can be loaded and updated with new data
+# (OnlineScaler.load(...).partial_fit(new_data)) without re-reading the training data
+scaler.save("../fraud_detection/models/scaler.npz")
+
 
 #################################################################################
 # Logistic Regression and Support Vector Machine
 #################################################################################
 
+# The training and prediction time of every model, for the comparison at the end
+model_timings = []
+
 # Train a logistic regression
 # Through using backwards stepwise feature elimination, all but the following were eliminated for having 
 # high p-values
+start_time = time.perf_counter()
 fraud_reg = TrainModels.logistic_model(X_train_scaled[["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour", "TRANSFER"]], 
     y_train)
+train_time = time.perf_counter() - start_time
 
 # Predict with the logistic model on the test data
+start_time = time.perf_counter()
 log_report = PredictModels.logistic_predict(X_test_scaled[["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour", "TRANSFER"]], 
-    y_test, fraud_reg, file_name = "log_conf_matrix.png")
+    y_test, fraud_reg, plot = False)
+model_timings.append(("Logistic", len(X_train_scaled), train_time, time.perf_counter() - start_time))
+report_figures.add("log_conf_matrix.png", render_confusion_matrix, cm = log_report[0])
 
 # Train the smv model
+start_time = time.perf_counter()
 fraud_svm = TrainModels.svm_model(X_train_scaled, y_train)
+train_time = time.perf_counter() - start_time
 
 # Predict on the SVM model using the test data
-svm_report = PredictModels.svm_predict(X_test_scaled, y_test, fraud_svm, file_name = "svm_conf_matrix.png")
+start_time = time.perf_counter()
+svm_report = PredictModels.svm_predict(X_test_scaled, y_test, fraud_svm, plot = False)
+model_timings.append(("SVM", len(X_train_scaled), train_time, time.perf_counter() - start_time))
+report_figures.add("svm_conf_matrix.png", render_confusion_matrix, cm = svm_report[0])
+
+# The permutation importance of each feature (the drop in F1 score when it is shuffled)
+log_importance = FeatureImportance.permutation_importance(X_test_scaled[["amount", "oldbalanceOrig", 
+    "oldbalanceDest", "day", "hour", "TRANSFER"]], y_test, fraud_reg)
+report_figures.add("log_feature_importance.png", render_importance, importance = log_importance, 
+    title = "Logistic Regression Feature Importance")
+
+svm_importance = FeatureImportance.permutation_importance(X_test_scaled, y_test, fraud_svm)
+report_figures.add("svm_feature_importance.png", render_importance, importance = svm_importance, 
+    title = "SVM Feature Importance")
+
+# Save both models with their scaler and features so they can be used for scoring without retraining
+# Load them with ModelBundle.load("../fraud_detection/models/<model>")
+ModelBundle(fraud_reg, scaler, ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour"], 
+    ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour", "TRANSFER"], 
+    DummyEncoder(categories = TRANSACTION_TYPES)).save("../fraud_detection/models/logistic")
+ModelBundle(fraud_svm, scaler, ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour"], X_train.columns, 
+    DummyEncoder(categories = TRANSACTION_TYPES)).save("../fraud_detection/models/svm")
+
+
+#################################################################################
+# Kernel Approximation Support Vector Machine
+#################################################################################
+
+# The exact SVM only works on the downsampled data because its training time grows quadratically
+# The kernel approximation is trained on every transaction that is not in the test set, 
+# so both SVMs are compared on the same test data
+fraud_data_full = fraud_data_clean.drop(X_test.index)
+X_full_scaled = TrainModels.scale_data(fraud_data_full[X_train.columns], ["amount", "oldbalanceOrig", 
+    "oldbalanceDest", "day", "hour"], scaler, inplace = True)[1]
+
+# Train the kernel approximation svm model
+start_time = time.perf_counter()
+fraud_kernel_svm = TrainModels.kernel_svm_model(X_full_scaled, fraud_data_full["isFraud"])
+train_time = time.perf_counter() - start_time
+
+# Predict on the kernel approximation SVM model using the test data
+start_time = time.perf_counter()
+kernel_svm_report = PredictModels.svm_predict(X_test_scaled, y_test, fraud_kernel_svm, plot = False)
+model_timings.append(("Kernel Approximation SVM", len(X_full_scaled), train_time, time.perf_counter() - start_time))
+report_figures.add("kernel_svm_conf_matrix.png", render_confusion_matrix, cm = kernel_svm_report[0])
+
+
+#################################################################################
+# Online Learner
+#################################################################################
+
+# The online learner is trained with stochastic gradient descent on every transaction that is not 
+# in the test set, one chunk at a time, so it also works on feeds that do not fit in memory
+# It has its own scaler (fit in a first pass over the chunks) and is checkpointed while it trains
+# Update it with new transactions using OnlineLearner.load("../fraud_detection/models/online").partial_fit(chunk)
+start_time = time.perf_counter()
+fraud_online = TrainModels.online_model(lambda: (fraud_data_full.iloc[start:start + 500000] 
+                                                 for start in range(0, len(fraud_data_full), 500000)), 
+    X_train.columns, ["amount", "oldbalanceOrig", "oldbalanceDest", "day", "hour"], epochs = 3, 
+    checkpoint_dir = "../fraud_detection/models/online")
+train_time = time.perf_counter() - start_time
+
+# Predict on the online learner using the (unscaled) test data
+start_time = time.perf_counter()
+online_report = PredictModels.performance_report(y_test, fraud_online.predict(X_test), plot = False)
+model_timings.append(("Online Learner", len(fraud_data_full), train_time, time.perf_counter() - start_time))
+report_figures.add("online_conf_matrix.png", render_confusion_matrix, cm = online_report[0])
+
+
+#################################################################################
+# Gradient Boosting
+#################################################################################
+
+# The gradient boosting model is also trained on every transaction that is not in the test set
+# Trees do not need scaled features, and the classes are weighted instead of downsampled
+# It also uses the account velocity, transaction graph, and balance-consistency features, which trees can 
+# split on without scaling
+boosting_features = list(X_train.columns) + ["orig_count_1h", "orig_amount_1h", "orig_count_24h", 
+    "orig_amount_24h", "orig_hours_since_last", "orig_drained", "dest_count_1h", "dest_amount_1h", 
+    "dest_count_24h", "dest_amount_24h", "dest_hours_since_last", "orig_fan_out", "dest_fan_in", 
+    "dest_senders_24h", "chain_transfers_24h"] + BALANCE_FEATURES
+
+start_time = time.perf_counter()
+fraud_boosting = TrainModels.boosting_model(fraud_data_full[boosting_features], fraud_data_full["isFraud"])
+train_time = time.perf_counter() - start_time
+
+# Predict on the gradient boosting model using the (unscaled) test data
+start_time = time.perf_counter()
+boosting_report = PredictModels.boosting_predict(fraud_data_clean.loc[X_test.index, boosting_features], y_test, 
+    fraud_boosting, plot = False)
+model_timings.append(("Gradient Boosting", len(fraud_data_full), train_time, time.perf_counter() - start_time))
+report_figures.add("boosting_conf_matrix.png", render_confusion_matrix, cm = boosting_report[0])
+
+# Save the gradient boosting model (it has no scaler, so every feature is passed through unscaled)
+# Score it with bundle.scorer(account_stores = [AccountStore.load(...), ..., TransactionGraph.load(...)]) 
+# so that the account and graph features are added
+ModelBundle(fraud_boosting, None, [], boosting_features, 
+    DummyEncoder(categories = TRANSACTION_TYPES)).save("../fraud_detection/models/boosting")
 
 
 #################################################################################
@@ -183,8 +384,45 @@ svm_report = PredictModels.svm_predict(X_test_scaled, y_test, fraud_svm, file_na
 print("==========================================================")
 print("The Logistic Classification Report:")
 print(log_report[1])
+print("The Logistic Feature Importance:")
+print(log_importance.to_string(index = False))
 
 # print the SVM classification report
 print("==========================================================")
 print("The SVM Classification Report:")
 print(svm_report[1])
+print("The SVM Feature Importance:")
+print(svm_importance.to_string(index = False))
+
+# print the kernel approximation SVM classification report
+print("==========================================================")
+print("The Kernel Approximation SVM Classification Report:")
+print(kernel_svm_report[1])
+
+# print the online learner classification report
+print("==========================================================")
+print("The Online Learner Classification Report:")
+print(online_report[1])
+
+# print the gradient boosting classification report
+print("==========================================================")
+print("The Gradient Boosting Classification Report:")
+print(boosting_report[1])
+
+# print the training time and throughput of every model
+model_timings = pd.DataFrame(model_timings, columns = ["model", "train_rows", "train_seconds", "predict_seconds"])
+model_timings["train_rows_per_second"] = model_timings["train_rows"] / model_timings["train_seconds"]
+model_timings["predict_rows_per_second"] = len(X_test) / model_timings["predict_seconds"]
+print("==========================================================")
+print("Training Time and Throughput ({} test rows):".format(len(X_test)))
+print(model_timings.to_string(index = False, float_format = "{:,.2f}".format))
+
+
+#################################################################################
+# Report Figures
+#################################################################################
+
+# Render the figures that changed since the last run
+rendered = report_figures.render()
+print("==========================================================")
+print("Rendered {} of {} figures to ./reports/figures".format(len(rendered), len(report_figures.figures)))
@@ -0,0 +1,176 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the StreamCorrelation class. It computes the
+# Pearson correlation matrix of the numeric (and dummy) columns from chunks of
+# data instead of the whole dataset. For every pair of columns it keeps the
+# number of rows where both are present, their means, and their co-moments,
+# which are combined across chunks with Welford's/Chan's update. Accumulators
+# from separate processes can be merged, and the state can be saved so that
+# new (e.g. daily) data is added without re-reading the history.
+#################################################################################
+
+import numpy as np
+import pandas as pd
+
+class StreamCorrelation:
+    def __init__(self, columns: list = None):
+        # :param columns: the columns to correlate (if None, the numeric columns of the first chunk are used)
+        # :type columns: list
+
+        self.columns = list(columns) if columns is not None else None
+        self.rows = 0
+
+        # Entry [i, j] is computed over the rows where both column i and column j are present,
+        # which matches the pairwise handling of missing values in pd.DataFrame.corr
+        self.count = None
+        self.mean = None
+        self.m2 = None
+        self.comoment = None
+
+        if self.columns is not None:
+            self._reset()
+
+    def _reset(self) -> None:
+        # Create empty accumulators for the columns
+        size = len(self.columns)
+        self.count = np.zeros((size, size))
+        self.mean = np.zeros((size, size))
+        self.m2 = np.zeros((size, size))
+        self.comoment = np.zeros((size, size))
+
+        return None
+
+    def update(self, chunk: pd.DataFrame) -> "StreamCorrelation":
+        # This function adds a chunk of rows to the correlation
+        # Columns that are missing from the chunk are treated as missing values
+        # :param chunk: the rows
+        # :type chunk: pd.DataFrame
+        # :returns: the updated correlation
+        # :rtype: StreamCorrelation
+
+        if self.columns is None:
+            self.columns = [col for col in chunk.columns if pd.api.types.is_numeric_dtype(chunk[col]) or
+                            pd.api.types.is_bool_dtype(chunk[col])]
+            self._reset()
+
+        self.rows += len(chunk)
+
+        if len(chunk) == 0:
+            return self
+
+        values = np.full((len(chunk), len(self.columns)), np.nan)
+
+        for i, col in enumerate(self.columns):
+            if col in chunk.columns:
+                values[:, i] = chunk[col].to_numpy(dtype = np.float64, na_value = np.nan)
+
+        present = (~np.isnan(values)).astype(np.float64)
+
+        # Center each column on its chunk mean before multiplying to avoid losing precision
+        shift = np.nansum(values, axis = 0) / np.maximum(present.sum(axis = 0), 1)
+
+        values = np.nan_to_num(values - shift)
+
+        # The sums over the rows where both columns are present, for every pair at once
+        count = present.T @ present
+        sums = values.T @ present
+        squares = (values ** 2).T @ present
+        products = values.T @ values
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            mean = np.where(count > 0, sums / count, 0.0)
+
+        # mean[i, j] is the mean of column i over the rows where column j is present
+        chunk_stats = StreamCorrelation(self.columns)
+        chunk_stats.count = count
+        chunk_stats.mean = mean + shift[:, None]
+        chunk_stats.m2 = np.maximum(squares - count * mean ** 2, 0.0)
+        chunk_stats.comoment = products - count * mean * mean.T
+
+        return self.merge(chunk_stats)
+
+    def merge(self, other: "StreamCorrelation") -> "StreamCorrelation":
+        # This function combines another correlation into this one
+        # :param other: the other correlation (with the same columns)
+        # :type other: StreamCorrelation
+        # :returns: the combined correlation
+        # :rtype: StreamCorrelation
+
+        if other.columns is None:
+            return self
+
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self._reset()
+
+        if self.columns != other.columns:
+            raise ValueError("Only correlations of the same columns can be merged.")
+
+        self.rows += other.rows
+        count = self.count + other.count
+        delta = other.mean - self.mean
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            ratio = np.where(count > 0, other.count / count, 0.0)
+
+        weight = self.count * ratio
+        self.mean = self.mean + delta * ratio
+        self.m2 = self.m2 + other.m2 + delta ** 2 * weight
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.count = count
+
+        return self
+
+    def covariance(self) -> pd.DataFrame:
+        # This function returns the sample covariance matrix
+        # :returns: the covariance matrix
+        # :rtype: pd.DataFrame
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            covariance = np.where(self.count > 1, self.comoment / (self.count - 1), np.nan)
+
+        return pd.DataFrame(covariance, index = self.columns, columns = self.columns)
+
+    def correlation(self) -> pd.DataFrame:
+        # This function returns the Pearson correlation matrix
+        # Constant columns have no correlation (NaN), as with pd.DataFrame.corr
+        # :returns: the correlation matrix
+        # :rtype: pd.DataFrame
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            correlation = self.comoment / np.sqrt(self.m2 * self.m2.T)
+
+        correlation = np.where((self.count > 1) & (self.m2 > 0) & (self.m2.T > 0), np.clip(correlation, -1, 1),
+                               np.nan)
+
+        return pd.DataFrame(correlation, index = self.columns, columns = self.columns)
+
+    def save(self, file: str) -> None:
+        # This function saves the accumulators so that new data can be added later
+        # :param file: the file name (.npz)
+        # :type file: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        np.savez(file, columns = np.array(self.columns, dtype = str), rows = self.rows, count = self.count,
+                 mean = self.mean, m2 = self.m2, comoment = self.comoment)
+
+        return None
+
+    def load(file: str) -> "StreamCorrelation":
+        # This function loads accumulators saved by StreamCorrelation.save
+        # :param file: the file name (.npz)
+        # :type file: str
+        # :returns: the correlation
+        # :rtype: StreamCorrelation
+
+        with np.load(file) as state:
+            correlation = StreamCorrelation(state["columns"].tolist())
+            correlation.rows = int(state["rows"])
+            correlation.count = state["count"]
+            correlation.mean = state["mean"]
+            correlation.m2 = state["m2"]
+            correlation.comoment = state["comoment"]
+
+        return correlation
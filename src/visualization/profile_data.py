@@ -0,0 +1,375 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the RunningStats and StreamProfile classes. They
+# profile a dataset in a single pass over chunks instead of loading all of it.
+# RunningStats summarizes one numeric column (count, missing values, mean,
+# variance, minimum, maximum, and a log-bucket sketch for quantiles and
+# histograms). StreamProfile keeps a RunningStats for every column, both
+# overall and for each class of the target (isFraud), counts the most common
+# categories of the non-numeric columns (the rest are counted as "(other)"),
+# and keeps a stratified sample of the rows. Every accumulator can be merged,
+# so chunks can be profiled by separate processes.
+#################################################################################
+
+import math
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+class RunningStats:
+    def __init__(self, relative_accuracy: float = 0.01):
+        # :param relative_accuracy: the relative error of the quantiles from the sketch
+        # :type relative_accuracy: float
+
+        self.relative_accuracy = relative_accuracy
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+        # The sketch counts values in logarithmic buckets (separately for positive and negative values)
+        self.zeros = 0
+        self.positive = Counter()
+        self.negative = Counter()
+
+    def update(self, values) -> "RunningStats":
+        # This function adds a chunk of values to the summary
+        # :param values: the values
+        # :type values: pd.Series or np.ndarray
+        # :returns: the updated summary
+        # :rtype: RunningStats
+
+        values = np.asarray(values, dtype = np.float64)
+        present = values[~np.isnan(values)]
+        self.missing += len(values) - len(present)
+
+        if len(present) == 0:
+            return self
+
+        # Combine the chunk's moments with the running moments
+        chunk = RunningStats(self.relative_accuracy)
+        chunk.count = len(present)
+        chunk.mean = float(present.mean())
+        chunk.m2 = float(((present - chunk.mean) ** 2).sum())
+        chunk.min = float(present.min())
+        chunk.max = float(present.max())
+
+        # Fill the sketch for the chunk in one vectorized pass
+        chunk.zeros = int((present == 0).sum())
+
+        for sign, store in ((1, chunk.positive), (-1, chunk.negative)):
+            side = present[sign * present > 0] * sign
+
+            if len(side):
+                buckets, counts = np.unique(np.ceil(np.log(side) / self.log_gamma).astype(np.int64),
+                                            return_counts = True)
+                store.update(dict(zip(buckets.tolist(), counts.tolist())))
+
+        return self.merge(chunk)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        # This function combines another summary into this one
+        # :param other: the other summary (with the same relative accuracy)
+        # :type other: RunningStats
+        # :returns: the combined summary
+        # :rtype: RunningStats
+
+        self.missing += other.missing
+
+        if other.count == 0:
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+
+        return self
+
+    def variance(self) -> float:
+        # This function returns the sample variance
+        # :returns: the variance
+        # :rtype: float
+
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def _buckets(self) -> tuple:
+        # Return the bucket values and counts in ascending order
+        gamma = math.exp(self.log_gamma)
+        values, counts = [], []
+
+        for bucket in sorted(self.negative, reverse = True):
+            values.append(-2 * gamma ** bucket / (gamma + 1))
+            counts.append(self.negative[bucket])
+
+        if self.zeros:
+            values.append(0.0)
+            counts.append(self.zeros)
+
+        for bucket in sorted(self.positive):
+            values.append(2 * gamma ** bucket / (gamma + 1))
+            counts.append(self.positive[bucket])
+
+        return np.array(values), np.array(counts)
+
+    def quantiles(self, q: list) -> list:
+        # This function estimates quantiles from the sketch
+        # :param q: the quantiles (between 0 and 1)
+        # :type q: list
+        # :returns: the estimated values
+        # :rtype: list
+
+        if self.count == 0:
+            return [math.nan] * len(q)
+
+        values, counts = self._buckets()
+        ranks = np.cumsum(counts)
+        positions = np.searchsorted(ranks, np.asarray(q) * (self.count - 1), side = "right")
+
+        # Keep the estimates within the observed range
+        return np.clip(values[np.minimum(positions, len(values) - 1)], self.min, self.max).tolist()
+
+    def histogram(self, bins: int = 20) -> tuple:
+        # This function creates a histogram from the sketch with evenly spaced bins
+        # :param bins: the number of bins
+        # :type bins: int
+        # :returns: the bin edges and the number of values in each bin
+        # :rtype: tuple
+
+        if self.count == 0:
+            return np.array([]), np.array([])
+
+        # Every value is the same, so there is a single bin
+        if self.min == self.max:
+            return np.array([self.min, self.max]), np.array([self.count])
+
+        values, counts = self._buckets()
+        edges = np.linspace(self.min, self.max, bins + 1)
+        positions = np.clip(np.searchsorted(edges, np.clip(values, self.min, self.max), side = "right") - 1,
+                            0, len(edges) - 2)
+
+        return edges, np.bincount(positions, weights = counts, minlength = len(edges) - 1).astype(np.int64)
+
+    def summary(self) -> dict:
+        # This function returns the summary statistics
+        # :returns: the statistics
+        # :rtype: dict
+
+        total = self.count + self.missing
+        quantiles = self.quantiles([0.05, 0.25, 0.5, 0.75, 0.95])
+
+        return {"count": self.count, "missing_rate": self.missing / total if total else math.nan,
+                "mean": self.mean if self.count else math.nan, "std": math.sqrt(self.variance()),
+                "min": self.min if self.count else math.nan, "5%": quantiles[0], "25%": quantiles[1],
+                "50%": quantiles[2], "75%": quantiles[3], "95%": quantiles[4],
+                "max": self.max if self.count else math.nan}
+
+
+class StreamProfile:
+    OTHER = "(other)"
+
+    def __init__(self, target: str = "isFraud", sample_size: int = 0, relative_accuracy: float = 0.01,
+                 random_state: int = 42, max_categories: int = 50):
+        # :param target: the class column used to break down the summaries
+        # :type target: str
+        # :param sample_size: the number of rows kept for each class for a stratified sample (0 keeps none)
+        # :type sample_size: int
+        # :param relative_accuracy: the relative error of the quantiles
+        # :type relative_accuracy: float
+        # :param random_state: the seed for the sample
+        # :type random_state: int
+        # :param max_categories: the number of categories counted for each non-numeric column
+        # (ID columns such as nameOrig have millions of values, so the rest are counted together)
+        # :type max_categories: int
+
+        self.target = target
+        self.sample_size = sample_size
+        self.relative_accuracy = relative_accuracy
+        self.max_categories = max_categories
+        self.rng = np.random.default_rng(random_state)
+        self.rows = 0
+        self.numeric = {}
+        self.by_class = {}
+        self.categories = {}
+        self.class_counts = Counter()
+
+        # Every row gets a random key, and the rows with the smallest keys in each class are kept
+        # This gives a uniform sample of each class that can be merged across chunks
+        self.samples = {}
+
+    def update(self, chunk: pd.DataFrame) -> "StreamProfile":
+        # This function adds a chunk of rows to the profile
+        # :param chunk: the rows
+        # :type chunk: pd.DataFrame
+        # :returns: the updated profile
+        # :rtype: StreamProfile
+
+        self.rows += len(chunk)
+        classes = chunk[self.target].to_numpy() if self.target in chunk.columns else None
+
+        if classes is not None:
+            labels, counts = np.unique(classes, return_counts = True)
+            self.class_counts.update(dict(zip(labels.tolist(), counts.tolist())))
+
+        for col in chunk.columns:
+            values = chunk[col]
+
+            if not (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)):
+                self._count_categories(col, values.value_counts(dropna = False).to_dict())
+                continue
+
+            values = values.to_numpy(dtype = np.float64, na_value = np.nan)
+            self.numeric.setdefault(col, RunningStats(self.relative_accuracy)).update(values)
+
+            if classes is not None and col != self.target:
+                for label in np.unique(classes).tolist():
+                    self.by_class.setdefault((col, label), RunningStats(self.relative_accuracy)).update(
+                        values[classes == label])
+
+        if self.sample_size and classes is not None:
+            keys = self.rng.random(len(chunk))
+
+            for label in np.unique(classes).tolist():
+                rows = np.flatnonzero(classes == label)
+                sample = chunk.iloc[rows].assign(_key = keys[rows])
+
+                if label in self.samples:
+                    sample = pd.concat([self.samples[label], sample])
+
+                self.samples[label] = sample.nsmallest(self.sample_size, "_key")
+
+        return self
+
+    def merge(self, other: "StreamProfile") -> "StreamProfile":
+        # This function combines another profile into this one
+        # :param other: the other profile (with the same target, sample size, and relative accuracy)
+        # :type other: StreamProfile
+        # :returns: the combined profile
+        # :rtype: StreamProfile
+
+        self.rows += other.rows
+        self.class_counts.update(other.class_counts)
+
+        for col, stats in other.numeric.items():
+            self.numeric.setdefault(col, RunningStats(self.relative_accuracy)).merge(stats)
+
+        for key, stats in other.by_class.items():
+            self.by_class.setdefault(key, RunningStats(self.relative_accuracy)).merge(stats)
+
+        for col, counts in other.categories.items():
+            self._count_categories(col, counts)
+
+        for label, sample in other.samples.items():
+            if label in self.samples:
+                sample = pd.concat([self.samples[label], sample])
+
+            self.samples[label] = sample.nsmallest(self.sample_size, "_key")
+
+        return self
+
+    def _count_categories(self, col: str, counts: dict) -> None:
+        # This function adds category counts to a column and keeps only the most common categories
+        # The counts of the categories that are dropped are added to the "(other)" category, so the
+        # kept counts are exact only while a column has no more than max_categories categories
+        # :param col: the column
+        # :type col: str
+        # :param counts: the count of each category
+        # :type counts: dict
+        # :returns: nothing is returned
+        # :rtype: None
+
+        column = self.categories.setdefault(col, Counter())
+        column.update(counts)
+        other = column.pop(self.OTHER, 0)
+
+        if len(column) > self.max_categories:
+            kept = Counter(dict(column.most_common(self.max_categories)))
+            other += sum(column.values()) - sum(kept.values())
+            column = self.categories[col] = kept
+
+        if other:
+            column[self.OTHER] = other
+
+        return None
+
+    def summary(self) -> pd.DataFrame:
+        # This function returns the summary statistics of every numeric column
+        # :returns: the statistics (one row per column)
+        # :rtype: pd.DataFrame
+
+        return pd.DataFrame({col: stats.summary() for col, stats in self.numeric.items()}).T
+
+    def class_summary(self) -> pd.DataFrame:
+        # This function returns the summary statistics of every numeric column for each class
+        # :returns: the statistics (one row per column and class)
+        # :rtype: pd.DataFrame
+
+        summary = pd.DataFrame({key: stats.summary() for key, stats in self.by_class.items()}).T
+        summary.index.names = ["column", self.target]
+
+        return summary.sort_index()
+
+    def sample(self) -> pd.DataFrame:
+        # This function returns a stratified sample with the classes in their original proportions
+        # :returns: the sample
+        # :rtype: pd.DataFrame
+
+        if not self.samples:
+            return pd.DataFrame()
+
+        total = sum(self.class_counts.values())
+        parts = []
+
+        for label, sample in self.samples.items():
+            # Every class keeps at least one row
+            size = max(1, round(self.sample_size * self.class_counts[label] / total))
+            parts.append(sample.nsmallest(size, "_key"))
+
+        return pd.concat(parts).drop(columns = "_key").sort_index()
+
+    def to_html(self, output_file: str, title: str = "Data Profile") -> None:
+        # This function writes the profile to an HTML file
+        # :param output_file: the file name
+        # :type output_file: str
+        # :param title: the title of the report
+        # :type title: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        sections = ["<h1>{}</h1>".format(title),
+                    "<p>{} rows profiled in a single pass.</p>".format(self.rows),
+                    "<h2>Numeric Columns</h2>", self.summary().to_html(float_format = "{:,.4g}".format)]
+
+        if self.by_class:
+            sections += ["<h2>Numeric Columns by {}</h2>".format(self.target),
+                         pd.DataFrame({self.target: self.class_counts}).to_html(),
+                         self.class_summary().to_html(float_format = "{:,.4g}".format)]
+
+        for col, counts in self.categories.items():
+            sections += ["<h2>{}</h2>".format(col),
+                         pd.Series(counts, name = "count").sort_values(ascending = False).to_frame().to_html()]
+
+        # Add a histogram of each numeric column
+        for col, stats in self.numeric.items():
+            edges, counts = stats.histogram()
+
+            if len(counts):
+                sections += ["<h3>Histogram of {}</h3>".format(col),
+                             pd.DataFrame({"from": edges[:-1], "to": edges[1:], "count": counts}).to_html(
+                                 index = False, float_format = "{:,.4g}".format)]
+
+        with open(output_file, "w") as html:
+            html.write("<html><head><title>{}</title></head><body>\n{}\n</body></html>\n".format(
+                title, "\n".join(sections)))
+
+        return None
@@ -0,0 +1,208 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: This file contains the ReportFigures class and the functions that
+# render each type of report figure (boxplots, the correlation heatmap,
+# confusion matrices, and feature importances). The boxplots and the heatmap
+# are drawn by the Visualize functions. The figures are built with
+# matplotlib's object-oriented Agg API instead of pyplot, so they can be
+# rendered at the same time in separate processes. Each figure is
+# fingerprinted from the data it is drawn from, and figures whose data has not
+# changed since the last run are skipped.
+#################################################################################
+
+import hashlib
+import json
+import os
+import pickle
+from parallel import process_pool
+from visualization.visualize import Visualize
+
+def render_boxplots(file: str, stats1: dict, stats2: dict, title: str, y_label: str, x_label1: str,
+                    x_label2: str = None) -> None:
+    # Renders up to two side-by-side boxplots from statistics created by Visualize.boxplot_stats
+    # :param file: the file to save the figure to
+    # :type file: str
+    # :param stats1: the statistics of the first boxplot
+    # :type stats1: dict
+    # :param stats2: the statistics of the second boxplot (None for a single boxplot)
+    # :type stats2: dict
+    # :param title: The title of the graph
+    # :type title: str
+    # :param y_label: The title for the y-axis
+    # :type y_label: str
+    # :param x_label1: The title for the x-axis (the first graph)
+    # :type x_label1: str
+    # :param x_label2: The title for the x-axis (the second graph)
+    # :type x_label2: str
+    # :returns: nothing is returned
+    # :rtype: None
+
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize = (9, 5))
+    Visualize.draw_boxplots(figure, stats1, stats2, title, y_label, x_label1, x_label2)
+    Visualize.save_figure(figure, file, bbox_inches = "tight")
+
+    return None
+
+def render_heatmap(file: str, corr_matrix) -> None:
+    # Renders a correlation matrix as an annotated heatmap
+    # :param file: the file to save the figure to
+    # :type file: str
+    # :param corr_matrix: the correlation matrix
+    # :type corr_matrix: pd.DataFrame
+    # :returns: nothing is returned
+    # :rtype: None
+
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    Visualize.draw_heatmap(figure, corr_matrix)
+    Visualize.save_figure(figure, file, bbox_inches = "tight")
+
+    return None
+
+def render_confusion_matrix(file: str, cm) -> None:
+    # Renders a confusion matrix
+    # :param file: the file to save the figure to
+    # :type file: str
+    # :param cm: the confusion matrix (from PredictModels.performance_report)
+    # :type cm: np.ndarray
+    # :returns: nothing is returned
+    # :rtype: None
+
+    from matplotlib.figure import Figure
+    from sklearn import metrics
+
+    figure = Figure()
+    metrics.ConfusionMatrixDisplay(confusion_matrix = cm, display_labels = [0, 1]).plot(
+        values_format = ".1f", ax = figure.add_subplot())
+    Visualize.save_figure(figure, file)
+
+    return None
+
+def render_importance(file: str, importance, title: str) -> None:
+    # Renders feature importances as a horizontal bar chart with their standard deviations
+    # :param file: the file to save the figure to
+    # :type file: str
+    # :param importance: the importance table (from FeatureImportance.permutation_importance)
+    # :type importance: pd.DataFrame
+    # :param title: The title of the graph
+    # :type title: str
+    # :returns: nothing is returned
+    # :rtype: None
+
+    from matplotlib.figure import Figure
+
+    # The most important feature is drawn at the top
+    importance = importance.iloc[::-1]
+
+    figure = Figure(figsize = (7, max(3, 0.4 * len(importance))))
+    ax = figure.add_subplot()
+    ax.barh(importance["feature"], importance["importance_mean"], xerr = importance["importance_std"], 
+            color = "steelblue")
+    ax.axvline(0, color = "black", linewidth = 0.8)
+    ax.set_title(title)
+    ax.set_xlabel("Drop in Score When Shuffled")
+    figure.tight_layout()
+    Visualize.save_figure(figure, file, bbox_inches = "tight")
+
+    return None
+
+def _render(render, file: str, payload: dict) -> str:
+    # Render a single figure (in a worker process)
+    render(file, **payload)
+
+    return file
+
+class ReportFigures:
+    def __init__(self, output_dir: str = "./reports/figures/", n_jobs: int = None):
+        # :param output_dir: the directory the figures are saved to
+        # :type output_dir: str
+        # :param n_jobs: the number of processes (if None, every core is used)
+        # :type n_jobs: int
+
+        self.output_dir = output_dir
+        self.n_jobs = n_jobs
+        self.figures = {}
+
+        # The fingerprints of the figures from the last run
+        self.fingerprint_file = os.path.join(output_dir, ".fingerprints.json")
+
+    def add(self, file_name: str, render, **payload) -> "ReportFigures":
+        # This function adds a figure to the report
+        # The payload should be the (small) summarized data for the figure, not the raw dataset
+        # :param file_name: the file name of the figure (in output_dir)
+        # :type file_name: str
+        # :param render: the render function (e.g. render_boxplots)
+        # :type render: callable
+        # :param payload: the arguments of the render function, other than the file
+        # :type payload: dict
+        # :returns: the report so that calls can be chained
+        # :rtype: ReportFigures
+
+        self.figures[file_name] = (render, payload)
+
+        return self
+
+    def fingerprint(self, render, payload: dict) -> str:
+        # This function creates a fingerprint of a figure from its render function and data
+        # :param render: the render function
+        # :type render: callable
+        # :param payload: the arguments of the render function
+        # :type payload: dict
+        # :returns: the hex digest of the fingerprint
+        # :rtype: str
+
+        key = hashlib.sha256("{}.{}".format(render.__module__, render.__name__).encode())
+
+        for name in sorted(payload):
+            key.update(name.encode())
+            key.update(pickle.dumps(payload[name], protocol = 4))
+
+        return key.hexdigest()
+
+    def render(self, force: bool = False) -> list:
+        # This function renders every figure whose data changed since the last run
+        # :param force: whether to render every figure, even if it has not changed
+        # :type force: bool
+        # :returns: the file names of the figures that were rendered
+        # :rtype: list
+
+        os.makedirs(self.output_dir, exist_ok = True)
+        fingerprints = {}
+
+        if os.path.exists(self.fingerprint_file):
+            with open(self.fingerprint_file) as fingerprint_file:
+                fingerprints = json.load(fingerprint_file)
+
+        # Find the figures that are missing or out of date
+        stale = {}
+
+        for file_name, (render, payload) in self.figures.items():
+            key = self.fingerprint(render, payload)
+            file = os.path.join(self.output_dir, file_name)
+
+            if force or fingerprints.get(file_name) != key or not os.path.exists(file):
+                stale[file_name] = key
+
+        rendered = []
+
+        try:
+            if stale:
+                with process_pool(self.n_jobs) as pool:
+                    jobs = {pool.submit(_render, self.figures[file_name][0], 
+                                        os.path.join(self.output_dir, file_name), 
+                                        self.figures[file_name][1]): file_name for file_name in stale}
+
+                    for job, file_name in jobs.items():
+                        job.result()
+                        fingerprints[file_name] = stale[file_name]
+                        rendered.append(file_name)
+        finally:
+            # Record the figures that were rendered, even if another figure failed
+            with open(self.fingerprint_file, "w") as fingerprint_file:
+                json.dump(fingerprints, fingerprint_file, indent = 2, sort_keys = True)
+
+        return rendered
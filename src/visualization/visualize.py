@@ -2,30 +2,151 @@
 # Author: Cayson Seipel
 #
 # Summary: This file contains the Visualize class which contains several
-# methods for visualizing data. transaction_boxplots creates boxplots
-# for the supplied data. It also supports side-by-side boxplots if a second
-# dataset is supplied. The second function creates a pandas profile for the
-# data and saves it directly to a file in ./reports. Finally, the third 
+# methods for visualizing data. boxplot_stats summarizes columns by class
+# so that boxplots can be drawn without the raw data. transaction_boxplots 
+# creates boxplots for the supplied data (or statistics). It also supports 
+# side-by-side boxplots if a second dataset is supplied. The second function
+# creates a pandas profile for the data and saves it directly to a file in
+# ./reports. The third function profiles chunks of data in a single streaming
+# pass (see profile_data.py). Finally, the fourth function creates a
+# correlation matrix heatmap, either from the data or from a streaming
+# correlation (see correlation_data.py). The boxplots and the heatmap are
+# drawn by draw_boxplots and draw_heatmap, which report_figures.py also uses.
 #################################################################################
 
-import ydata_profiling as pp
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
+import pandas as pd
+from visualization.correlation_data import StreamCorrelation
+from visualization.profile_data import StreamProfile
 
 class Visualize:
     def __init__(self, name):
         self.name = name
 
-    def transaction_boxplots(data1: pd.Series, data2: pd.Series, title: str, y_label: str, x_label1: str,
+    def boxplot_stats(data: pd.DataFrame, cols: list, by: str = "isFraud", whis: float = 1.5, 
+                      max_fliers: int = 1000, random_state: int = 42) -> dict:
+        # Computes the statistics of a boxplot for each column and class in a single group-by pass
+        # Drawing from these statistics takes the same time no matter how many rows there are
+        # :param data: the dataset
+        # :type data: pd.DataFrame
+        # :param cols: the columns to summarize
+        # :type cols: list
+        # :param by: the class column
+        # :type by: str
+        # :param whis: the length of the whiskers as a multiple of the interquartile range
+        # :type whis: float
+        # :param max_fliers: the largest number of outliers kept for each column and class (a random sample)
+        # :type max_fliers: int
+        # :param random_state: the seed for the sample of outliers
+        # :type random_state: int
+        # :returns: the boxplot statistics for each (column, class), in the format used by Axes.bxp
+        # :rtype: dict
+
+        rng = np.random.default_rng(random_state)
+
+        # The quartiles of every column and class
+        quartiles = data.groupby(by)[cols].quantile([0.25, 0.5, 0.75])
+        labels = quartiles.index.get_level_values(0).unique()
+        codes = pd.Categorical(data[by], categories = labels).codes
+        stats = {}
+
+        # Rows with a missing class get the code -1, which would index the last class, so they are
+        # dropped (the same as in the group-by)
+        missing = codes < 0
+
+        if missing.any():
+            codes = codes[~missing]
+
+        for col in cols:
+            values = data[col].to_numpy(dtype = np.float64)
+
+            if missing.any():
+                values = values[~missing]
+            col_quartiles = quartiles[col].unstack()
+            q1, med, q3 = (col_quartiles[q].to_numpy() for q in (0.25, 0.5, 0.75))
+
+            # Whiskers reach the most extreme values within whis * IQR of the box
+            low = (q1 - whis * (q3 - q1))[codes]
+            high = (q3 + whis * (q3 - q1))[codes]
+            inside = (values >= low) & (values <= high)
+            whislo = pd.Series(np.where(inside, values, np.inf)).groupby(codes).min()
+            whishi = pd.Series(np.where(inside, values, -np.inf)).groupby(codes).max()
+
+            for code, label in enumerate(labels):
+                fliers = values[(codes == code) & ~inside]
+
+                if len(fliers) > max_fliers:
+                    fliers = rng.choice(fliers, max_fliers, replace = False)
+
+                stats[col, label] = {"med": med[code], "q1": q1[code], "q3": q3[code], 
+                                     "whislo": whislo[code], "whishi": whishi[code], "fliers": fliers}
+
+        return stats
+
+    def save_figure(figure, file: str, bbox_inches: str = None) -> None:
+        # This function draws a figure (created with matplotlib.figure.Figure, not pyplot) with the Agg
+        # backend and saves it as a png, so figures can be saved from several processes at once
+        # :param figure: the figure
+        # :type figure: matplotlib.figure.Figure
+        # :param file: the path of the png file
+        # :type file: str
+        # :param bbox_inches: the part of the figure to save ("tight" trims the empty space)
+        # :type bbox_inches: str
+        # :returns: nothing is returned
+        # :rtype: None
+
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        FigureCanvasAgg(figure)
+        figure.savefig(file, dpi = "figure", format = "png", bbox_inches = bbox_inches)
+
+        return None
+
+    def draw_boxplots(figure, data1, data2, title: str, y_label: str, x_label1: str, x_label2: str = None) -> None:
+        # This function draws up to two side-by-side boxplots on a figure (see transaction_boxplots)
+        # :param figure: the figure to draw on
+        # :type figure: matplotlib.figure.Figure
+        # :returns: nothing is returned
+        # :rtype: None
+
+        figure.suptitle(title, x = 0.35)
+        ax1 = figure.add_subplot(131)
+
+        # Statistics are drawn directly, raw data is summarized by matplotlib
+        if isinstance(data1, dict):
+            ax1.bxp([data1])
+        else:
+            ax1.boxplot(data1)
+
+        ax1.ticklabel_format(axis = "y", style = "plain")
+        ax1.set_xticks([])
+        ax1.set_xlabel(x_label1)
+        ax1.set_ylabel(y_label)
+
+        # Data for a second boxplot was supplied
+        if isinstance(data2, dict) or (data2 is not None and data2.any()):
+            ax2 = figure.add_subplot(132, sharey = ax1)
+
+            if isinstance(data2, dict):
+                ax2.bxp([data2])
+            else:
+                ax2.boxplot(data2)
+
+            ax2.set_xticks([])
+            ax2.set_xlabel(x_label2)
+
+        figure.tight_layout()
+
+        return None
+
+    def transaction_boxplots(data1, data2, title: str, y_label: str, x_label1: str,
                              x_label2: str = None, file_name: str = None) -> None:
         # Creates up to two boxplots from the supplied data
         # If a filename is supplied, it is saved to "./reports/figures/"
-        # :param data1: the dataset to visualize
-        # :type data1: pd.Series
-        # :param data2: the second dataset to visualize
-        # :type data2: pd.Series
+        # :param data1: the dataset to visualize, or its statistics from boxplot_stats
+        # :type data1: pd.Series or dict
+        # :param data2: the second dataset to visualize, or its statistics from boxplot_stats
+        # :type data2: pd.Series or dict
         # :param title: The title of the graph
         # :type title: str
         # :param y_label: The title for the y-axis
@@ -39,68 +160,128 @@ class Visualize:
         # :returns: nothing is returned
         # :rtype: None
 
-        plt.figure(figsize = (9, 5))
-        plt.suptitle(title, x = 0.35)
-        plt.ticklabel_format(style = "plain")
-        ax1 = plt.subplot(131)
-        plt.tight_layout() 
-        plt.boxplot(data1)
-        plt.xticks(ticks = [])
-        plt.xlabel(x_label1)
-        plt.ylabel(y_label)
-    
-        # Data for a second boxplot was supplied
-        if data2.any():
-            ax2 = plt.subplot(132, sharey = ax1)
-            plt.tight_layout()
-            plt.boxplot(data2)
-            plt.xticks(ticks = [])
-            plt.xlabel(x_label2)
-    
         # If a file name is specified, save the graphs to that file
         # Otherwise, show the plot
         if file_name != None:
-            plt.savefig("./reports/figures/" + file_name, dpi = "figure", format = "png", bbox_inches = "tight")
+            from matplotlib.figure import Figure
+
+            figure = Figure(figsize = (9, 5))
+            Visualize.draw_boxplots(figure, data1, data2, title, y_label, x_label1, x_label2)
+            Visualize.save_figure(figure, "./reports/figures/" + file_name, bbox_inches = "tight")
         else:
-            plt.show()
+            import matplotlib.pyplot as plt
 
-        plt.clf()
-        plt.close()
+            figure = plt.figure(figsize = (9, 5))
+            Visualize.draw_boxplots(figure, data1, data2, title, y_label, x_label1, x_label2)
+            plt.show()
+            plt.close(figure)
 
         return None
 
-    def data_profile(data: pd.DataFrame) -> None:
+    def data_profile(data: pd.DataFrame, sample_size: int = None, target: str = "isFraud") -> None:
         # Create a Pandas Profiling report
         # The results are saved to fraud_detection_profile.html in the reports directory 
         # :param data: The dataset to be profiled
         # :type data: pd.DataFrame
+        # :param sample_size: if given, only a sample of this many rows (stratified by target) is profiled
+        # :type sample_size: int
+        # :param target: the class column used to stratify the sample
+        # :type target: str
         # :returns: nothing is returned
         # :rtype: None
 
-        profile = data.profile_report()
+        # ydata_profiling is slow to import, so it is only imported when a profile is created
+        import ydata_profiling
+
+        # Profiling millions of rows takes too long, so profile a stratified sample instead
+        if sample_size and len(data) > sample_size:
+            data = data.groupby(target, group_keys = False).sample(frac = sample_size / len(data), random_state = 42)
+
+        profile = ydata_profiling.ProfileReport(data)
         profile.to_file(output_file = "fraud_data_profile.html")
 
         return None
 
-    def correlation_matrix(data: pd.DataFrame, file_name: str = None) -> None:
+    def stream_profile(chunks, target: str = "isFraud", sample_size: int = None,
+                       output_file: str = "fraud_data_stream_profile.html") -> StreamProfile:
+        # Profile chunks of data in a single pass without holding the whole dataset in memory
+        # The summaries (counts, missing rates, moments, quantiles, histograms, and a breakdown by the target)
+        # are saved to output_file. If a sample size is given, a Pandas Profiling report is also created
+        # from a stratified sample of that size (see data_profile)
+        # :param chunks: the chunks of data (e.g. from CleanData.stream_data)
+        # :type chunks: an iterable of pd.DataFrame
+        # :param target: the class column used to break down the summaries
+        # :type target: str
+        # :param sample_size: the number of rows in the sample for the Pandas Profiling report (None skips it)
+        # :type sample_size: int
+        # :param output_file: the file name for the summaries
+        # :type output_file: str
+        # :returns: the profile
+        # :rtype: StreamProfile
+
+        profile = StreamProfile(target, sample_size if sample_size else 0)
+
+        for chunk in chunks:
+            profile.update(chunk)
+
+        profile.to_html(output_file, title = "Fraud Data Profile")
+
+        if sample_size:
+            Visualize.data_profile(profile.sample(), target = target)
+
+        return profile
+
+    def draw_heatmap(figure, corr_matrix: pd.DataFrame) -> None:
+        # This function draws a correlation matrix as an annotated heatmap on a figure (see correlation_matrix)
+        # Large matrices get a bigger figure, and are not annotated once the numbers would overlap
+        # :param figure: the figure to draw on
+        # :type figure: matplotlib.figure.Figure
+        # :param corr_matrix: the correlation matrix
+        # :type corr_matrix: pd.DataFrame
+        # :returns: nothing is returned
+        # :rtype: None
+
+        import seaborn as sns
+
+        size = len(corr_matrix)
+
+        if size > 10:
+            figure.set_size_inches(0.5 * size, 0.4 * size)
+
+        sns.heatmap(corr_matrix, cmap = "YlGnBu", annot = size <= 15, fmt = "0.2f", annot_kws = {"fontsize": 8},
+                    ax = figure.add_subplot())
+
+        return None
+
+    def correlation_matrix(data, file_name: str = None) -> None:
         # Create a correlation matrix from the supplied data
         # The results are displayed to the console unless a file name is supplied
-        # :param data: The dataset to graph
-        # :type data: pd.DataFrame
+        # :param data: The dataset to graph (or a StreamCorrelation that has already seen the data)
+        # :type data: pd.DataFrame or StreamCorrelation
         # :param file_name: The file title for the produced graph(s) 
         # :type file_name: str
         # :returns: nothing is returned
         # :rtype: None
 
-        corr_matrix = data.corr()
-
-        sns.heatmap(corr_matrix, cmap = "YlGnBu", annot = True, fmt = "0.2f", annot_kws = {"fontsize": 8})
+        if isinstance(data, StreamCorrelation):
+            corr_matrix = data.correlation()
+        else:
+            corr_matrix = data.corr()
 
         # If a file name is specified, save the graphs to that file
         # Otherwise, show the plot
         if file_name != None:
-            plt.savefig("./reports/figures/" + file_name, dpi = "figure", format = "png", bbox_inches = "tight")
+            from matplotlib.figure import Figure
+
+            figure = Figure()
+            Visualize.draw_heatmap(figure, corr_matrix)
+            Visualize.save_figure(figure, "./reports/figures/" + file_name, bbox_inches = "tight")
         else:
+            import matplotlib.pyplot as plt
+
+            figure = plt.figure()
+            Visualize.draw_heatmap(figure, corr_matrix)
             plt.show()
+            plt.close(figure)
 
         return None
@@ -0,0 +1,50 @@
+#################################################################################
+# Author: Cayson Seipel
+#
+# Summary: These tests check how the ranking metrics in Metrics (ROC-AUC,
+# PR-AUC, and the threshold sweep) handle inputs without a curve: empty inputs
+# raise a clear ValueError, and inputs with a single class give NaN scores
+# instead of dividing by zero.
+#
+# Usage: python -m pytest tests
+#################################################################################
+
+import math
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from models.metrics import Metrics
+
+@pytest.mark.parametrize("metric", [Metrics.roc_auc, Metrics.pr_auc, Metrics.threshold_sweep])
+def test_empty_input_raises(metric):
+    with pytest.raises(ValueError, match = "must not be empty"):
+        metric(np.array([], dtype = np.int64), np.array([]))
+
+@pytest.mark.parametrize("metric", [Metrics.roc_auc, Metrics.pr_auc, Metrics.threshold_sweep])
+def test_mismatched_lengths_raise(metric):
+    with pytest.raises(ValueError, match = "same length"):
+        metric([0, 1, 1], [0.2, 0.8])
+
+def test_single_class_gives_nan():
+    scores = [0.1, 0.4, 0.4, 0.9]
+
+    with np.errstate(all = "raise"):
+        assert math.isnan(Metrics.roc_auc([0, 0, 0, 0], scores))
+        assert math.isnan(Metrics.roc_auc([1, 1, 1, 1], scores))
+        assert math.isnan(Metrics.pr_auc([0, 0, 0, 0], scores))
+        assert Metrics.pr_auc([1, 1, 1, 1], scores) == 1.0
+
+        sweep = Metrics.threshold_sweep([0, 0, 0, 0], scores)
+
+    assert (sweep["recall"] == 0).all() and (sweep["f1"] == 0).all()
+
+def test_scores_match_a_small_example():
+    y = [0, 0, 1, 1]
+    scores = [0.1, 0.4, 0.35, 0.8]
+
+    assert Metrics.roc_auc(y, scores) == pytest.approx(0.75)
+    assert Metrics.pr_auc(y, scores) == pytest.approx(0.8333333)